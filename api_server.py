@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+"""
+API HTTP para enviar vídeos à fila de transcrição e buscar os resultados.
+
+Endpoints:
+    POST   /jobs                         envia um job (JSON ou upload multipart)
+    GET    /jobs/{id}                    estado, progresso e links dos artefatos
+    DELETE /jobs/{id}                    cancela o job
+    GET    /jobs/{id}/artifacts/{tipo}   baixa um artefato (srt, summary_srt, pdf, summary_pdf,
+                                         profile, profile_stacks)
+    GET    /metrics                      métricas do pipeline no formato do Prometheus
+    GET    /health
+
+O corpo JSON de POST /jobs aceita 'url' (YouTube, Vimeo, gs://, Drive ou
+outra URL de vídeo) ou 'drive_file_id', além de 'model', 'name',
+'save_to_drive' e 'profile' (grava o perfil de CPU e de memória do job como
+artefatos, ver profiling.py). Uploads usam multipart com o campo 'file'
+(um único arquivo por job, e os mesmos campos opcionais). Os handlers são assíncronos; o acesso à fila
+SQLite e a escrita dos uploads rodam em threads, e os jobs são executados pelo
+JobWorkerPool (ver job_queue.py).
+
+Se TRANSCRIPTION_API_TOKEN estiver definido, as requisições precisam do
+cabeçalho 'Authorization: Bearer <token>'. A chave da OpenAI de um job pode ir
+no cabeçalho 'X-OpenAI-Key'; sem ele, os workers usam OPENAI_API_KEY.
+
+URLs http(s) são baixadas pelo servidor: para que a API não sirva de ponte
+para a rede interna, URLs cujo host resolve para um endereço privado,
+loopback, link-local ou reservado são recusadas com 400 (--allow-private-urls
+ou TRANSCRIPTION_API_ALLOW_PRIVATE_URLS=1 desativa a verificação, para
+servidores de vídeo internos). A verificação vale para o endereço no momento
+do envio; redirecionamentos não são verificados de novo, então uma API exposta
+deve também exigir o token.
+
+Uso:
+    python api_server.py [--port 8000] [--workers 2]
+    python api_server.py --mock --mock-latency 2    # backend simulado, para testes de carga
+"""
+
+import os
+import hmac
+import json
+import time
+import uuid
+import socket
+import asyncio
+import logging
+import argparse
+import ipaddress
+import urllib.parse
+from aiohttp import web
+from metrics import REGISTRY, PROMETHEUS_CONTENT_TYPE, timed_stage
+from job_queue import (JobQueue, JobWorkerPool, JOB_DB_PATH, JOB_OUTPUT_DIR,
+                       DEFAULT_JOB_WORKERS, DONE, FAILED)
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+API_DEFAULT_PORT = 8000
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MB por escrita
+ARTIFACT_CONTENT_TYPES = {
+    'srt': 'application/x-subrip',
+    'summary_srt': 'application/x-subrip',
+    'pdf': 'application/pdf',
+    'summary_pdf': 'application/pdf',
+    'profile': 'text/plain; charset=utf-8',
+    'profile_stacks': 'text/plain; charset=utf-8',
+}
+# Fontes aceitas no corpo JSON (caminhos locais do servidor não são aceitos)
+API_SOURCE_PREFIXES = ('http://', 'https://', 'gs://', 'drive:')
+
+QUEUE_KEY = web.AppKey('queue', JobQueue)
+POOL_KEY = web.AppKey('pool', JobWorkerPool)
+UPLOAD_DIR_KEY = web.AppKey('upload_dir', str)
+TOKEN_KEY = web.AppKey('token', str)
+ALLOW_PRIVATE_URLS_KEY = web.AppKey('allow_private_urls', bool)
+
+
+async def _in_thread(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+
+@web.middleware
+async def auth_middleware(request, handler):
+    token = request.app[TOKEN_KEY]
+    if token and request.path != '/health':
+        provided = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(provided.encode(), f"Bearer {token}".encode()):
+            raise web.HTTPUnauthorized(
+                text='{"error": "token inválido"}', content_type='application/json')
+    return await handler(request)
+
+
+def _job_url(request, job_id, *parts):
+    return str(request.url.with_path('/'.join(['', 'jobs', job_id, *parts])).with_query(None))
+
+
+def job_to_json(request, job):
+    """
+    Representação de um job na API (sem o conteúdo da transcrição)
+    """
+    body = {
+        'id': job['id'],
+        # Caminhos de uploads no servidor não são expostos
+        'source': 'upload' if job['params'].get('delete_source_after') else job['source'],
+        'name': job['name'],
+        'state': job['state'],
+        'stage': job['stage'],
+        'progress': job['progress'],
+        'message': job['message'],
+        'error': job['error'],
+        'cancel_requested': job['cancel_requested'],
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at'],
+        'timeline': job['timeline'],
+    }
+    if job['state'] == DONE and job['result']:
+        result = job['result']
+        body['title'] = result.get('title')
+        body['duration'] = result.get('duration')
+        body['seconds'] = result.get('seconds')
+        if result.get('uploaded_files'):
+            body['drive_files'] = result['uploaded_files']
+    # Jobs que falharam podem ter artefatos do perfil de desempenho
+    if job['state'] in (DONE, FAILED) and job['result']:
+        body['artifacts'] = {kind: _job_url(request, job['id'], 'artifacts', kind)
+                             for kind in job['result'].get('artifacts', {})}
+    return body
+
+
+def _bad_request(message):
+    return web.HTTPBadRequest(
+        text=json.dumps({'error': message}, ensure_ascii=False), content_type='application/json')
+
+
+def _name_from_fields(fields, upload_filename=None):
+    """
+    Nome base dos arquivos gerados: o campo 'name' ou, em uploads, o nome do
+    arquivo enviado (sem diretórios nem extensão). Um 'name' com separadores
+    de diretório ou '..' é recusado com 400.
+    """
+    from utils import clean_filename
+
+    name = fields.get('name')
+    if name:
+        if not isinstance(name, str):
+            raise _bad_request("name deve ser um texto")
+        if '/' in name or '\\' in name or '..' in name:
+            raise _bad_request("name não pode conter separadores de diretório nem '..'")
+    elif upload_filename:
+        # Alguns navegadores enviam o caminho completo do arquivo (o aiohttp
+        # entrega o nome com os caracteres especiais codificados)
+        filename = urllib.parse.unquote(upload_filename).replace('\\', '/')
+        name = os.path.splitext(os.path.basename(filename))[0]
+    if not name or name in ('.', '..'):
+        return None
+    return clean_filename(os.path.basename(name))
+
+
+def _source_from_fields(fields):
+    for field in ('url', 'drive_file_id'):
+        if fields.get(field) is not None and not isinstance(fields[field], str):
+            raise _bad_request(f"{field} deve ser um texto")
+    if fields.get('url'):
+        return fields['url']
+    if fields.get('drive_file_id'):
+        return f"drive:{fields['drive_file_id']}"
+    return None
+
+
+def _is_public_address(address):
+    ip = ipaddress.ip_address(address.split('%', 1)[0])
+    return ip.is_global and not ip.is_multicast
+
+
+async def _check_public_url(url):
+    """
+    Recusa com 400 uma URL http(s) cujo host não resolve ou resolve para
+    algum endereço que não seja público (privado, loopback, link-local,
+    reservado ou multicast)
+    """
+    parsed = urllib.parse.urlparse(url)
+    try:
+        port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+    except ValueError:
+        raise _bad_request("porta inválida na URL")
+    if not parsed.hostname:
+        raise _bad_request("a URL não tem host")
+    try:
+        addresses = await asyncio.get_running_loop().getaddrinfo(
+            parsed.hostname, port, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError):
+        raise _bad_request(f"não foi possível resolver o host {parsed.hostname}")
+    if not all(_is_public_address(address[4][0]) for address in addresses):
+        raise _bad_request("a URL aponta para um endereço interno (privado, loopback ou link-local)")
+
+
+async def _save_upload(part, upload_dir):
+    """
+    Grava um arquivo enviado em partes de UPLOAD_CHUNK_SIZE, sem carregá-lo
+    inteiro na memória
+    """
+    extension = os.path.splitext(part.filename or '')[1] or '.mp4'
+    path = os.path.join(upload_dir, f"{uuid.uuid4().hex}{extension}")
+    f = await _in_thread(open, path, 'wb')
+    try:
+        while True:
+            chunk = await part.read_chunk(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            await _in_thread(f.write, chunk)
+    finally:
+        await _in_thread(f.close)
+    return path
+
+
+async def submit_job(request):
+    fields = {}
+    params = {}
+    upload_path = None
+    upload_filename = None
+
+    if request.content_type.startswith('multipart/'):
+        reader = await request.multipart()
+        try:
+            async for part in reader:
+                if part.name == 'file':
+                    if upload_path:
+                        raise _bad_request("envie um único arquivo por job")
+                    upload_filename = part.filename
+                    upload_path = await _save_upload(part, request.app[UPLOAD_DIR_KEY])
+                else:
+                    fields[part.name] = await part.text()
+        except BaseException:
+            # Upload interrompido ou recusado: nada fica na pasta de uploads
+            if upload_path:
+                await _in_thread(os.remove, upload_path)
+            raise
+        source = upload_path
+        params['delete_source_after'] = upload_path
+    else:
+        try:
+            fields = await request.json()
+        except ValueError:
+            raise web.HTTPBadRequest(
+                text='{"error": "JSON inválido"}', content_type='application/json')
+        if not isinstance(fields, dict):
+            raise _bad_request("o corpo JSON deve ser um objeto")
+        source = _source_from_fields(fields)
+        if source and not source.startswith(API_SOURCE_PREFIXES):
+            raise web.HTTPBadRequest(
+                text='{"error": "a fonte deve ser uma URL, uma URI gs:// ou um ID do Drive"}',
+                content_type='application/json')
+        if (source and source.startswith(('http://', 'https://'))
+                and not request.app[ALLOW_PRIVATE_URLS_KEY]):
+            await _check_public_url(source)
+
+    if not source:
+        raise web.HTTPBadRequest(
+            text='{"error": "informe url, drive_file_id ou um arquivo"}',
+            content_type='application/json')
+
+    try:
+        name = _name_from_fields(fields, upload_filename)
+    except web.HTTPBadRequest:
+        if upload_path:
+            await _in_thread(os.remove, upload_path)
+        raise
+
+    if str(fields.get('save_to_drive', '')).lower() in ('1', 'true', 'yes'):
+        params['save_to_drive'] = True
+    if str(fields.get('profile', '')).lower() in ('1', 'true', 'yes'):
+        params['profile'] = True
+
+    pool = request.app[POOL_KEY]
+    model = fields.get('model') or 'gpt-4o-mini'
+    if not isinstance(model, str):
+        raise _bad_request("model deve ser um texto")
+    job_id = await _in_thread(
+        lambda: pool.submit(source, model, api_key=request.headers.get('X-OpenAI-Key'),
+                            owner='api', name=name, params=params))
+    job = await _in_thread(request.app[QUEUE_KEY].get, job_id)
+    return web.json_response(
+        job_to_json(request, job), status=202,
+        headers={'Location': _job_url(request, job_id)})
+
+
+async def _get_job_or_404(request):
+    job = await _in_thread(request.app[QUEUE_KEY].get, request.match_info['job_id'])
+    if job is None:
+        raise web.HTTPNotFound(
+            text='{"error": "job não encontrado"}', content_type='application/json')
+    return job
+
+
+async def get_job(request):
+    job = await _get_job_or_404(request)
+    return web.json_response(job_to_json(request, job))
+
+
+async def cancel_job(request):
+    job = await _get_job_or_404(request)
+    await _in_thread(request.app[QUEUE_KEY].cancel, job['id'])
+    job = await _in_thread(request.app[QUEUE_KEY].get, job['id'])
+    return web.json_response(job_to_json(request, job))
+
+
+async def get_artifact(request):
+    job = await _get_job_or_404(request)
+    kind = request.match_info['kind']
+    if job['state'] not in (DONE, FAILED):
+        raise web.HTTPConflict(
+            text='{"error": "o job ainda não terminou"}', content_type='application/json')
+    path = (job['result'] or {}).get('artifacts', {}).get(kind)
+    if not path or not os.path.exists(path):
+        raise web.HTTPNotFound(
+            text='{"error": "artefato não encontrado"}', content_type='application/json')
+    return web.FileResponse(path, headers={
+        'Content-Type': ARTIFACT_CONTENT_TYPES.get(kind, 'application/octet-stream'),
+        'Content-Disposition': f'attachment; filename="{os.path.basename(path)}"',
+    })
+
+
+async def health(request):
+    return web.json_response({'status': 'ok'})
+
+
+async def metrics(request):
+    return web.Response(body=REGISTRY.render().encode('utf-8'),
+                        headers={'Content-Type': PROMETHEUS_CONTENT_TYPE})
+
+
+def create_app(queue, pool, upload_dir, token=None, allow_private_urls=False):
+    app = web.Application(middlewares=[auth_middleware])
+    app[QUEUE_KEY] = queue
+    app[POOL_KEY] = pool
+    app[UPLOAD_DIR_KEY] = upload_dir
+    app[TOKEN_KEY] = token or ''
+    app[ALLOW_PRIVATE_URLS_KEY] = allow_private_urls
+    os.makedirs(upload_dir, exist_ok=True)
+
+    app.router.add_post('/jobs', submit_job)
+    app.router.add_get('/jobs/{job_id}', get_job)
+    app.router.add_delete('/jobs/{job_id}', cancel_job)
+    app.router.add_get('/jobs/{job_id}/artifacts/{kind}', get_artifact)
+    app.router.add_get('/metrics', metrics)
+    app.router.add_get('/health', health)
+
+    async def start_pool(app):
+        if pool.num_workers > 0:
+            pool.start()
+
+    async def stop_pool(app):
+        await _in_thread(pool.stop, 5)
+
+    app.on_startup.append(start_pool)
+    app.on_cleanup.append(stop_pool)
+    return app
+
+
+class MockJobWorkerPool(JobWorkerPool):
+    """
+    Pool que simula o pipeline (download, transcrição e resumo com a latência
+    configurada) e grava artefatos fictícios, para testes de carga da API sem
+    OpenAI, ffmpeg ou credenciais
+    """
+
+    STAGES = ('download', 'transcricao', 'resumo')
+    STEPS_PER_STAGE = 5
+
+    def __init__(self, queue, num_workers=DEFAULT_JOB_WORKERS, output_dir=JOB_OUTPUT_DIR,
+                 latency=1.0, **kwargs):
+        super().__init__(queue, num_workers, output_dir, **kwargs)
+        self.latency = latency
+
+    def _execute(self, job, events, out_dir):
+        from utils import output_file_path
+
+        started = time.time()
+        step = self.latency / (len(self.STAGES) * self.STEPS_PER_STAGE)
+        for stage in self.STAGES:
+            for done in range(1, self.STEPS_PER_STAGE + 1):
+                with timed_stage(stage, events, chunk=done):
+                    time.sleep(step)
+                events.progress(stage, done, self.STEPS_PER_STAGE)
+
+        name = job['name'] or 'mock'
+        srt_content = "1\n00:00:00,000 --> 00:00:05,000\nTranscrição simulada.\n\n"
+        os.makedirs(out_dir, exist_ok=True)
+        contents = {
+            'srt': (f"{name}_transcricao_completa.srt", srt_content.encode('utf-8')),
+            'summary_srt': (f"{name}_transcricao_resumida.srt", srt_content.encode('utf-8')),
+            'pdf': (f"{name}_transcricao_completa.pdf", b"%PDF-1.4\n% mock\n"),
+            'summary_pdf': (f"{name}_transcricao_resumida.pdf", b"%PDF-1.4\n% mock\n"),
+        }
+        artifacts = {}
+        for kind, (filename, data) in contents.items():
+            path = output_file_path(out_dir, filename)
+            with open(path, 'wb') as f:
+                f.write(data)
+            artifacts[kind] = path
+
+        return {
+            'name': name,
+            'title': name,
+            'duration': 5,
+            'srt': srt_content,
+            'summary_srt': srt_content,
+            'summary_text': "Transcrição simulada.",
+            'seconds': time.time() - started,
+            'files': list(artifacts.values()),
+            'artifacts': artifacts,
+        }
+
+
+def main():
+    from dotenv import load_dotenv, find_dotenv
+
+    logging.basicConfig(level=logging.INFO)
+    _ = load_dotenv(find_dotenv())
+
+    parser = argparse.ArgumentParser(
+        description="API HTTP da fila de transcrições")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=API_DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=DEFAULT_JOB_WORKERS,
+                        help="Jobs executados em paralelo (0 = só enfileirar)")
+    parser.add_argument('--db', default=JOB_DB_PATH,
+                        help="Arquivo SQLite da fila")
+    parser.add_argument('--out', default=JOB_OUTPUT_DIR,
+                        help="Pasta onde os arquivos gerados são gravados")
+    parser.add_argument('--mock', action='store_true',
+                        help="Simula o pipeline (sem OpenAI), para testes de carga")
+    parser.add_argument('--mock-latency', type=float, default=1.0,
+                        help="Duração simulada de cada job, em segundos")
+    parser.add_argument('--allow-private-urls', action='store_true',
+                        default=os.getenv('TRANSCRIPTION_API_ALLOW_PRIVATE_URLS', '0') == '1',
+                        help="Aceita URLs de hosts da rede interna")
+    args = parser.parse_args()
+
+    queue = JobQueue(args.db)
+    if args.mock:
+        pool = MockJobWorkerPool(queue, args.workers, args.out, latency=args.mock_latency)
+    else:
+        pool = JobWorkerPool(queue, args.workers, args.out)
+
+    # O backend simulado não baixa nada: os hosts não precisam ser verificados
+    app = create_app(queue, pool, os.path.join(args.out, 'uploads'),
+                     token=os.getenv('TRANSCRIPTION_API_TOKEN'),
+                     allow_private_urls=args.allow_private_urls or args.mock)
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Teste de carga da API de transcrição (api_server.py).
+
+Envia --jobs jobs com até --concurrency requisições simultâneas, acompanha
+cada um até terminar e informa a latência do envio e da consulta de estado,
+o tempo até a conclusão e a vazão. Use com o backend simulado:
+
+    python api_server.py --mock --mock-latency 2 --workers 8
+    python benchmarks/api_load_test.py --jobs 200 --concurrency 50
+"""
+
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+import aiohttp
+
+POLL_INTERVAL = 0.5  # segundos entre consultas de estado de um job
+FINAL_STATES = ('done', 'failed', 'cancelled')
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def summarize(label, values):
+    if not values:
+        return f"{label}: sem amostras"
+    return (f"{label}: p50 {percentile(values, 0.5) * 1000:.1f} ms · "
+            f"p95 {percentile(values, 0.95) * 1000:.1f} ms · "
+            f"máx {max(values) * 1000:.1f} ms · média {statistics.mean(values) * 1000:.1f} ms")
+
+
+async def run_job(session, base_url, source, semaphore, stats):
+    async with semaphore:
+        started = time.perf_counter()
+        async with session.post(f"{base_url}/jobs", json={'url': source}) as response:
+            stats['submit'].append(time.perf_counter() - started)
+            if response.status != 202:
+                stats['errors'] += 1
+                return
+            job = await response.json()
+
+    while job['state'] not in FINAL_STATES:
+        await asyncio.sleep(POLL_INTERVAL)
+        async with semaphore:
+            poll_started = time.perf_counter()
+            async with session.get(f"{base_url}/jobs/{job['id']}") as response:
+                stats['poll'].append(time.perf_counter() - poll_started)
+                job = await response.json()
+
+    stats['completion'].append(time.perf_counter() - started)
+    stats['states'][job['state']] = stats['states'].get(job['state'], 0) + 1
+
+    if job['state'] == 'done':
+        async with semaphore:
+            artifact_started = time.perf_counter()
+            async with session.get(job['artifacts']['srt']) as response:
+                await response.read()
+                stats['artifact'].append(time.perf_counter() - artifact_started)
+
+
+async def main_async(args):
+    stats = {'submit': [], 'poll': [], 'artifact': [], 'completion': [],
+             'states': {}, 'errors': 0}
+    headers = {'Authorization': f"Bearer {args.token}"} if args.token else {}
+    semaphore = asyncio.Semaphore(args.concurrency)
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+
+    started = time.perf_counter()
+    async with aiohttp.ClientSession(headers=headers, connector=connector) as session:
+        await asyncio.gather(*(
+            run_job(session, args.url, f"https://example.com/video_{i}.mp4", semaphore, stats)
+            for i in range(args.jobs)))
+    elapsed = time.perf_counter() - started
+
+    print(f"{args.jobs} job(s) em {elapsed:.1f}s · {args.jobs / elapsed:.1f} jobs/s")
+    print(f"Estados finais: {stats['states']} · erros de envio: {stats['errors']}")
+    print(summarize("Envio", stats['submit']))
+    print(summarize("Consulta de estado", stats['poll']))
+    print(summarize("Download de artefato", stats['artifact']))
+    print(summarize("Tempo até concluir", stats['completion']))
+    return 1 if stats['errors'] or stats['states'].get('failed') else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga da API de transcrição")
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--jobs', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=20,
+                        help="Requisições HTTP simultâneas")
+    parser.add_argument('--token', default=None,
+                        help="Valor de TRANSCRIPTION_API_TOKEN, se configurado no servidor")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Benchmark do tempo de importação dos módulos do app (python -X importtime).
+
+Cada módulo é importado em um interpretador novo, --repeat vezes, e a mediana
+do tempo cumulativo é registrada em benchmarks/results/import_time.jsonl junto
+com o commit atual, para acompanhar a evolução do tempo de inicialização.
+A execução é comparada com o último registro da mesma versão do Python e,
+com --max-regression, falha se algum módulo ficou mais lento que o limite.
+
+Uso:
+    python benchmarks/import_time.py [--repeat 5] [--max-regression 20] [--no-record]
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import datetime
+import platform
+import subprocess
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HISTORY_FILE = os.path.join(REPO_DIR, 'benchmarks', 'results', 'import_time.jsonl')
+
+# Módulos carregados na inicialização do app, da CLI e da API
+DEFAULT_MODULES = ('utils', 'pipeline', 'job_queue', 'transcrita_video')
+TOP_IMPORTS = 10  # dependências mais caras listadas por módulo
+# Diferenças abaixo deste valor são consideradas ruído na comparação
+MIN_REGRESSION_MS = 10.0
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def parse_importtime(stderr):
+    """
+    Converte a saída de -X importtime em uma lista de (módulo, nível, próprio µs, cumulativo µs)
+    """
+    entries = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((name, len(indent) // 2, int(self_us), int(cumulative_us)))
+    return entries
+
+
+def direct_imports(entries, module):
+    """
+    Dependências importadas diretamente pelo módulo. O -X importtime lista os
+    filhos antes do pai, então são as entradas de nível 1 entre a entrada de
+    nível 0 anterior (imports da inicialização do interpretador) e o módulo.
+    """
+    children = []
+    for name, level, _, cumulative in entries:
+        if level == 0:
+            if name == module:
+                return children
+            children = []
+        elif level == 1:
+            children.append((name, cumulative))
+    return []
+
+
+def measure_module(module, repeat):
+    """
+    Importa o módulo em processos novos e retorna a mediana e o mínimo do tempo
+    cumulativo (ms) e as dependências diretas mais caras da execução mediana
+    """
+    runs = []
+    for _ in range(repeat):
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=REPO_DIR, capture_output=True, text=True)
+        if process.returncode != 0:
+            raise RuntimeError(
+                f"Falha ao importar {module}: {process.stderr.strip().splitlines()[-1]}")
+        entries = parse_importtime(process.stderr)
+        total = next((cumulative for name, level, _, cumulative in entries
+                      if name == module and level == 0), None)
+        if total is None:
+            raise RuntimeError(f"{module} não aparece na saída de -X importtime")
+        runs.append((total, entries))
+
+    runs.sort(key=lambda run: run[0])
+    median_total, median_entries = runs[len(runs) // 2]
+    top = sorted(direct_imports(median_entries, module),
+                 key=lambda item: item[1], reverse=True)[:TOP_IMPORTS]
+    return {
+        'median_ms': round(median_total / 1000, 1),
+        'min_ms': round(runs[0][0] / 1000, 1),
+        'top': [{'module': name, 'ms': round(cumulative / 1000, 1)} for name, cumulative in top],
+    }
+
+
+def current_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                               cwd=REPO_DIR, capture_output=True, text=True).stdout.strip()
+        return f"{commit}-dirty" if dirty else commit
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_previous(python_version):
+    if not os.path.exists(HISTORY_FILE):
+        return None
+    previous = None
+    with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if record.get('python') == python_version:
+                previous = record
+    return previous
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede o tempo de importação dos módulos do app")
+    parser.add_argument('modules', nargs='*', default=list(DEFAULT_MODULES))
+    parser.add_argument('--repeat', type=int, default=5,
+                        help="Importações por módulo (usa a mediana)")
+    parser.add_argument('--max-regression', type=float, default=None,
+                        help="Falha se algum módulo ficar mais que este percentual mais lento")
+    parser.add_argument('--no-record', action='store_true',
+                        help="Não grava o resultado no histórico")
+    args = parser.parse_args()
+
+    python_version = platform.python_version()
+    record = {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': current_commit(),
+        'python': python_version,
+        'modules': {},
+    }
+    previous = load_previous(python_version)
+    regressions = []
+
+    for module in args.modules:
+        result = measure_module(module, args.repeat)
+        record['modules'][module] = result
+
+        line = f"{module:<20} {result['median_ms']:>8.1f} ms (mín. {result['min_ms']:.1f} ms)"
+        before = (previous or {}).get('modules', {}).get(module)
+        if before:
+            delta = result['median_ms'] - before['median_ms']
+            percent = delta / before['median_ms'] * 100 if before['median_ms'] else 0.0
+            line += f"  {delta:+.1f} ms ({percent:+.0f}%) vs {previous['commit']}"
+            if args.max_regression is not None and percent > args.max_regression \
+                    and delta > MIN_REGRESSION_MS:
+                regressions.append(module)
+        print(line)
+        for item in result['top'][:5]:
+            print(f"    {item['module']:<40} {item['ms']:>8.1f} ms")
+
+    if not args.no_record:
+        os.makedirs(os.path.dirname(HISTORY_FILE), exist_ok=True)
+        with open(HISTORY_FILE, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    if regressions:
+        print(f"❌ Regressão acima de {args.max_regression:.0f}%: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
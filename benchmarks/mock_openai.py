@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Servidor local que imita os endpoints da OpenAI usados pelo pipeline
+(POST /v1/audio/transcriptions e POST /v1/chat/completions), para benchmarks
+e testes sem rede e sem custo.
+
+A transcrição devolvida é um SRT com uma legenda a cada --cue-seconds,
+cobrindo a duração estimada do áudio enviado (pelo tamanho do arquivo e
+pelo bitrate de fala do pipeline). Cada resposta espera --latency segundos
+(mais --latency-per-mb por MB enviado). GET /stats devolve as contagens de
+chamadas e POST /stats/reset as zera.
+
+Com --rpm, cada endpoint aceita no máximo esse número de requisições por
+minuto (janela deslizante) e responde 429 com Retry-After acima disso, como a
+API real; as respostas trazem os cabeçalhos x-ratelimit-*-requests.
+
+Uso:
+    python benchmarks/mock_openai.py --port 8900 --latency 0.2 [--rpm 60]
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1 OPENAI_API_KEY=mock python transcribe.py video.mp4
+"""
+
+import json
+import math
+import time
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SPEECH_BITRATE = 48000  # bits/s dos chunks gerados pelo pipeline (ver SPEECH_AUDIO_BITRATE)
+RATE_WINDOW = 60.0  # segundos da janela do limite --rpm
+
+
+def _srt_timestamp(seconds):
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+
+
+def fake_srt(duration, cue_seconds):
+    cues = []
+    start = 0.0
+    index = 1
+    while start < duration:
+        end = min(start + cue_seconds, duration)
+        cues.append(f"{index}\n{_srt_timestamp(start)} --> {_srt_timestamp(end)}\n"
+                    f"Trecho simulado número {index} da transcrição.\n")
+        start = end
+        index += 1
+    return "\n".join(cues) + "\n"
+
+
+class MockOpenAIServer:
+    """
+    Servidor em uma thread de fundo. base_url serve para OpenAI(base_url=...)
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, latency_per_mb=0.0, cue_seconds=10,
+                 rpm=None):
+        self.latency = latency
+        self.latency_per_mb = latency_per_mb
+        self.cue_seconds = cue_seconds
+        self.rpm = rpm
+        self._lock = threading.Lock()
+        self.reset()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def reset(self):
+        with self._lock:
+            self.stats = {'transcriptions': 0, 'chat_completions': 0, 'bytes_uploaded': 0,
+                          'concurrent_max': 0, 'rate_limited': 0}
+            self._concurrent = 0
+            self._requests = {}  # endpoint -> instantes das requisições aceitas
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mock-openai",
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _admit(self, counter):
+        """
+        Aplica o limite --rpm a um endpoint. Retorna (aceita, cabeçalhos de
+        limite, segundos até liberar uma vaga)
+        """
+        if not self.rpm:
+            return True, {}, 0
+        with self._lock:
+            now = time.monotonic()
+            window = self._requests.setdefault(counter, deque())
+            while window and now - window[0] >= RATE_WINDOW:
+                window.popleft()
+            accepted = len(window) < self.rpm
+            if accepted:
+                window.append(now)
+            else:
+                self.stats['rate_limited'] += 1
+            reset = window[0] + RATE_WINDOW - now if window else 0
+            headers = {
+                'x-ratelimit-limit-requests': str(self.rpm),
+                'x-ratelimit-remaining-requests': str(self.rpm - len(window)),
+                'x-ratelimit-reset-requests': f"{reset:.3f}s",
+            }
+            return accepted, headers, reset
+
+    def _enter(self, counter, uploaded=0):
+        with self._lock:
+            self.stats[counter] += 1
+            self.stats['bytes_uploaded'] += uploaded
+            self._concurrent += 1
+            self.stats['concurrent_max'] = max(self.stats['concurrent_max'], self._concurrent)
+
+    def _leave(self):
+        with self._lock:
+            self._concurrent -= 1
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _send(self, status, body, content_type, headers=None):
+                data = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _rate_limited(self, counter):
+                """
+                Responde 429 se o endpoint passou do limite; senão retorna os
+                cabeçalhos de limite para a resposta normal
+                """
+                accepted, headers, reset = server._admit(counter)
+                if accepted:
+                    return headers
+                headers['retry-after'] = str(max(1, math.ceil(reset)))
+                self._send(429, json.dumps({'error': {
+                    'message': f"Rate limit reached: {server.rpm} requests per minute",
+                    'type': 'requests', 'code': 'rate_limit_exceeded'}}),
+                    'application/json', headers)
+                return None
+
+            def _read_body(self):
+                return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+            def do_GET(self):
+                if self.path == '/stats':
+                    self._send(200, json.dumps(server.snapshot()), 'application/json')
+                else:
+                    self._send(404, '{"error": "not found"}', 'application/json')
+
+            def do_POST(self):
+                body = self._read_body()
+                path = self.path.split('?')[0]
+                if path == '/stats/reset':
+                    server.reset()
+                    self._send(200, '{}', 'application/json')
+                elif path.endswith('/audio/transcriptions'):
+                    self._transcription(body)
+                elif path.endswith('/chat/completions'):
+                    self._chat(body)
+                else:
+                    self._send(404, '{"error": "not found"}', 'application/json')
+
+            def _transcription(self, body):
+                headers = self._rate_limited('transcriptions')
+                if headers is None:
+                    return
+                server._enter('transcriptions', len(body))
+                try:
+                    time.sleep(server.latency + server.latency_per_mb * len(body) / (1024 * 1024))
+                    duration = len(body) * 8 / SPEECH_BITRATE
+                    self._send(200, fake_srt(duration, server.cue_seconds), 'text/plain', headers)
+                finally:
+                    server._leave()
+
+            def _chat(self, body):
+                headers = self._rate_limited('chat_completions')
+                if headers is None:
+                    return
+                server._enter('chat_completions', len(body))
+                try:
+                    time.sleep(server.latency)
+                    request = json.loads(body or b'{}')
+                    prompt_chars = sum(len(message.get('content') or '')
+                                       for message in request.get('messages', []))
+                    content = "Tópico simulado: Resumo sintético do trecho enviado."
+                    self._send(200, json.dumps({
+                        'id': 'chatcmpl-mock',
+                        'object': 'chat.completion',
+                        'created': int(time.time()),
+                        'model': request.get('model', 'mock'),
+                        'choices': [{
+                            'index': 0,
+                            'message': {'role': 'assistant', 'content': content},
+                            'finish_reason': 'stop',
+                        }],
+                        'usage': {
+                            'prompt_tokens': prompt_chars // 4,
+                            'completion_tokens': len(content) // 4,
+                            'total_tokens': prompt_chars // 4 + len(content) // 4,
+                        },
+                    }), 'application/json', headers)
+                finally:
+                    server._leave()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local que imita a API da OpenAI")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency', type=float, default=0.2,
+                        help="Segundos de espera por resposta")
+    parser.add_argument('--latency-per-mb', type=float, default=0.0,
+                        help="Segundos extras por MB de áudio enviado")
+    parser.add_argument('--cue-seconds', type=float, default=10,
+                        help="Duração de cada legenda do SRT simulado")
+    parser.add_argument('--rpm', type=int, default=None,
+                        help="Requisições por minuto aceitas por endpoint (429 acima disso)")
+    args = parser.parse_args()
+
+    server = MockOpenAIServer(args.host, args.port, args.latency, args.latency_per_mb,
+                              args.cue_seconds, args.rpm).start()
+    print(f"API simulada da OpenAI em {server.base_url}")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
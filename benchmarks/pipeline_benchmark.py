@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Benchmark de ponta a ponta do pipeline com mídia sintética e a API da
+OpenAI simulada (benchmarks/mock_openai.py). Roda sem rede, só com CPU.
+
+Para cada cenário, um vídeo ou áudio sintético (tons e ruído modulado com
+cadência de fala) é gerado com o ffmpeg e passa por transcribe_source
+(sondagem, extração, divisão em chunks, transcrição e resumo) e
+write_transcription_files (PDFs e SRTs). Cada execução roda em um processo
+novo, o que isola as medidas:
+
+- duração de cada etapa (ver metrics.timed_stage) e o tempo total;
+- pico de memória (RSS) do processo e dos subprocessos do ffmpeg;
+- pico de disco ocupado pelos diretórios de trabalho (ver workspace.py);
+- chamadas e bytes enviados à API simulada.
+
+O resultado é gravado em benchmarks/results/pipeline_benchmark.jsonl e
+comparado com o último registro equivalente; com --max-regression a
+execução falha se o tempo, a memória ou o disco pioraram além do limite.
+
+Com --memory-cap-mb, o pipeline roda no modo de memória limitada (ver
+memory_limit.py) e a execução falha se o pico de RSS do processo ou do
+ffmpeg passar do teto, por exemplo para uma gravação de 6 horas:
+    python benchmarks/pipeline_benchmark.py --scenario audio:21600 --memory-cap-mb 160
+
+Uso:
+    python benchmarks/pipeline_benchmark.py [--scenario video:120] [--scenario audio:2700]
+        [--api-latency 0.05] [--api-rpm 60] [--max-regression 25] [--memory-cap-mb 160]
+        [--no-record]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import datetime
+import platform
+import resource
+import tempfile
+import threading
+import subprocess
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+HISTORY_FILE = os.path.join(REPO_DIR, 'benchmarks', 'results', 'pipeline_benchmark.jsonl')
+MEDIA_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'transcricao_bench_media')
+DEFAULT_SCENARIOS = ('video:120', 'audio:2700')
+DISK_SAMPLE_INTERVAL = 0.05  # segundos entre medições do disco ocupado
+# Diferenças relativas só contam como regressão acima destes valores absolutos
+MIN_REGRESSION = {'wall_seconds': 1.0, 'peak_rss_mb': 20.0, 'disk_peak_mb': 5.0}
+
+
+def parse_scenario(value):
+    kind, _, seconds = value.partition(':')
+    if kind not in ('video', 'audio') or not seconds.isdigit():
+        raise argparse.ArgumentTypeError(
+            f"Cenário inválido '{value}': use video:<segundos> ou audio:<segundos>")
+    return kind, int(seconds)
+
+
+def generate_media(ffmpeg, kind, seconds):
+    """
+    Gera (ou reaproveita do cache) a mídia sintética de um cenário: tom com
+    vibrato somado a ruído rosa modulado em ~4 Hz, a cadência das sílabas
+    """
+    os.makedirs(MEDIA_CACHE_DIR, exist_ok=True)
+    extension = 'mp4' if kind == 'video' else 'm4a'
+    path = os.path.join(MEDIA_CACHE_DIR, f"{kind}_{seconds}s.{extension}")
+    if os.path.exists(path):
+        return path
+
+    audio = (f"sine=frequency=220:sample_rate=44100:duration={seconds},vibrato=f=5:d=0.5[tone];"
+             f"anoisesrc=color=pink:sample_rate=44100:amplitude=0.3:duration={seconds},"
+             f"tremolo=f=4:d=0.9[noise];[tone][noise]amix=inputs=2[a]")
+    command = [ffmpeg, '-hide_banner', '-loglevel', 'error', '-y']
+    if kind == 'video':
+        command += ['-f', 'lavfi', '-i', f"testsrc2=size=320x240:rate=10:duration={seconds}",
+                    '-filter_complex', audio, '-map', '0:v', '-map', '[a]',
+                    '-c:v', 'libx264', '-preset', 'ultrafast', '-c:a', 'aac', '-b:a', '128k']
+    else:
+        command += ['-filter_complex', audio, '-map', '[a]', '-c:a', 'aac', '-b:a', '128k']
+    temp_path = f"{path}.tmp.{extension}"
+    subprocess.run(command + [temp_path], check=True)
+    os.replace(temp_path, path)
+    return path
+
+
+def _directory_size(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, filename)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def run_child(media_path, base_url, work_root):
+    """
+    Executa o pipeline neste processo (chamado em um processo novo) e
+    imprime as medidas em JSON na última linha
+    """
+    # Todos os temporários (diretórios de trabalho inclusive) ficam em work_root
+    os.environ['TRANSCRIPTION_WORKSPACE_DIR'] = os.path.join(work_root, 'workspaces')
+    tempfile.tempdir = work_root
+
+    from events import PipelineEvents
+    from openai_clients import get_openai_client
+    from pipeline import transcribe_source, write_transcription_files
+
+    class BenchmarkEvents(PipelineEvents):
+        def __init__(self):
+            self.timeline = []
+
+        def timing(self, record):
+            self.timeline.append(record)
+
+    disk_peak = [0]
+    stop = threading.Event()
+
+    def sample_disk():
+        while not stop.wait(DISK_SAMPLE_INTERVAL):
+            disk_peak[0] = max(disk_peak[0], _directory_size(work_root))
+
+    sampler = threading.Thread(target=sample_disk, daemon=True)
+    sampler.start()
+
+    events = BenchmarkEvents()
+    client = get_openai_client('benchmark', base_url=base_url)
+    started = time.perf_counter()
+    result = transcribe_source(media_path, client, 'gpt-4o-mini', events=events)
+    write_transcription_files(result, os.path.join(work_root, 'saida'), events=events)
+    wall_seconds = time.perf_counter() - started
+    stop.set()
+    sampler.join()
+    disk_peak[0] = max(disk_peak[0], _directory_size(work_root))
+
+    stages = {}
+    for record in events.timeline:
+        stage = stages.setdefault(record['stage'], {'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+        stage['calls'] += 1
+        stage['seconds'] = round(stage['seconds'] + record['seconds'], 3)
+        stage['max_seconds'] = max(stage['max_seconds'], record['seconds'])
+
+    # ru_maxrss é em KB no Linux
+    print(json.dumps({
+        'wall_seconds': round(wall_seconds, 3),
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'ffmpeg_peak_rss_mb': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+        'disk_peak_mb': round(disk_peak[0] / (1024 * 1024), 1),
+        'stages': stages,
+        'srt_cues': result['srt'].count(' --> '),
+    }))
+
+
+def run_scenario(server, ffmpeg, kind, seconds, memory_cap_mb=None):
+    media_path = generate_media(ffmpeg, kind, seconds)
+    server.reset()
+    work_root = tempfile.mkdtemp(prefix='transcricao_bench_')
+    env = dict(os.environ)
+    if memory_cap_mb:
+        env['TRANSCRIPTION_MEMORY_LIMIT_MB'] = str(memory_cap_mb)
+    try:
+        process = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--child', media_path,
+             '--base-url', server.base_url, '--work-root', work_root],
+            cwd=REPO_DIR, capture_output=True, text=True, env=env)
+        if process.returncode != 0:
+            raise RuntimeError(
+                f"Cenário {kind}:{seconds} falhou:\n{process.stderr.strip()[-2000:]}")
+        measures = json.loads(process.stdout.strip().splitlines()[-1])
+    finally:
+        shutil.rmtree(work_root, ignore_errors=True)
+    measures['media_mb'] = round(os.path.getsize(media_path) / (1024 * 1024), 1)
+    measures['api'] = server.snapshot()
+    return measures
+
+
+def current_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                               cwd=REPO_DIR, capture_output=True, text=True).stdout.strip()
+        return f"{commit}-dirty" if dirty else commit
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_previous(python_version, api_latency, api_rpm=None):
+    if not os.path.exists(HISTORY_FILE):
+        return None
+    previous = None
+    with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if (record.get('python') == python_version and record.get('api_latency') == api_latency
+                    and record.get('api_rpm') == api_rpm):
+                previous = record
+    return previous
+
+
+def print_scenario(name, measures, before):
+    def delta(key):
+        if not before or not before.get(key):
+            return ''
+        change = (measures[key] - before[key]) / before[key] * 100
+        return f" ({change:+.0f}%)"
+
+    api = measures['api']
+    print(f"\n{name} · mídia de {measures['media_mb']} MB")
+    print(f"  tempo total      {measures['wall_seconds']:>8.2f} s{delta('wall_seconds')}")
+    print(f"  pico de RSS      {measures['peak_rss_mb']:>8.1f} MB{delta('peak_rss_mb')}"
+          f" · ffmpeg {measures['ffmpeg_peak_rss_mb']:.1f} MB")
+    print(f"  pico de disco    {measures['disk_peak_mb']:>8.1f} MB{delta('disk_peak_mb')}")
+    print(f"  API              {api['transcriptions']} transcrição(ões), "
+          f"{api['chat_completions']} resumo(s), "
+          f"{api['bytes_uploaded'] / (1024 * 1024):.1f} MB enviados, "
+          f"até {api['concurrent_max']} simultânea(s)"
+          + (f", {api['rate_limited']} recusada(s) por limite" if api.get('rate_limited') else ''))
+    for stage, values in sorted(measures['stages'].items(), key=lambda item: -item[1]['seconds']):
+        print(f"    {stage:<14} {values['seconds']:>8.2f} s em {values['calls']} chamada(s)"
+              f" · máx. {values['max_seconds']:.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline de transcrição")
+    parser.add_argument('--scenario', action='append', type=parse_scenario,
+                        help="video:<segundos> ou audio:<segundos> (pode repetir)")
+    parser.add_argument('--api-latency', type=float, default=0.05,
+                        help="Segundos de espera de cada resposta da API simulada")
+    parser.add_argument('--api-rpm', type=int, default=None,
+                        help="Limite de requisições por minuto da API simulada (429 acima disso)")
+    parser.add_argument('--max-regression', type=float, default=None,
+                        help="Falha se tempo, memória ou disco piorarem mais que este percentual")
+    parser.add_argument('--memory-cap-mb', type=float, default=None,
+                        help="Roda no modo de memória limitada e falha se o pico de RSS passar deste teto")
+    parser.add_argument('--no-record', action='store_true',
+                        help="Não grava o resultado no histórico")
+    # Modo interno: execução de um cenário em um processo novo
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--base-url', help=argparse.SUPPRESS)
+    parser.add_argument('--work-root', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.base_url, args.work_root)
+        return 0
+
+    from utils import get_ffmpeg_binary
+    from mock_openai import MockOpenAIServer
+
+    scenarios = args.scenario or [parse_scenario(value) for value in DEFAULT_SCENARIOS]
+    python_version = platform.python_version()
+    record = {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': current_commit(),
+        'python': python_version,
+        'api_latency': args.api_latency,
+        'api_rpm': args.api_rpm,
+        'memory_cap_mb': args.memory_cap_mb,
+        'scenarios': {},
+    }
+    previous = load_previous(python_version, args.api_latency, args.api_rpm)
+    regressions = []
+    over_cap = []
+
+    server = MockOpenAIServer(latency=args.api_latency, rpm=args.api_rpm).start()
+    try:
+        for kind, seconds in scenarios:
+            name = f"{kind}:{seconds}"
+            measures = run_scenario(server, get_ffmpeg_binary(), kind, seconds,
+                                    args.memory_cap_mb)
+            record['scenarios'][name] = measures
+            before = (previous or {}).get('scenarios', {}).get(name)
+            print_scenario(name, measures, before)
+
+            if args.memory_cap_mb:
+                for key in ('peak_rss_mb', 'ffmpeg_peak_rss_mb'):
+                    if measures[key] > args.memory_cap_mb:
+                        over_cap.append(f"{name} {key} {measures[key]:.0f} MB")
+
+            if before and args.max_regression is not None:
+                for key, minimum in MIN_REGRESSION.items():
+                    if not before.get(key):
+                        continue
+                    change = measures[key] - before[key]
+                    if change > minimum and change / before[key] * 100 > args.max_regression:
+                        regressions.append(f"{name} {key}")
+    finally:
+        server.stop()
+
+    if not args.no_record:
+        os.makedirs(os.path.dirname(HISTORY_FILE), exist_ok=True)
+        with open(HISTORY_FILE, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    if over_cap:
+        print(f"\n❌ Acima do teto de {args.memory_cap_mb:.0f} MB: {', '.join(over_cap)}")
+    if regressions:
+        print(f"\n❌ Regressão acima de {args.max_regression:.0f}%: {', '.join(regressions)}")
+    return 1 if over_cap or regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
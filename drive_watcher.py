@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Observador de pastas do Google Drive
+Transcreve automaticamente vídeos novos colocados nas pastas configuradas,
+usando o feed de alterações do Drive (changes) em vez de varrer as pastas.
+
+Uso:
+    python drive_watcher.py --folder <URL ou ID da pasta> [--folder ...] [--interval 60]
+"""
+
+import os
+import json
+import time
+import logging
+import argparse
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+WATCHER_STATE_FILE = 'drive_watcher_state.json'
+DEFAULT_POLL_INTERVAL = 60  # segundos
+MAX_SEEN_IDS = 5000  # limite de IDs lembrados no arquivo de estado
+MAX_FOLDER_DEPTH = 10  # profundidade máxima de subpastas observadas
+MAX_VIDEO_ATTEMPTS = 3  # transcrições que falharam antes de desistir de um vídeo
+
+CHANGE_FIELDS = ('nextPageToken, newStartPageToken, '
+                 'changes(fileId, removed, file(id, name, mimeType, parents, trashed, size, createdTime, '
+                 'md5Checksum, headRevisionId))')
+
+
+class DriveWatcher:
+    """
+    Acompanha o feed de alterações do Drive e chama on_new_video(file) para
+    cada vídeo novo que aparecer (direta ou indiretamente) nas pastas observadas.
+    Se on_new_video retornar um Future (processamento em segundo plano) e ele
+    terminar com erro, o vídeo é reenviado na próxima consulta, até
+    MAX_VIDEO_ATTEMPTS tentativas.
+
+    O page token do feed, os IDs já enviados e os vídeos a reenviar ficam em
+    state_path, de modo que o observador retoma de onde parou após reiniciar.
+    """
+
+    def __init__(self, service, folder_ids, on_new_video, state_path=WATCHER_STATE_FILE,
+                 skip_transcribed=True):
+        self.service = service
+        self.folder_ids = set(folder_ids)
+        self.on_new_video = on_new_video
+        self.state_path = state_path
+        self.skip_transcribed = skip_transcribed
+        self._parents_cache = {}
+        # O estado também é alterado pelas threads que processam os vídeos
+        self._lock = threading.RLock()
+        self.state = self._load_state()
+
+    def _load_state(self):
+        if os.path.exists(self.state_path):
+            try:
+                with open(self.state_path, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+                return {
+                    'page_token': state.get('page_token'),
+                    'seen_ids': list(state.get('seen_ids', [])),
+                    'retry': list(state.get('retry', [])),
+                    'failures': dict(state.get('failures', {}))
+                }
+            except Exception as e:
+                logger.warning(
+                    f"Estado do observador inválido em {self.state_path}: {str(e)}")
+        return {'page_token': None, 'seen_ids': [], 'retry': [], 'failures': {}}
+
+    def _save_state(self):
+        with self._lock:
+            self.state['seen_ids'] = self.state['seen_ids'][-MAX_SEEN_IDS:]
+            tmp_path = f"{self.state_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.state, f)
+            os.replace(tmp_path, self.state_path)
+
+    def _get_parents(self, file_id):
+        if file_id not in self._parents_cache:
+            try:
+                metadata = self.service.files().get(
+                    fileId=file_id,
+                    fields='parents',
+                    supportsAllDrives=True
+                ).execute()
+                self._parents_cache[file_id] = metadata.get('parents', [])
+            except Exception as e:
+                logger.warning(
+                    f"Não foi possível obter as pastas pai de {file_id}: {str(e)}")
+                return []
+        return self._parents_cache[file_id]
+
+    def is_in_watched_folder(self, parents):
+        """
+        Verifica se alguma das pastas pai (ou ancestrais) está sendo observada
+        """
+        frontier = list(parents or [])
+        visited = set()
+        for _ in range(MAX_FOLDER_DEPTH):
+            if not frontier:
+                return False
+            if self.folder_ids.intersection(frontier):
+                return True
+            next_frontier = []
+            for folder_id in frontier:
+                if folder_id in visited:
+                    continue
+                visited.add(folder_id)
+                next_frontier.extend(self._get_parents(folder_id))
+            frontier = next_frontier
+        return False
+
+    def _is_candidate(self, change):
+        file = change.get('file')
+        if change.get('removed') or not file:
+            return False
+        if file.get('trashed'):
+            return False
+        if not file.get('mimeType', '').startswith('video/'):
+            return False
+        if file['id'] in self.state['seen_ids']:
+            return False
+        return self.is_in_watched_folder(file.get('parents'))
+
+    def _already_transcribed(self, file):
+        from utils import list_transcribed_basenames, output_basename_from_filename
+
+        parents = file.get('parents') or []
+        if not parents:
+            return False
+        try:
+            transcribed = list_transcribed_basenames(self.service, parents[0])
+        except Exception as e:
+            logger.warning(
+                f"Não foi possível verificar transcrições existentes: {str(e)}")
+            return False
+        return output_basename_from_filename(file['name']) in transcribed
+
+    def _retry_later(self, file):
+        with self._lock:
+            if file not in self.state['retry']:
+                self.state['retry'].append(file)
+
+    def _submit(self, file):
+        try:
+            outcome = self.on_new_video(file)
+        except Exception as e:
+            logger.exception(
+                f"Erro ao enviar '{file.get('name')}' para transcrição: {str(e)}")
+            self._retry_later(file)
+            return False
+        with self._lock:
+            if file['id'] not in self.state['seen_ids']:
+                self.state['seen_ids'].append(file['id'])
+        if isinstance(outcome, Future):
+            outcome.add_done_callback(functools.partial(self._on_processed, file))
+        return True
+
+    def _on_processed(self, file, future):
+        """
+        Chamado quando o processamento de um vídeo termina: em caso de erro, o
+        vídeo volta para a lista de reenvio (até MAX_VIDEO_ATTEMPTS tentativas)
+        """
+        error = future.exception() if not future.cancelled() else None
+        with self._lock:
+            if error is None:
+                self.state['failures'].pop(file['id'], None)
+            else:
+                attempts = self.state['failures'].get(file['id'], 0) + 1
+                if attempts >= MAX_VIDEO_ATTEMPTS:
+                    self.state['failures'].pop(file['id'], None)
+                    logger.error(
+                        f"'{file.get('name')}' falhou {attempts} vez(es), não será reenviado")
+                else:
+                    self.state['failures'][file['id']] = attempts
+                    self._retry_later(file)
+                    logger.warning(
+                        f"'{file.get('name')}' será reenviado na próxima consulta "
+                        f"(tentativa {attempts + 1} de {MAX_VIDEO_ATTEMPTS})")
+            self._save_state()
+
+    def poll_once(self):
+        """
+        Lê as alterações desde o último page token e envia os vídeos novos.
+        Retorna a lista de arquivos enviados.
+        """
+        if not self.state['page_token']:
+            # Primeira execução: começa a partir de agora, sem reprocessar o histórico
+            response = self.service.changes().getStartPageToken(
+                supportsAllDrives=True).execute()
+            self.state['page_token'] = response['startPageToken']
+            self._save_state()
+            logger.info("Observador iniciado a partir do estado atual do Drive")
+            return []
+
+        submitted = []
+
+        # Reenviar vídeos cujo envio falhou na rodada anterior
+        with self._lock:
+            retry, self.state['retry'] = self.state['retry'], []
+        for file in retry:
+            if self._submit(file):
+                submitted.append(file)
+
+        page_token = self.state['page_token']
+        while page_token:
+            response = self.service.changes().list(
+                pageToken=page_token,
+                spaces='drive',
+                includeItemsFromAllDrives=True,
+                supportsAllDrives=True,
+                includeRemoved=False,
+                pageSize=1000,
+                fields=CHANGE_FIELDS
+            ).execute()
+
+            for change in response.get('changes', []):
+                if not self._is_candidate(change):
+                    continue
+                file = change['file']
+                if self.skip_transcribed and self._already_transcribed(file):
+                    logger.info(f"'{file['name']}' já possui transcrição, ignorando")
+                    with self._lock:
+                        self.state['seen_ids'].append(file['id'])
+                    continue
+                logger.info(f"Novo vídeo detectado: '{file['name']}' ({file['id']})")
+                if self._submit(file):
+                    submitted.append(file)
+
+            if 'newStartPageToken' in response:
+                self.state['page_token'] = response['newStartPageToken']
+                break
+            page_token = response.get('nextPageToken')
+            self.state['page_token'] = page_token
+
+            # Salvar a cada página para não reprocessar alterações após uma falha
+            self._save_state()
+
+        self._save_state()
+        return submitted
+
+    def run_forever(self, interval=DEFAULT_POLL_INTERVAL):
+        while True:
+            try:
+                self.poll_once()
+            except Exception as e:
+                logger.exception(f"Erro ao consultar alterações do Drive: {str(e)}")
+            time.sleep(interval)
+
+
+def make_pipeline_submitter(drive_service, model, max_workers):
+    """
+    Cria um on_new_video que envia cada vídeo para o pipeline de transcrição
+    em um pool de threads e retorna o Future do processamento
+    """
+    from openai_clients import get_openai_client
+    from pipeline import transcribe_drive_video_job
+    from history_store import get_history_store
+
+    client = get_openai_client(os.getenv("OPENAI_API_KEY"))
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def run(file):
+        try:
+            result = transcribe_drive_video_job(drive_service, file, client, model,
+                                                history=get_history_store())
+            logger.info(
+                f"'{file['name']}' transcrito em {result['seconds']:.0f}s")
+        except Exception as e:
+            logger.exception(f"Erro ao transcrever '{file['name']}': {str(e)}")
+            raise
+
+    def on_new_video(file):
+        return executor.submit(run, file)
+
+    return on_new_video
+
+
+def main():
+    from dotenv import load_dotenv, find_dotenv
+    from utils import get_drive_service, get_folder_id_from_url
+
+    _ = load_dotenv(find_dotenv())
+
+    parser = argparse.ArgumentParser(
+        description="Transcreve automaticamente vídeos novos em pastas do Google Drive")
+    parser.add_argument('--folder', action='append', required=True,
+                        help="URL ou ID de uma pasta observada (pode repetir)")
+    parser.add_argument('--interval', type=int, default=DEFAULT_POLL_INTERVAL,
+                        help="Intervalo entre consultas, em segundos")
+    parser.add_argument('--workers', type=int, default=2,
+                        help="Vídeos transcritos em paralelo")
+    parser.add_argument('--model', default='gpt-4o-mini',
+                        help="Modelo OpenAI usado nos resumos")
+    parser.add_argument('--state', default=WATCHER_STATE_FILE,
+                        help="Arquivo onde o page token é persistido")
+    args = parser.parse_args()
+
+    folder_ids = [get_folder_id_from_url(folder) or folder for folder in args.folder]
+
+    drive_service = get_drive_service()
+    if not drive_service:
+        print("❌ Não foi possível conectar ao Google Drive. Execute 'python setup_drive.py'.")
+        return
+
+    watcher = DriveWatcher(
+        drive_service,
+        folder_ids,
+        make_pipeline_submitter(drive_service, args.model, args.workers),
+        state_path=args.state
+    )
+    print(f"👀 Observando {len(folder_ids)} pasta(s) a cada {args.interval}s...")
+    watcher.run_forever(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Interface de eventos do pipeline de transcrição.
+
+As funções do pipeline não falam diretamente com nenhuma interface: recebem
+um objeto PipelineEvents e chamam seus métodos. A implementação padrão apenas
+registra no log; o app Streamlit, a CLI e a API fornecem as suas.
+"""
+
+import logging
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+class PipelineEvents:
+    """
+    Recebe mensagens e progresso do pipeline. Os métodos podem ser chamados a
+    partir de threads de trabalho; implementações que só funcionam na thread
+    principal (ex.: Streamlit) não devem ser repassadas a essas threads.
+    """
+
+    def info(self, message):
+        logger.info(message)
+
+    def success(self, message):
+        logger.info(message)
+
+    def warning(self, message):
+        logger.warning(message)
+
+    def error(self, message):
+        logger.error(message)
+
+    def progress(self, stage, done, total=None, message=None):
+        """
+        Progresso de uma etapa (ex.: 'download', 'transcricao'), em unidades
+        da própria etapa (bytes, segundos de áudio, chunks...)
+        """
+        pass
+
+    def transcript_chunk(self, srt, start, end):
+        """
+        Um chunk da transcrição ficou pronto, antes do fim da etapa: srt com
+        os tempos já ajustados ao áudio inteiro, cobrindo de start a end
+        (segundos; end é None se a duração for desconhecida). Os chunks
+        chegam em ordem.
+        """
+        pass
+
+    def timing(self, record):
+        """
+        Uma etapa medida terminou (ver metrics.timed_stage). record tem
+        'stage', 'started_at', 'seconds' e os detalhes anotados pela etapa
+        (bytes, tokens, chunk, 'error'...)
+        """
+        logger.debug(f"Etapa {record['stage']} em {record['seconds']:.3f}s: {record}")
+
+
+# Instância usada quando nenhuma interface é informada
+DEFAULT_EVENTS = PipelineEvents()
@@ -0,0 +1,293 @@
+"""
+Histórico persistente de transcrições (SQLite, textos comprimidos com zlib).
+
+Cada transcrição concluída é guardada pela identidade da fonte: ID do vídeo
+no YouTube ou no Vimeo, ID e versão do arquivo no Google Drive, objeto e
+geração no Cloud Storage ou, para arquivos locais, enviados pelo app e
+baixados de outras URLs, o hash SHA-256 do conteúdo. A mesma fonte pedida de
+novo (no app, na fila, na CLI ou no observador do Drive) é aberta do
+histórico, sem download nem chamadas à OpenAI; uma fonte substituída no
+mesmo endereço tem outra identidade e é transcrita de novo.
+
+O resumo depende do modelo, então a chave é a identidade da fonte mais o
+modelo do resumo. Além dos textos, o histórico guarda os caminhos dos
+arquivos gerados (artefatos), reaproveitados enquanto existirem no disco.
+
+Uma entrada pertence a todos os usuários que a transcreveram ou a
+reaproveitaram (tabela transcription_owners): cada um a vê no seu histórico,
+e guardá-la de novo, inclusive sem usuário (observador do Drive, lotes),
+não a tira de quem já a tinha.
+"""
+
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import logging
+import threading
+from contextlib import closing
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+HISTORY_DB_PATH = os.getenv('TRANSCRIPTION_HISTORY_DB', 'transcription_history.db')
+HISTORY_COMPRESSION_LEVEL = 6
+HASH_BLOCK_SIZE = 1024 * 1024  # bytes lidos por vez no cálculo do hash
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcriptions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source_key TEXT NOT NULL,
+    model TEXT NOT NULL,
+    source TEXT NOT NULL,
+    owner TEXT,
+    name TEXT NOT NULL,
+    title TEXT,
+    duration REAL,
+    srt BLOB NOT NULL,
+    summary_srt BLOB,
+    summary_text BLOB,
+    artifacts TEXT,
+    created_at REAL NOT NULL,
+    reused_at REAL,
+    UNIQUE (source_key, model)
+);
+CREATE INDEX IF NOT EXISTS transcriptions_owner_created ON transcriptions (owner, created_at);
+CREATE TABLE IF NOT EXISTS transcription_owners (
+    entry_id INTEGER NOT NULL REFERENCES transcriptions (id) ON DELETE CASCADE,
+    owner TEXT NOT NULL,
+    PRIMARY KEY (entry_id, owner)
+);
+CREATE INDEX IF NOT EXISTS transcription_owners_owner ON transcription_owners (owner);
+"""
+
+# Colunas da listagem (sem os textos); owner é quem transcreveu primeiro
+_SUMMARY_COLUMNS = "id, source_key, model, source, owner, name, title, duration, created_at, reused_at"
+
+
+def file_sha256(fileobj):
+    """
+    Hash SHA-256 do conteúdo de um arquivo aberto (lido em blocos, do início)
+    """
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for block in iter(lambda: fileobj.read(HASH_BLOCK_SIZE), b''):
+        digest.update(block)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def source_identity(source):
+    """
+    Identidade de uma fonte que pode ser calculada sem consultar a origem:
+    'youtube:<ID>', 'vimeo:<ID>' ou 'sha256:<hash>' para arquivos locais.
+    Arquivos do Drive, objetos do Cloud Storage e outras URLs podem ser
+    substituídos mantendo o endereço; a identidade deles inclui a versão (ver
+    drive_identity, gcs_identity e, para URLs, o hash do arquivo baixado),
+    obtida pelo pipeline, e aqui retorna None. Também None se não for possível
+    identificar a fonte (ex.: arquivo local inexistente).
+    """
+    from utils import get_youtube_video_id, extrair_video_id
+
+    source = source.strip()
+    if 'youtube.com/' in source or 'youtu.be/' in source:
+        video_id = get_youtube_video_id(source)
+        return f"youtube:{video_id}" if video_id else None
+    if 'vimeo.com/' in source:
+        video_id = extrair_video_id(source)
+        return f"vimeo:{video_id}" if video_id else None
+    if (source.startswith(('drive:', 'gs://', 'http://', 'https://'))
+            or 'drive.google.com/' in source):
+        return None
+    if os.path.isfile(source):
+        with open(source, 'rb') as f:
+            return f"sha256:{file_sha256(f)}"
+    return None
+
+
+def drive_identity(metadata):
+    """
+    'drive:<ID>@<versão>' a partir dos metadados de um arquivo do Drive
+    (md5Checksum ou, na falta dele, headRevisionId). None se o arquivo não
+    tiver versão (ex.: documentos do Google).
+    """
+    version = metadata.get('md5Checksum') or metadata.get('headRevisionId')
+    return f"drive:{metadata['id']}@{version}" if version else None
+
+
+def gcs_identity(bucket, object_name, generation):
+    """
+    'gcs:<bucket>/<objeto>#<geração>': a geração muda a cada vez que o
+    objeto é substituído
+    """
+    return f"gcs:{bucket}/{object_name}#{generation}"
+
+
+def _compress(text):
+    if text is None:
+        return None
+    return zlib.compress(text.encode('utf-8'), HISTORY_COMPRESSION_LEVEL)
+
+
+def _decompress(blob):
+    if blob is None:
+        return None
+    return zlib.decompress(blob).decode('utf-8')
+
+
+class HistoryStore:
+    """
+    Histórico de transcrições em um arquivo SQLite. Pode ser usado por várias
+    threads e por vários processos ao mesmo tempo.
+    """
+
+    def __init__(self, db_path=HISTORY_DB_PATH):
+        self.db_path = db_path
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            # Bancos anteriores à tabela de usuários: o autor de cada entrada
+            conn.execute(
+                "INSERT OR IGNORE INTO transcription_owners (entry_id, owner) "
+                "SELECT id, owner FROM transcriptions WHERE owner IS NOT NULL")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    @staticmethod
+    def _add_owner(conn, entry_id, owner):
+        if owner is not None:
+            conn.execute(
+                "INSERT OR IGNORE INTO transcription_owners (entry_id, owner) VALUES (?, ?)",
+                (entry_id, owner))
+
+    @staticmethod
+    def _row_to_result(row):
+        """
+        Resultado no formato do pipeline (ver pipeline.build_transcription_result)
+        """
+        artifacts = json.loads(row['artifacts']) if row['artifacts'] else {}
+        return {
+            'name': row['name'],
+            'title': row['title'] or row['name'],
+            'duration': row['duration'] or 0,
+            'srt': _decompress(row['srt']),
+            'summary_srt': _decompress(row['summary_srt']) or '',
+            'summary_text': _decompress(row['summary_text']) or '',
+            'artifacts': artifacts,
+            'history_id': row['id'],
+            'source_key': row['source_key'],
+            'source': row['source'],
+            'model': row['model'],
+            'created_at': row['created_at'],
+        }
+
+    def find(self, source_key, model, owner=None):
+        """
+        Resultado guardado para a fonte e o modelo (None se não houver). Cada
+        resultado encontrado conta como reaproveitamento (reused_at) e passa a
+        pertencer também a owner: quem pede a mesma fonte já tem o vídeo.
+        """
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT * FROM transcriptions WHERE source_key = ? AND model = ?",
+                (source_key, model)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE transcriptions SET reused_at = ? WHERE id = ?",
+                         (time.time(), row['id']))
+            self._add_owner(conn, row['id'], owner)
+        logger.info(f"Transcrição de {source_key} encontrada no histórico ({row['id']})")
+        return self._row_to_result(row)
+
+    def get(self, entry_id, owner=None):
+        """
+        Entrada pelo ID; com owner, apenas se ela pertence a esse usuário
+        """
+        with closing(self._connect()) as conn:
+            if owner is None:
+                row = conn.execute(
+                    "SELECT * FROM transcriptions WHERE id = ?", (entry_id,)).fetchone()
+            else:
+                row = conn.execute(
+                    "SELECT t.* FROM transcriptions t JOIN transcription_owners o "
+                    "ON o.entry_id = t.id WHERE t.id = ? AND o.owner = ?",
+                    (entry_id, owner)).fetchone()
+        return self._row_to_result(row) if row is not None else None
+
+    def save(self, source_key, model, source, result, owner=None):
+        """
+        Guarda (ou substitui) o resultado de uma fonte e retorna o ID da
+        entrada. owner passa a ter a entrada no histórico; os usuários que já
+        a tinham continuam com ela.
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO transcriptions (source_key, model, source, owner, name, title, duration, "
+                "srt, summary_srt, summary_text, artifacts, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (source_key, model) DO UPDATE SET source = excluded.source, "
+                "owner = COALESCE(transcriptions.owner, excluded.owner), "
+                "name = excluded.name, title = excluded.title, "
+                "duration = excluded.duration, srt = excluded.srt, "
+                "summary_srt = excluded.summary_srt, summary_text = excluded.summary_text, "
+                "artifacts = excluded.artifacts, created_at = excluded.created_at",
+                (source_key, model, source, owner, result['name'], result.get('title'),
+                 result.get('duration'), _compress(result['srt']),
+                 _compress(result.get('summary_srt')), _compress(result.get('summary_text')),
+                 json.dumps(result['artifacts']) if result.get('artifacts') else None, now))
+            row = conn.execute(
+                "SELECT id FROM transcriptions WHERE source_key = ? AND model = ?",
+                (source_key, model)).fetchone()
+            self._add_owner(conn, row['id'], owner)
+        logger.info(f"Transcrição de {source_key} guardada no histórico ({row['id']})")
+        return row['id']
+
+    def set_artifacts(self, entry_id, artifacts):
+        """
+        Registra os caminhos dos arquivos gerados ({tipo: caminho}) de uma entrada
+        """
+        with closing(self._connect()) as conn:
+            conn.execute("UPDATE transcriptions SET artifacts = ? WHERE id = ?",
+                         (json.dumps(artifacts), entry_id))
+
+    def list_entries(self, owner=None, limit=50):
+        """
+        Entradas mais recentes primeiro (sem os textos), opcionalmente apenas
+        as que pertencem a um usuário
+        """
+        with closing(self._connect()) as conn:
+            if owner is None:
+                rows = conn.execute(
+                    f"SELECT {_SUMMARY_COLUMNS} FROM transcriptions "
+                    f"ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+            else:
+                rows = conn.execute(
+                    f"SELECT {_SUMMARY_COLUMNS} FROM transcriptions WHERE id IN "
+                    f"(SELECT entry_id FROM transcription_owners WHERE owner = ?) "
+                    f"ORDER BY created_at DESC LIMIT ?", (owner, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    def delete(self, entry_id):
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM transcriptions WHERE id = ?", (entry_id,))
+
+
+_default_store = {'store': None}
+_default_store_lock = threading.Lock()
+
+
+def get_history_store():
+    """
+    HistoryStore compartilhado pelo processo
+    """
+    with _default_store_lock:
+        if _default_store['store'] is None:
+            _default_store['store'] = HistoryStore()
+        return _default_store['store']
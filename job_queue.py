@@ -0,0 +1,666 @@
+#!/usr/bin/env python3
+"""
+Fila persistente de transcrições (SQLite) e pool de workers.
+
+O app Streamlit apenas enfileira jobs e consulta o estado deles; o trabalho
+roda em threads de um JobWorkerPool, fora dos reruns do script, de modo que
+interações com a página ou a queda da conexão do navegador não interrompem a
+transcrição. A fila sobrevive a reinícios: jobs que estavam em execução em um
+processo que morreu voltam para a fila (ver JobQueue.requeue_stale).
+
+Para rodar os workers em um processo separado do app:
+    python job_queue.py --workers 2
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import argparse
+import threading
+from events import PipelineEvents
+from metrics import JOBS_FINISHED, JOB_SECONDS
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+JOB_DB_PATH = os.getenv('TRANSCRIPTION_JOBS_DB', 'transcription_jobs.db')
+JOB_OUTPUT_DIR = os.getenv('TRANSCRIPTION_JOBS_DIR', 'job_outputs')
+DEFAULT_JOB_WORKERS = 2
+JOB_POLL_INTERVAL = 1.0  # segundos entre consultas de workers ociosos
+JOB_PROGRESS_INTERVAL = 1.0  # segundos entre gravações de progresso
+JOB_HEARTBEAT_INTERVAL = 30  # segundos entre heartbeats dos jobs em execução
+JOB_STALE_AFTER = 300  # segundos sem heartbeat para um job em execução voltar à fila
+
+# Estados de um job
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+JOB_STATE_LABELS = {
+    QUEUED: "Na fila",
+    RUNNING: "Em execução",
+    DONE: "Concluído",
+    FAILED: "Falhou",
+    CANCELLED: "Cancelado",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    owner TEXT,
+    source TEXT NOT NULL,
+    name TEXT,
+    model TEXT NOT NULL,
+    params TEXT NOT NULL DEFAULT '{}',
+    state TEXT NOT NULL,
+    stage TEXT,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT,
+    result TEXT,
+    error TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL,
+    timeline TEXT,
+    partial_transcript TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_state_created ON jobs (state, created_at);
+CREATE INDEX IF NOT EXISTS jobs_owner_created ON jobs (owner, created_at);
+"""
+
+
+class JobCancelled(Exception):
+    """
+    Levantada dentro de um job quando o cancelamento foi pedido
+    """
+
+
+class JobQueue:
+    """
+    Fila de jobs de transcrição em um arquivo SQLite. Pode ser usada por
+    várias threads e por vários processos ao mesmo tempo.
+    """
+
+    def __init__(self, db_path=JOB_DB_PATH):
+        self.db_path = db_path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            # Bancos criados antes da linha do tempo por etapa
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if 'timeline' not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN timeline TEXT")
+            if 'partial_transcript' not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN partial_transcript TEXT")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return _ClosingConnection(conn)
+
+    @staticmethod
+    def _row_to_job(row):
+        if row is None:
+            return None
+        job = dict(row)
+        job['params'] = json.loads(job['params'] or '{}')
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        job['timeline'] = json.loads(job['timeline']) if job['timeline'] else []
+        job['cancel_requested'] = bool(job['cancel_requested'])
+        return job
+
+    def submit(self, source, model, owner=None, name=None, params=None, job_id=None):
+        """
+        Enfileira um job e retorna o seu ID (gerado aqui se não for informado)
+        """
+        job_id = job_id or uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, owner, source, name, model, params, state, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, owner, source, name, model, json.dumps(params or {}), QUEUED, time.time()))
+        logger.info(f"Job {job_id} enfileirado: {source}")
+        return job_id
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row)
+
+    def list_jobs(self, owner=None, limit=50):
+        """
+        Jobs mais recentes primeiro, opcionalmente apenas os de um usuário
+        """
+        with self._connect() as conn:
+            if owner is None:
+                rows = conn.execute(
+                    "SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+            else:
+                rows = conn.execute(
+                    "SELECT * FROM jobs WHERE owner = ? ORDER BY created_at DESC LIMIT ?",
+                    (owner, limit)).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def list_batch(self, batch_id):
+        """
+        Jobs de um envio em lote (mesmo params['batch_id']), na ordem de envio
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM jobs WHERE json_extract(params, '$.batch_id') = ? "
+                "ORDER BY created_at", (batch_id,)).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def claim_next(self):
+        """
+        Marca o job mais antigo da fila como em execução e o retorna
+        (None se a fila estiver vazia)
+        """
+        now = time.time()
+        with self._connect() as conn:
+            # BEGIN IMMEDIATE garante que dois workers não peguem o mesmo job
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE state = ? ORDER BY created_at LIMIT 1",
+                    (QUEUED,)).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                conn.execute(
+                    "UPDATE jobs SET state = ?, started_at = ?, heartbeat_at = ?, "
+                    "stage = NULL, progress = 0, message = NULL, timeline = NULL, "
+                    "partial_transcript = NULL WHERE id = ?",
+                    (RUNNING, now, now, row['id']))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return self.get(row['id'])
+
+    def update_progress(self, job_id, stage=None, progress=None, message=None, timeline=None):
+        """
+        Atualiza a etapa, o progresso (0 a 1), a mensagem e/ou a linha do tempo
+        (lista de registros de etapas, ver metrics.timed_stage) de um job em
+        execução e renova o heartbeat. Retorna True se o cancelamento foi pedido.
+        """
+        assignments = ["heartbeat_at = ?"]
+        values = [time.time()]
+        if timeline is not None:
+            timeline = json.dumps(timeline)
+        for column, value in (('stage', stage), ('progress', progress), ('message', message),
+                              ('timeline', timeline)):
+            if value is not None:
+                assignments.append(f"{column} = ?")
+                values.append(value)
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE jobs SET {', '.join(assignments)} WHERE id = ? AND state = ?",
+                (*values, job_id, RUNNING))
+            row = conn.execute(
+                "SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row['cancel_requested'])
+
+    def append_transcript(self, job_id, srt):
+        """
+        Acrescenta um chunk já transcrito (SRT) à transcrição parcial de um
+        job em execução, que o app mostra enquanto os demais são processados
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET partial_transcript = COALESCE(partial_transcript, '') || ?, "
+                "heartbeat_at = ? WHERE id = ? AND state = ?",
+                (srt + "\n\n", time.time(), job_id, RUNNING))
+
+    def heartbeat(self, job_ids):
+        """
+        Renova o heartbeat de jobs em execução, mesmo sem progresso novo
+        (ex.: durante uma extração de áudio longa)
+        """
+        if not job_ids:
+            return
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND state = ?",
+                [(now, job_id, RUNNING) for job_id in job_ids])
+
+    def _finish(self, job_id, state, result=None, error=None, message=None, timeline=None):
+        # A transcrição parcial de um job concluído está inteira no resultado;
+        # a de um job que falhou ou foi cancelado fica para consulta
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET state = ?, result = ?, error = ?, message = ?, "
+                "finished_at = ?, timeline = COALESCE(?, timeline), "
+                "partial_transcript = CASE WHEN ? THEN NULL ELSE partial_transcript END "
+                "WHERE id = ?",
+                (state, json.dumps(result) if result is not None else None,
+                 error, message, time.time(),
+                 json.dumps(timeline) if timeline is not None else None, state == DONE, job_id))
+
+    def complete(self, job_id, result, timeline=None):
+        self._finish(job_id, DONE, result=result, message="Transcrição concluída",
+                     timeline=timeline)
+
+    def fail(self, job_id, error, timeline=None, result=None):
+        self._finish(job_id, FAILED, result=result, error=error, timeline=timeline)
+
+    def mark_cancelled(self, job_id, timeline=None):
+        self._finish(job_id, CANCELLED, message="Cancelado pelo usuário", timeline=timeline)
+
+    def cancel(self, job_id):
+        """
+        Cancela um job: sai da fila imediatamente se ainda não começou; se
+        estiver em execução, o worker interrompe na próxima atualização de
+        progresso.
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET state = ?, finished_at = ?, message = ? WHERE id = ? AND state = ?",
+                (CANCELLED, time.time(), "Cancelado pelo usuário", job_id, QUEUED))
+            conn.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND state = ?",
+                (job_id, RUNNING))
+
+    def requeue_stale(self, stale_after=JOB_STALE_AFTER):
+        """
+        Devolve à fila jobs em execução cujo worker parou de dar sinal de vida
+        (ex.: o processo foi reiniciado). Retorna quantos jobs foram devolvidos.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET state = ?, finished_at = ?, message = ? "
+                "WHERE state = ? AND heartbeat_at < ? AND cancel_requested = 1",
+                (CANCELLED, now, "Cancelado pelo usuário", RUNNING, now - stale_after))
+            cursor = conn.execute(
+                "UPDATE jobs SET state = ?, message = ? WHERE state = ? AND heartbeat_at < ?",
+                (QUEUED, "Reenfileirado após interrupção", RUNNING, now - stale_after))
+            return cursor.rowcount
+
+
+class _ClosingConnection:
+    # sqlite3.Connection como gerenciador de contexto não fecha a conexão
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, *exc):
+        self.conn.close()
+
+
+class JobEvents(PipelineEvents):
+    """
+    Grava as mensagens, o progresso e a linha do tempo das etapas do pipeline
+    no job (no máximo a cada JOB_PROGRESS_INTERVAL), acrescenta cada chunk
+    transcrito à transcrição parcial e interrompe o job quando o cancelamento
+    é pedido
+    """
+
+    def __init__(self, queue, job_id):
+        self.queue = queue
+        self.job_id = job_id
+        self._last_write = 0.0
+        self.cancelled = False
+        self.timeline = []
+        self._timeline_written = 0
+
+    def _update(self, force=False, **fields):
+        now = time.monotonic()
+        if not force and now - self._last_write < JOB_PROGRESS_INTERVAL:
+            return
+        self._last_write = now
+        if len(self.timeline) != self._timeline_written:
+            fields['timeline'] = self.timeline
+            self._timeline_written = len(self.timeline)
+        if self.queue.update_progress(self.job_id, **fields):
+            self.cancelled = True
+        if self.cancelled:
+            raise JobCancelled(f"Job {self.job_id} cancelado")
+
+    def info(self, message):
+        super().info(message)
+        self._update(force=True, message=message)
+
+    def success(self, message):
+        super().success(message)
+        self._update(force=True, message=message)
+
+    def error(self, message):
+        super().error(message)
+        self._update(force=True, message=message)
+
+    def progress(self, stage, done, total=None, message=None):
+        fraction = min(done / total, 1.0) if total else None
+        self._update(force=bool(total) and done >= total,
+                     stage=stage, progress=fraction, message=message)
+
+    def transcript_chunk(self, srt, start, end):
+        self.queue.append_transcript(self.job_id, srt)
+        # O progresso do chunk vem logo em seguida e não deve ser descartado
+        # pelo intervalo mínimo entre gravações
+        self._last_write = 0.0
+
+    def timing(self, record):
+        super().timing(record)
+        self.timeline.append(record)
+        self._update()
+
+
+class JobWorkerPool:
+    """
+    Threads que consomem a fila e executam o pipeline para cada job.
+
+    Os clientes OpenAI vêm do registro compartilhado pelo processo (ver
+    openai_clients.py). As chaves de API nunca são gravadas na fila: ficam
+    apenas na memória do processo, em register_api_key, e na falta delas é
+    usada OPENAI_API_KEY.
+    """
+
+    def __init__(self, queue, num_workers=DEFAULT_JOB_WORKERS, output_dir=JOB_OUTPUT_DIR,
+                 poll_interval=JOB_POLL_INTERVAL):
+        self.queue = queue
+        self.num_workers = num_workers
+        self.output_dir = output_dir
+        self.poll_interval = poll_interval
+        self._api_keys = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+        self._running = set()
+        self._drive_service = None
+        self._stale_checked_at = 0
+
+    def register_api_key(self, job_id, api_key):
+        with self._lock:
+            self._api_keys[job_id] = api_key
+
+    def submit(self, source, model, api_key=None, **kwargs):
+        """
+        Enfileira um job e guarda (em memória) a chave de API que ele deve usar
+        """
+        # A chave é registrada antes de o job ficar visível na fila: um worker
+        # ocioso pode pegá-lo logo após o INSERT
+        job_id = uuid.uuid4().hex
+        if api_key:
+            self.register_api_key(job_id, api_key)
+        try:
+            return self.queue.submit(source, model, job_id=job_id, **kwargs)
+        except Exception:
+            with self._lock:
+                self._api_keys.pop(job_id, None)
+            raise
+
+    def _client_for(self, job):
+        from openai_clients import get_openai_client
+
+        with self._lock:
+            api_key = self._api_keys.pop(job['id'], None) or os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise RuntimeError(
+                "Chave da API OpenAI indisponível para este job. Envie-o novamente.")
+        return get_openai_client(api_key)
+
+    def _get_drive_service(self):
+        from utils import get_drive_service
+
+        if self._drive_service is None:
+            self._drive_service = get_drive_service()
+            if not self._drive_service:
+                raise RuntimeError("Não foi possível conectar ao Google Drive.")
+        return self._drive_service
+
+    def start(self):
+        if self._threads:
+            return self
+        self._requeue_stale()
+        # Recolhe os diretórios de trabalho órfãos de execuções anteriores
+        from workspace import get_workspace_manager
+        get_workspace_manager()
+        for i in range(self.num_workers):
+            thread = threading.Thread(
+                target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        heartbeat = threading.Thread(
+            target=self._heartbeat_loop, name="job-heartbeat", daemon=True)
+        heartbeat.start()
+        self._threads.append(heartbeat)
+        logger.info(f"Pool de jobs iniciado com {self.num_workers} worker(s)")
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(JOB_HEARTBEAT_INTERVAL):
+            with self._lock:
+                running = list(self._running)
+            try:
+                self.queue.heartbeat(running)
+            except Exception as e:
+                logger.warning(f"Falha ao renovar o heartbeat dos jobs: {str(e)}")
+
+    def _requeue_stale(self):
+        """
+        Devolve à fila os jobs de workers que pararam de dar sinal de vida
+        (ex.: outro processo de workers caiu), no máximo uma vez a cada
+        JOB_HEARTBEAT_INTERVAL para todo o pool
+        """
+        now = time.time()
+        with self._lock:
+            if now - self._stale_checked_at < JOB_HEARTBEAT_INTERVAL:
+                return
+            self._stale_checked_at = now
+        try:
+            recovered = self.queue.requeue_stale()
+        except Exception as e:
+            logger.warning(f"Falha ao verificar jobs interrompidos: {str(e)}")
+            return
+        if recovered:
+            logger.info(f"{recovered} job(s) interrompido(s) devolvido(s) à fila")
+
+    def _claim_next(self):
+        try:
+            return self.queue.claim_next()
+        except Exception as e:
+            logger.exception(f"Erro ao consultar a fila de jobs: {str(e)}")
+            return None
+
+    def _worker_loop(self):
+        from memory_limit import wait_for_memory, release_memory, MemoryLimitError
+
+        while not self._stop.is_set():
+            # Jobs de um processo que caiu depois do início deste pool
+            self._requeue_stale()
+            # No modo de memória limitada, a memória do job é reservada antes
+            # de pegá-lo e devolvida quando ele termina
+            try:
+                if not wait_for_memory(stop=self._stop):
+                    break
+            except MemoryLimitError as e:
+                # Esperar não adiantaria: o job falha com o motivo, visível no app
+                job = self._claim_next()
+                if job is None:
+                    self._stop.wait(self.poll_interval)
+                else:
+                    self.reject_job(job, str(e))
+                continue
+            try:
+                job = self._claim_next()
+                if job is not None:
+                    self.run_job(job)
+            finally:
+                release_memory()
+            if job is None:
+                self._stop.wait(self.poll_interval)
+
+    def execute(self, job, events):
+        """
+        Executa o pipeline de um job e retorna o resultado, com os caminhos
+        dos arquivos gerados em 'files' e, por tipo, em 'artifacts'
+        """
+        out_dir = os.path.join(self.output_dir, job['id'])
+        if job['params'].get('profile'):
+            from profiling import profile_run
+
+            # O perfil é gravado mesmo se o job falhar; os caminhos vão na
+            # exceção para que run_job os registre como artefatos
+            try:
+                with profile_run(out_dir, title=f"Job {job['id']}: {job['source']}") as profiler:
+                    result = self._execute(job, events, out_dir)
+            except Exception as e:
+                e.profile_artifacts = profiler.files
+                raise
+            result['artifacts'].update(profiler.files)
+            result['files'] = result['files'] + list(profiler.files.values())
+            return result
+        return self._execute(job, events, out_dir)
+
+    def _execute(self, job, events, out_dir):
+        from pipeline import (transcribe_source, write_transcription_files,
+                              save_result_to_drive, artifact_kind, stored_artifact_files)
+        from utils import mark_youtube_video_processed
+        from workspace import get_workspace_manager
+        from history_store import get_history_store
+
+        params = job['params']
+        history = get_history_store()
+        client = self._client_for(job)
+        needs_drive = job['source'].startswith('drive:') or 'drive.google.com/' in job['source']
+        drive_service = self._get_drive_service() if needs_drive else None
+
+        # O diretório de trabalho tem o ID do job: se o job voltar para a fila
+        # depois de uma queda, reaproveita os downloads já feitos
+        with get_workspace_manager().workspace(job['id']) as workdir:
+            # Fontes já transcritas vêm do histórico, sem download nem OpenAI
+            result = transcribe_source(
+                job['source'], client, job['model'], drive_service=drive_service,
+                name=job['name'], events=events, workdir=workdir, history=history,
+                source_key=params.get('source_key'),
+                refresh_history=params.get('refresh_history', False), owner=job['owner'])
+            if events.cancelled:
+                raise JobCancelled(f"Job {job['id']} cancelado")
+
+            stored_files = stored_artifact_files(result) if result.get('from_history') else None
+            if stored_files:
+                result['files'] = stored_files
+            else:
+                result['files'] = write_transcription_files(result, out_dir, events=events)
+                result['artifacts'] = {artifact_kind(path): path for path in result['files']}
+                if result.get('history_id'):
+                    history.set_artifacts(result['history_id'], result['artifacts'])
+
+            if params.get('save_to_drive') and result.get('drive_file_id'):
+                events.info("Salvando arquivos no Google Drive...")
+                result['uploaded_files'] = save_result_to_drive(
+                    drive_service, result['drive_file_id'], result, events=events,
+                    workdir=workdir) or []
+        if params.get('youtube_id'):
+            mark_youtube_video_processed(params['youtube_id'], result['title'])
+        return result
+
+    def run_job(self, job):
+        """
+        Executa um job já marcado como em execução e grava o resultado ou o erro
+        """
+        job_id = job['id']
+        events = JobEvents(self.queue, job_id)
+        logger.info(f"Iniciando job {job_id}: {job['source']}")
+        with self._lock:
+            self._running.add(job_id)
+        try:
+            result = self.execute(job, events)
+            self.queue.complete(job_id, result, timeline=events.timeline)
+            JOBS_FINISHED.inc(state=DONE)
+            JOB_SECONDS.observe(result['seconds'])
+            logger.info(f"Job {job_id} concluído em {result['seconds']:.0f}s")
+
+        except JobCancelled:
+            self.queue.mark_cancelled(job_id, timeline=events.timeline)
+            JOBS_FINISHED.inc(state=CANCELLED)
+            logger.info(f"Job {job_id} cancelado")
+        except Exception as e:
+            if events.cancelled:
+                self.queue.mark_cancelled(job_id, timeline=events.timeline)
+                JOBS_FINISHED.inc(state=CANCELLED)
+                logger.info(f"Job {job_id} cancelado")
+            else:
+                logger.exception(f"Erro no job {job_id}: {str(e)}")
+                artifacts = getattr(e, 'profile_artifacts', None)
+                self.queue.fail(job_id, str(e), timeline=events.timeline,
+                                result={'artifacts': artifacts} if artifacts else None)
+                JOBS_FINISHED.inc(state=FAILED)
+        finally:
+            with self._lock:
+                self._running.discard(job_id)
+            self._remove_upload(job)
+
+    def reject_job(self, job, error):
+        """
+        Marca como falho, sem executar, um job já marcado como em execução
+        """
+        logger.error(f"Job {job['id']} não executado: {error}")
+        with self._lock:
+            self._api_keys.pop(job['id'], None)
+        self.queue.fail(job['id'], error)
+        JOBS_FINISHED.inc(state=FAILED)
+        self._remove_upload(job)
+
+    @staticmethod
+    def _remove_upload(job):
+        # Arquivos enviados pelo app são copiados para a fila e removidos ao final
+        upload_path = job['params'].get('delete_source_after')
+        if upload_path and os.path.exists(upload_path):
+            try:
+                os.remove(upload_path)
+            except Exception as e:
+                logger.warning(
+                    f"Não foi possível remover o arquivo enviado {upload_path}: {str(e)}")
+
+
+def main():
+    from dotenv import load_dotenv, find_dotenv
+
+    logging.basicConfig(level=logging.INFO)
+    _ = load_dotenv(find_dotenv())
+
+    parser = argparse.ArgumentParser(
+        description="Executa os workers da fila de transcrições")
+    parser.add_argument('--workers', type=int, default=DEFAULT_JOB_WORKERS,
+                        help="Jobs executados em paralelo")
+    parser.add_argument('--db', default=JOB_DB_PATH,
+                        help="Arquivo SQLite da fila")
+    parser.add_argument('--out', default=JOB_OUTPUT_DIR,
+                        help="Pasta onde os arquivos gerados são gravados")
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help="Porta para servir as métricas do Prometheus em /metrics")
+    args = parser.parse_args()
+
+    if args.metrics_port:
+        from metrics import start_metrics_server
+        start_metrics_server(args.metrics_port)
+    pool = JobWorkerPool(JobQueue(args.db), args.workers, args.out).start()
+    print(f"⚙️ {args.workers} worker(s) consumindo a fila em {args.db}...")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        pool.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Modo de memória limitada: teto de RSS do processo.
+
+Com TRANSCRIPTION_MEMORY_LIMIT_MB definido, os workers da fila só começam um
+job novo depois de reservar a estimativa de um job
+(TRANSCRIPTION_JOB_MEMORY_MB) abaixo do teto; a reserva é devolvida quando o
+job termina. Jobs em excesso esperam na fila em vez de levar o processo a ser
+morto por falta de memória, e se o teto não comporta nem um job com o
+processo ocioso os jobs falham com o motivo em vez de esperar para sempre. O
+app, por sua vez, deixa de carregar os arquivos gerados para montar os links
+de download e os lê só quando o usuário clica.
+
+As etapas do pipeline já trabalham em fluxo independentemente do modo: o
+áudio é extraído e dividido pelo ffmpeg direto em disco, a transcrição é
+montada por partes e os SRTs e PDFs são gravados direto nos arquivos. O
+consumo de memória não cresce com a duração do vídeo; o teto protege contra
+jobs demais ao mesmo tempo.
+
+O subprocesso do ffmpeg não entra na conta (ver o benchmark do pipeline, que
+mede os dois).
+"""
+
+import os
+import gc
+import time
+import logging
+import threading
+from metrics import PROCESS_RSS, MEMORY_WAITS
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+MEMORY_LIMIT_MB = float(os.getenv('TRANSCRIPTION_MEMORY_LIMIT_MB', '0')) or None
+JOB_MEMORY_MB = float(os.getenv('TRANSCRIPTION_JOB_MEMORY_MB', '48'))
+MEMORY_POLL_INTERVAL = 1.0  # segundos entre medições enquanto espera memória livre
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+_MB = 1024 * 1024
+
+# Memória reservada pelos jobs em execução e a memória residente medida pela
+# última vez sem nenhuma reserva
+_reservations = {'mb': 0.0, 'idle_rss': 0}
+_reservations_lock = threading.Lock()
+
+
+class MemoryLimitError(RuntimeError):
+    """
+    Levantada quando o teto não comporta um job nem com o processo sem jobs
+    em execução: esperar não adiantaria
+    """
+
+
+def bounded_memory_mode():
+    return MEMORY_LIMIT_MB is not None
+
+
+def current_rss():
+    """
+    Memória residente atual do processo em bytes (no Linux, de
+    /proc/self/statm; nos demais sistemas, o pico informado pelo getrusage)
+    """
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            rss = int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        import resource
+        import sys
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss é em bytes no macOS e em KB nos demais
+        rss = peak if sys.platform == 'darwin' else peak * 1024
+    PROCESS_RSS.set(rss)
+    return rss
+
+
+def reserve_memory(needed_mb=JOB_MEMORY_MB):
+    """
+    Reserva needed_mb abaixo do teto para um job, a devolver com
+    release_memory. Retorna True se reservou (sempre, fora do modo de memória
+    limitada) e False se é preciso esperar algum job terminar; levanta
+    MemoryLimitError se não há reservas e mesmo assim não cabe.
+    """
+    if MEMORY_LIMIT_MB is None:
+        return True
+    with _reservations_lock:
+        rss = current_rss()
+        if not _reservations['mb']:
+            _reservations['idle_rss'] = rss
+        # Jobs recém-iniciados ainda não alocaram a sua memória: a reserva
+        # deles conta sobre a memória medida sem jobs
+        used = max(rss, _reservations['idle_rss'] + _reservations['mb'] * _MB)
+        if used + needed_mb * _MB <= MEMORY_LIMIT_MB * _MB:
+            _reservations['mb'] += needed_mb
+            return True
+        if not _reservations['mb']:
+            raise MemoryLimitError(
+                f"Memória do processo em {rss / _MB:.0f} MB sem jobs em execução: o teto de "
+                f"{MEMORY_LIMIT_MB:.0f} MB (TRANSCRIPTION_MEMORY_LIMIT_MB) não comporta um job "
+                f"de {needed_mb:.0f} MB (TRANSCRIPTION_JOB_MEMORY_MB)")
+        return False
+
+
+def release_memory(needed_mb=JOB_MEMORY_MB):
+    """
+    Devolve uma reserva feita por reserve_memory ou wait_for_memory
+    """
+    if MEMORY_LIMIT_MB is None:
+        return
+    with _reservations_lock:
+        _reservations['mb'] = max(_reservations['mb'] - needed_mb, 0)
+
+
+def wait_for_memory(needed_mb=JOB_MEMORY_MB, stop=None):
+    """
+    Bloqueia até reservar needed_mb abaixo do teto (ver reserve_memory).
+    Retorna False se stop (um threading.Event) for acionado antes disso e
+    levanta MemoryLimitError se o job não cabe nem sem outros em execução.
+    """
+    try:
+        if reserve_memory(needed_mb):
+            return True
+    except MemoryLimitError:
+        pass
+    # Antes de esperar (ou desistir), devolve ao sistema o que for lixo de jobs anteriores
+    gc.collect()
+    if reserve_memory(needed_mb):
+        return True
+
+    MEMORY_WAITS.inc()
+    logger.warning(f"Memória do processo em {current_rss() / _MB:.0f} MB: "
+                   f"aguardando {needed_mb:.0f} MB livres abaixo do teto de "
+                   f"{MEMORY_LIMIT_MB:.0f} MB para iniciar um novo job")
+    while not reserve_memory(needed_mb):
+        if stop is not None:
+            if stop.wait(MEMORY_POLL_INTERVAL):
+                return False
+        else:
+            time.sleep(MEMORY_POLL_INTERVAL)
+    return True
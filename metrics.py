@@ -0,0 +1,310 @@
+"""
+Métricas do pipeline de transcrição (duração e bytes por etapa, latência da
+OpenAI, novas tentativas, acertos de cache) no formato texto do Prometheus.
+
+As etapas são medidas com timed_stage, que além de alimentar as métricas do
+processo entrega um registro da etapa a events.timing: é assim que a fila de
+jobs monta a linha do tempo de cada job mostrada no app.
+
+As métricas são do processo. O endpoint fica em GET /metrics na API
+(api_server.py), em --metrics-port nos workers (job_queue.py) e em
+TRANSCRIPTION_METRICS_PORT no app.
+"""
+
+import time
+import bisect
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Limites (segundos) dos buckets dos histogramas de duração
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+SUMMARY_QUANTILES = (0.5, 0.9, 0.99)
+SUMMARY_WINDOW = 1024  # observações recentes usadas no cálculo dos percentis
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values)) + list(extra or [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} espera os rótulos {self.labelnames}, recebeu {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.extend(self._render_sample(key, value))
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _render_sample(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _render_sample(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {
+                    'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                state['buckets'][index] += 1
+            state['sum'] += value
+            state['count'] += 1
+
+    def _render_sample(self, key, state):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, state['buckets']):
+            cumulative += count
+            labels = _format_labels(self.labelnames, key, [('le', _format_value(float(bound)))])
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key, [('le', '+Inf')])
+        lines.append(f"{self.name}_bucket{labels} {state['count']}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(state['sum'])}")
+        lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+
+class Summary(_Metric):
+    """
+    Percentis calculados sobre as últimas SUMMARY_WINDOW observações
+    """
+    kind = 'summary'
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {
+                    'window': deque(maxlen=SUMMARY_WINDOW), 'sum': 0.0, 'count': 0}
+            state['window'].append(value)
+            state['sum'] += value
+            state['count'] += 1
+
+    def quantiles(self, **labels):
+        """
+        {quantil: valor} das observações recentes (vazio se não houver nenhuma)
+        """
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            window = sorted(state['window']) if state else []
+        if not window:
+            return {}
+        return {q: window[min(int(q * len(window)), len(window) - 1)] for q in SUMMARY_QUANTILES}
+
+    def _render_sample(self, key, state):
+        lines = []
+        window = sorted(state['window'])
+        for q in SUMMARY_QUANTILES:
+            if window:
+                labels = _format_labels(self.labelnames, key, [('quantile', str(q))])
+                value = window[min(int(q * len(window)), len(window) - 1)]
+                lines.append(f"{self.name}{labels} {_format_value(float(value))}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(state['sum'])}")
+        lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Métrica {metric.name} já registrada")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def summary(self, name, documentation, labelnames=()):
+        return self._register(Summary(name, documentation, labelnames))
+
+    def render(self):
+        """
+        Todas as métricas no formato texto do Prometheus
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'transcription_stage_seconds', "Duração de cada etapa do pipeline", ('stage',))
+STAGE_BYTES = REGISTRY.counter(
+    'transcription_stage_bytes_total', "Bytes lidos (in) e gerados (out) por etapa",
+    ('stage', 'direction'))
+STAGE_ERRORS = REGISTRY.counter(
+    'transcription_stage_errors_total', "Etapas que terminaram com erro", ('stage',))
+OPENAI_REQUEST_SECONDS = REGISTRY.summary(
+    'openai_request_seconds', "Latência das chamadas à API da OpenAI", ('operation',))
+OPENAI_TOKENS = REGISTRY.counter(
+    'openai_tokens_total', "Tokens consumidos na API da OpenAI", ('operation', 'direction'))
+OPENAI_THROTTLED = REGISTRY.counter(
+    'openai_rate_limited_total', "Respostas 429 (limite de requisições) da OpenAI", ('operation',))
+OPENAI_CONCURRENCY_LIMIT = REGISTRY.gauge(
+    'openai_concurrency_limit', "Limite atual de chamadas simultâneas à OpenAI (AIMD)",
+    ('operation',))
+RETRIES = REGISTRY.counter(
+    'transcription_retries_total', "Novas tentativas após falhas transitórias", ('operation',))
+CACHE_REQUESTS = REGISTRY.counter(
+    'transcription_cache_requests_total', "Consultas aos caches em memória", ('cache', 'result'))
+PROCESS_RSS = REGISTRY.gauge(
+    'process_resident_memory_bytes', "Memória residente do processo na última medição")
+MEMORY_WAITS = REGISTRY.counter(
+    'transcription_memory_waits_total', "Vezes em que um worker esperou memória livre para "
+    "iniciar um job (ver memory_limit.py)")
+JOBS_FINISHED = REGISTRY.counter(
+    'transcription_jobs_total', "Jobs finalizados, por estado", ('state',))
+JOB_SECONDS = REGISTRY.histogram(
+    'transcription_job_seconds', "Duração total dos jobs concluídos")
+
+
+@contextmanager
+def timed_stage(stage, events=None, api=None, **info):
+    """
+    Mede uma etapa do pipeline. O bloco recebe um dicionário (iniciado com
+    info) onde pode anotar 'bytes_in', 'bytes_out', 'tokens_in', 'tokens_out'
+    e outros detalhes. Com api, a duração também entra na latência da OpenAI
+    para essa operação. Ao final, o registro da etapa é entregue a
+    events.timing, se events for informado.
+    """
+    record = dict(info)
+    started_at = time.time()
+    started = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        record['error'] = type(e).__name__
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        STAGE_SECONDS.observe(seconds, stage=stage)
+        for direction in ('in', 'out'):
+            if record.get(f'bytes_{direction}'):
+                STAGE_BYTES.inc(record[f'bytes_{direction}'], stage=stage, direction=direction)
+        if api:
+            OPENAI_REQUEST_SECONDS.observe(seconds, operation=api)
+            for direction in ('in', 'out'):
+                if record.get(f'tokens_{direction}'):
+                    OPENAI_TOKENS.inc(record[f'tokens_{direction}'], operation=api,
+                                      direction=direction)
+        if events is not None:
+            events.timing({'stage': stage, 'started_at': started_at,
+                           'seconds': round(seconds, 3), **record})
+
+
+def start_metrics_server(port, host='0.0.0.0'):
+    """
+    Serve GET /metrics em uma thread de fundo e retorna o servidor
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = REGISTRY.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    logger.info(f"Métricas disponíveis em http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,158 @@
+"""
+Clientes OpenAI compartilhados pelo processo.
+
+Um único pool de conexões HTTP (keep-alive longo, HTTP/2 quando o pacote h2
+está instalado) serve todos os clientes, de modo que os jobs e as threads do
+processo reaproveitam as conexões TLS já abertas com a API em vez de abrir
+uma nova a cada chamada. Há um cliente por chave de API (a autenticação vai
+em cada requisição, o pool é o mesmo) e a validação das chaves no login fica
+em cache por alguns minutos.
+
+Os limites de concorrência e as novas tentativas ficam em openai_controller.py.
+"""
+
+import os
+import time
+import hashlib
+import logging
+import threading
+import importlib.util
+from collections import OrderedDict
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', '600'))  # segundos (upload e resposta)
+OPENAI_CONNECT_TIMEOUT = float(os.getenv('OPENAI_CONNECT_TIMEOUT', '10'))
+OPENAI_POOL_CONNECTIONS = int(os.getenv('OPENAI_POOL_CONNECTIONS', '64'))
+OPENAI_POOL_KEEPALIVE = int(os.getenv('OPENAI_POOL_KEEPALIVE', '32'))
+# O padrão do SDK (5s) fecha a conexão entre um chunk e outro
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv('OPENAI_KEEPALIVE_EXPIRY', '120'))
+OPENAI_HTTP2 = os.getenv('OPENAI_HTTP2', 'auto')  # auto: usa HTTP/2 se o h2 estiver instalado
+MAX_CLIENTS = 64  # clientes (chaves) guardados; os menos usados saem primeiro
+VALIDATION_TTL = 600  # segundos que uma chave validada fica em cache
+VALIDATION_FAILURE_TTL = 30  # segundos que uma chave recusada fica em cache
+
+
+def _key_id(api_key):
+    """
+    Identificador da chave usado nos caches (a chave em si não é guardada
+    como índice)
+    """
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+
+
+def _http2_enabled():
+    if OPENAI_HTTP2 == 'auto':
+        return importlib.util.find_spec('h2') is not None
+    return OPENAI_HTTP2.lower() in ('1', 'true', 'yes')
+
+
+class OpenAIClientRegistry:
+    """
+    Pool HTTP compartilhado, um cliente OpenAI por chave e cache das
+    validações
+    """
+
+    def __init__(self, max_clients=MAX_CLIENTS):
+        self.max_clients = max_clients
+        self._clients = OrderedDict()
+        self._validations = {}
+        self._http_client = None
+        self._lock = threading.Lock()
+
+    def _timeout(self):
+        import openai
+
+        # Os tipos de timeout e de limites são os do transporte HTTP do SDK
+        return type(openai.DEFAULT_TIMEOUT)(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT)
+
+    def _shared_http_client(self):
+        import openai
+
+        if self._http_client is None:
+            limits = type(openai.DEFAULT_CONNECTION_LIMITS)(
+                max_connections=OPENAI_POOL_CONNECTIONS,
+                max_keepalive_connections=OPENAI_POOL_KEEPALIVE,
+                keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY)
+            http2 = _http2_enabled()
+            self._http_client = openai.DefaultHttpxClient(
+                timeout=self._timeout(), limits=limits, http2=http2)
+            logger.info(f"Pool HTTP da OpenAI criado ({OPENAI_POOL_CONNECTIONS} conexões, "
+                        f"{'HTTP/2' if http2 else 'HTTP/1.1'})")
+        return self._http_client
+
+    def get(self, api_key, base_url=None):
+        """
+        Cliente OpenAI da chave, criado na primeira vez e reaproveitado por
+        todas as threads. base_url None usa OPENAI_BASE_URL ou a API oficial.
+        """
+        from openai import OpenAI
+
+        if not api_key:
+            raise ValueError("Chave da API OpenAI não informada")
+        key = (_key_id(api_key), base_url)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = OpenAI(api_key=api_key, base_url=base_url,
+                                http_client=self._shared_http_client(), timeout=self._timeout())
+                self._clients[key] = client
+                # Clientes descartados não fecham o pool, que é compartilhado
+                while len(self._clients) > self.max_clients:
+                    self._clients.popitem(last=False)
+            else:
+                self._clients.move_to_end(key)
+            return client
+
+    def validate(self, api_key):
+        """
+        Verifica a chave na API (models.list) e retorna (válida, mensagem de
+        erro). O resultado fica em cache: VALIDATION_TTL para chaves válidas,
+        VALIDATION_FAILURE_TTL para as recusadas.
+        """
+        if not api_key:
+            return False, "Chave da API OpenAI não informada"
+        key_id = _key_id(api_key)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._validations.get(key_id)
+        if cached and cached[0] > now:
+            return cached[1], cached[2]
+
+        try:
+            self.get(api_key).with_options(max_retries=1).models.list()
+            valid, error, ttl = True, None, VALIDATION_TTL
+        except Exception as e:
+            valid, error, ttl = False, str(e), VALIDATION_FAILURE_TTL
+        with self._lock:
+            self._validations[key_id] = (time.monotonic() + ttl, valid, error)
+        return valid, error
+
+
+_default_registry = {'registry': None}
+_default_registry_lock = threading.Lock()
+
+
+def get_client_registry():
+    """
+    Registro compartilhado pelo processo
+    """
+    with _default_registry_lock:
+        if _default_registry['registry'] is None:
+            _default_registry['registry'] = OpenAIClientRegistry()
+        return _default_registry['registry']
+
+
+def get_openai_client(api_key, base_url=None):
+    """
+    Cliente OpenAI compartilhado para a chave (ver OpenAIClientRegistry.get)
+    """
+    return get_client_registry().get(api_key, base_url=base_url)
+
+
+def validate_api_key(api_key):
+    """
+    (válida, mensagem de erro) da chave, com cache (ver OpenAIClientRegistry.validate)
+    """
+    return get_client_registry().validate(api_key)
@@ -0,0 +1,358 @@
+"""
+Controle das chamadas à API da OpenAI compartilhado pelo processo: limite de
+concorrência adaptativo, novas tentativas e orçamento por minuto.
+
+Todas as chamadas de um mesmo endpoint ('transcription', 'chat') passam pelo
+mesmo EndpointController, qualquer que seja o job ou a thread:
+
+- concorrência AIMD: o limite de chamadas simultâneas cresce 1 a cada
+  "janela" de chamadas bem-sucedidas e cai pela metade quando a API sinaliza
+  sobrecarga (429, 5xx, timeout), no máximo uma vez por janela;
+- Retry-After: um 429 pausa o endpoint inteiro pelo tempo pedido pela API,
+  em vez de cada chamada insistir por conta própria;
+- novas tentativas com backoff exponencial e jitter completo para erros
+  transitórios (429, 408, 409, 5xx, timeout e falha de conexão). Cotas
+  esgotadas (insufficient_quota) e erros do pedido falham na hora;
+- orçamento por minuto de requisições e de tokens, em janela deslizante. Os
+  limites vêm de OPENAI_<ENDPOINT>_RPM / _TPM ou, se não configurados, dos
+  cabeçalhos x-ratelimit-* das respostas (com a margem OPENAI_BUDGET_FRACTION),
+  para que a vazão fique logo abaixo do limite da conta em vez de alternar
+  entre ociosa e bloqueada.
+
+Os clientes OpenAI são usados com max_retries=0: as novas tentativas são
+todas feitas aqui.
+"""
+
+import os
+import re
+import time
+import random
+import logging
+import threading
+import email.utils
+from collections import deque
+from metrics import RETRIES, OPENAI_THROTTLED, OPENAI_CONCURRENCY_LIMIT
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', '6'))
+OPENAI_INITIAL_CONCURRENCY = float(os.getenv('OPENAI_INITIAL_CONCURRENCY', '4'))
+OPENAI_MAX_CONCURRENCY = int(os.getenv('OPENAI_MAX_CONCURRENCY', '32'))
+OPENAI_BUDGET_FRACTION = float(os.getenv('OPENAI_BUDGET_FRACTION', '0.9'))
+BACKOFF_BASE = 1.0  # segundos antes da primeira nova tentativa (sem jitter)
+BACKOFF_MAX = 60.0
+RETRY_AFTER_MAX = 300.0  # ignora pedidos de espera absurdos
+BUDGET_WINDOW = 60.0  # segundos da janela do orçamento por minuto
+RETRYABLE_STATUS = (408, 409, 429, 500, 502, 503, 504)
+# Status que indicam sobrecarga: reduzem o limite de concorrência
+OVERLOAD_STATUS = (429, 500, 502, 503, 504)
+
+_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|s|m|h)')
+_DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+
+def _env_limit(name):
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+def parse_reset_duration(value):
+    """
+    Converte a duração dos cabeçalhos x-ratelimit-reset-* ('1s', '6m0s',
+    '250ms') em segundos
+    """
+    if not value:
+        return None
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+
+
+def parse_retry_after(headers):
+    """
+    Espera pedida pela API (retry-after-ms ou retry-after, em segundos ou
+    como data HTTP), ou None
+    """
+    if headers is None:
+        return None
+    value = headers.get('retry-after-ms')
+    if value:
+        try:
+            return min(float(value) / 1000, RETRY_AFTER_MAX)
+        except ValueError:
+            pass
+    value = headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = email.utils.parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), RETRY_AFTER_MAX)
+
+
+def backoff_delay(attempt, retry_after=None):
+    """
+    Backoff exponencial com jitter completo; nunca menos que retry_after
+    """
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def _error_status(error):
+    """
+    (status HTTP, cabeçalhos) de um erro da OpenAI; status None para erros de
+    conexão e timeout
+    """
+    response = getattr(error, 'response', None)
+    status = getattr(error, 'status_code', None)
+    return status, getattr(response, 'headers', None)
+
+
+class EndpointController:
+    """
+    Limite de concorrência AIMD, pausa por Retry-After e orçamento por minuto
+    de um endpoint da OpenAI
+    """
+
+    def __init__(self, name, rpm=None, tpm=None, initial_concurrency=OPENAI_INITIAL_CONCURRENCY,
+                 max_concurrency=OPENAI_MAX_CONCURRENCY):
+        self.name = name
+        self.rpm = rpm
+        self.tpm = tpm
+        self._rpm_configured = rpm is not None
+        self._tpm_configured = tpm is not None
+        self.limit = float(initial_concurrency)
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._decreased_at = 0.0
+        self._window = deque()  # [início, tokens] das requisições no último minuto
+        self._condition = threading.Condition()
+        OPENAI_CONCURRENCY_LIMIT.set(self.limit, operation=name)
+
+    def _prune(self, now):
+        while self._window and now - self._window[0][0] >= BUDGET_WINDOW:
+            self._window.popleft()
+
+    def _wait_time(self, now, tokens):
+        """
+        Segundos até a requisição poder sair (0 se já pode)
+        """
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.in_flight >= max(1, int(self.limit)):
+            return None  # espera uma chamada terminar
+        self._prune(now)
+        if self.rpm and len(self._window) >= self.rpm:
+            return self._window[0][0] + BUDGET_WINDOW - now
+        if self.tpm and self._window:
+            used = sum(entry[1] for entry in self._window)
+            # Uma requisição maior que o orçamento inteiro sai com a janela vazia
+            if used + tokens > self.tpm:
+                return self._window[0][0] + BUDGET_WINDOW - now
+        return 0
+
+    def acquire(self, tokens=0):
+        """
+        Bloqueia até haver vaga e orçamento; retorna a entrada reservada na
+        janela do orçamento (para release)
+        """
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                wait = self._wait_time(now, tokens)
+                if wait == 0:
+                    break
+                self._condition.wait(wait)
+            entry = [now, tokens]
+            self._window.append(entry)
+            self.in_flight += 1
+            return entry
+
+    def release(self, entry, started, outcome, tokens=None, headers=None, retry_after=None):
+        """
+        Devolve a vaga de uma chamada. outcome é 'ok', 'overload' (a API
+        sinalizou sobrecarga) ou 'error' (falha que não diz nada sobre a carga)
+        """
+        with self._condition:
+            self.in_flight -= 1
+            if tokens is not None:
+                entry[1] = tokens
+            # Só cresce se o limite estava em uso: chamadas sequenciais não
+            # dizem nada sobre quanto a API aguenta em paralelo
+            if outcome == 'ok' and self.in_flight + 1 >= int(self.limit):
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            elif outcome == 'overload' and started > self._decreased_at:
+                # Só uma redução por janela: as chamadas que já estavam em voo
+                # quando o limite caiu não o derrubam de novo
+                self.limit = max(1.0, self.limit / 2)
+                self._decreased_at = time.monotonic()
+                logger.info(f"OpenAI {self.name}: sobrecarga, concorrência reduzida para "
+                            f"{int(self.limit)}")
+            if retry_after:
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+            if headers is not None:
+                self._learn_limits(headers)
+            OPENAI_CONCURRENCY_LIMIT.set(self.limit, operation=self.name)
+            self._condition.notify_all()
+
+    def _learn_limits(self, headers):
+        """
+        Ajusta o orçamento aos limites da conta informados pela API. Se a API
+        diz que a cota da janela acabou, pausa até ela renovar.
+        """
+        for kind, configured in (('requests', self._rpm_configured),
+                                 ('tokens', self._tpm_configured)):
+            limit = headers.get(f'x-ratelimit-limit-{kind}')
+            if limit and not configured:
+                try:
+                    value = max(1, int(int(limit) * OPENAI_BUDGET_FRACTION))
+                except ValueError:
+                    continue
+                if kind == 'requests':
+                    self.rpm = value
+                else:
+                    self.tpm = value
+            remaining = headers.get(f'x-ratelimit-remaining-{kind}')
+            if remaining == '0':
+                reset = parse_reset_duration(headers.get(f'x-ratelimit-reset-{kind}'))
+                if reset:
+                    self.paused_until = max(self.paused_until,
+                                            time.monotonic() + min(reset, RETRY_AFTER_MAX))
+
+    def stats(self):
+        with self._condition:
+            self._prune(time.monotonic())
+            return {
+                'limit': round(self.limit, 2),
+                'in_flight': self.in_flight,
+                'rpm': self.rpm,
+                'tpm': self.tpm,
+                'requests_last_minute': len(self._window),
+                'tokens_last_minute': sum(entry[1] for entry in self._window),
+                'paused_for': round(max(0.0, self.paused_until - time.monotonic()), 2),
+            }
+
+
+class OpenAIRequestController:
+    """
+    Um EndpointController por endpoint, criados sob demanda com os limites
+    das variáveis OPENAI_<ENDPOINT>_RPM e OPENAI_<ENDPOINT>_TPM
+    """
+
+    def __init__(self, max_retries=OPENAI_MAX_RETRIES):
+        self.max_retries = max_retries
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def endpoint(self, name):
+        with self._lock:
+            if name not in self._endpoints:
+                prefix = f"OPENAI_{name.upper()}"
+                self._endpoints[name] = EndpointController(
+                    name, rpm=_env_limit(f"{prefix}_RPM"), tpm=_env_limit(f"{prefix}_TPM"))
+            return self._endpoints[name]
+
+    def request(self, endpoint, send, tokens=0):
+        """
+        Executa send() sob o controle do endpoint e retorna a resposta já
+        convertida. send deve fazer a chamada com .with_raw_response (para
+        que os cabeçalhos de limite sejam lidos) e poder ser repetida.
+        tokens é a estimativa usada no orçamento; o uso real informado na
+        resposta a substitui.
+        """
+        import openai
+
+        controller = self.endpoint(endpoint)
+        attempt = 0
+        while True:
+            entry = controller.acquire(tokens)
+            started = time.monotonic()
+            try:
+                raw = send()
+                response = raw.parse()
+            except (openai.APIStatusError, openai.APITimeoutError, openai.APIConnectionError) as e:
+                status, headers = _error_status(e)
+                retry_after = parse_retry_after(headers)
+                overload = status in OVERLOAD_STATUS or isinstance(e, openai.APITimeoutError)
+                controller.release(entry, started, 'overload' if overload else 'error',
+                                   headers=headers, retry_after=retry_after if status == 429 else None)
+                if status == 429:
+                    OPENAI_THROTTLED.inc(operation=endpoint)
+                retryable = (status is None or status in RETRYABLE_STATUS) and \
+                    getattr(e, 'code', None) != 'insufficient_quota'
+                if not retryable or attempt >= self.max_retries:
+                    raise
+                delay = backoff_delay(attempt, retry_after)
+                attempt += 1
+                RETRIES.inc(operation=endpoint)
+                logger.warning(f"OpenAI {endpoint}: {type(e).__name__} (status {status}), nova "
+                               f"tentativa {attempt}/{self.max_retries} em {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            except BaseException:
+                controller.release(entry, started, 'error')
+                raise
+            usage = getattr(response, 'usage', None)
+            used = getattr(usage, 'total_tokens', None) if usage is not None else None
+            controller.release(entry, started, 'ok', tokens=used, headers=raw.headers)
+            return response
+
+    def stats(self):
+        with self._lock:
+            endpoints = dict(self._endpoints)
+        return {name: controller.stats() for name, controller in endpoints.items()}
+
+
+def estimate_chat_tokens(messages, max_tokens):
+    """
+    Estimativa de tokens de uma chamada de chat para o orçamento (~4
+    caracteres por token, mais o máximo da resposta)
+    """
+    return sum(len(message.get('content') or '') for message in messages) // 4 + (max_tokens or 0)
+
+
+_default_controller = {'controller': None}
+_default_controller_lock = threading.Lock()
+
+
+def get_openai_controller():
+    """
+    Controlador compartilhado pelo processo
+    """
+    with _default_controller_lock:
+        if _default_controller['controller'] is None:
+            _default_controller['controller'] = OpenAIRequestController()
+        return _default_controller['controller']
+
+
+def create_transcription(client, file_path, **kwargs):
+    """
+    client.audio.transcriptions.create(file=<file_path>, **kwargs) sob o
+    controlador do processo (o arquivo é reaberto a cada tentativa)
+    """
+    client = client.with_options(max_retries=0)
+
+    def send():
+        with open(file_path, 'rb') as f:
+            return client.audio.transcriptions.with_raw_response.create(file=f, **kwargs)
+
+    return get_openai_controller().request('transcription', send)
+
+
+def create_chat_completion(client, **kwargs):
+    """
+    client.chat.completions.create(**kwargs) sob o controlador do processo
+    """
+    client = client.with_options(max_retries=0)
+    tokens = estimate_chat_tokens(kwargs.get('messages', []), kwargs.get('max_tokens'))
+    return get_openai_controller().request(
+        'chat', lambda: client.chat.completions.with_raw_response.create(**kwargs), tokens=tokens)
@@ -0,0 +1,837 @@
+"""
+Núcleo do pipeline de transcrição, independente de interface.
+
+As funções recebem explicitamente o cliente OpenAI e um objeto de eventos
+(ver events.PipelineEvents) para mensagens e progresso. O app Streamlit
+(transcrita_video.py), a CLI (transcribe.py) e o observador do Drive são
+clientes deste módulo.
+"""
+
+import os
+import re
+import time
+import logging
+import tempfile
+from events import DEFAULT_EVENTS
+from metrics import timed_stage
+from openai_controller import create_transcription, create_chat_completion
+from workspace import get_workspace_manager
+from history_store import source_identity, drive_identity, gcs_identity, file_sha256
+from utils import *
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Menor formato somente de áudio (com piso de qualidade quando o bitrate é conhecido)
+YOUTUBE_AUDIO_FORMAT = 'worstaudio[abr>=?32]/worstaudio/bestaudio/best'
+
+DEFAULT_SUMMARY_MODEL = 'gpt-4o-mini'
+
+# Sufixos dos arquivos gerados para cada vídeo
+SUMMARY_SRT_SUFFIX = '_transcricao_resumida.srt'
+SUMMARY_PDF_SUFFIX = '_transcricao_resumida.pdf'
+TRANSCRIPTION_PDF_SUFFIX = '_transcricao_completa.pdf'
+
+# Tipos de artefato de um resultado e o sufixo do arquivo de cada um
+ARTIFACT_SUFFIXES = {
+    'srt': TRANSCRIPTION_SRT_SUFFIX,
+    'summary_srt': SUMMARY_SRT_SUFFIX,
+    'pdf': TRANSCRIPTION_PDF_SUFFIX,
+    'summary_pdf': SUMMARY_PDF_SUFFIX,
+}
+
+
+def transcreve_audio_chunk(chunk_path, client, prompt=""):
+    # Novas tentativas, concorrência e orçamento ficam com o controlador
+    # compartilhado (ver openai_controller.py)
+    transcricao = create_transcription(
+        client, chunk_path,
+        model='whisper-1',
+        language='pt',
+        response_format='srt',
+        prompt=prompt,
+    )
+    return transcricao
+
+
+def probe_source(path_or_url, events=DEFAULT_EVENTS):
+    """
+    probe_media medido como a etapa 'sondagem'
+    """
+    with timed_stage('sondagem', events) as record:
+        media_info = probe_media(path_or_url)
+        record['bytes_in'] = media_info.size
+    return media_info
+
+
+def _transcribed_message(done_seconds, total_seconds):
+    return (f"Transcrição: {done_seconds / 60:.0f} de {total_seconds / 60:.0f} min "
+            f"de áudio transcritos")
+
+
+def process_audio_for_transcription(audio_path, duration_seconds=None, client=None, media_info=None,
+                                    events=DEFAULT_EVENTS):
+    """
+    Processa um arquivo de áudio para transcrição.
+    media_info (ver probe_media) evita sondar o arquivo novamente.
+    """
+    if client is None:
+        raise ValueError("Cliente OpenAI não informado")
+
+    try:
+        logger.info(f"Iniciando processamento do áudio: {audio_path}")
+
+        # Verificar se o arquivo de áudio existe
+        if not os.path.exists(audio_path):
+            raise FileNotFoundError(
+                f"O arquivo de áudio não foi encontrado: {audio_path}")
+
+        # Verificar se o arquivo tem tamanho > 0
+        if os.path.getsize(audio_path) == 0:
+            raise ValueError("O arquivo de áudio está vazio")
+
+        # Dividir o áudio em chunks
+        with timed_stage('divisao', events, bytes_in=os.path.getsize(audio_path)) as record:
+            audio_chunks = split_audio(
+                audio_path, chunk_duration=1200, duration=duration_seconds, media_info=media_info)  # 20 minutos por chunk
+            record['chunks'] = len(audio_chunks)
+            record['bytes_out'] = sum(os.path.getsize(path) for path, _ in audio_chunks
+                                      if path != audio_path and os.path.exists(path))
+        # As partes são juntadas uma única vez no final
+        transcript_parts = []
+
+        # O progresso é medido em segundos de áudio transcritos; sem a duração,
+        # em chunks
+        total_seconds = duration_seconds or (media_info.duration if media_info else None)
+        chunk_ends = [start for _, start in audio_chunks[1:]] + [total_seconds]
+
+        logger.info(
+            f"Iniciando transcrição de {len(audio_chunks)} chunks de áudio")
+        if total_seconds:
+            events.progress('transcricao', 0, total_seconds,
+                            _transcribed_message(0, total_seconds))
+        else:
+            events.progress('transcricao', 0, len(audio_chunks))
+
+        # Processar cada chunk de áudio
+        for i, (chunk_path, start_time) in enumerate(audio_chunks):
+            logger.info(f"Processando chunk {i+1}/{len(audio_chunks)}")
+
+            # Verificar se o chunk existe e tem tamanho > 0
+            if not os.path.exists(chunk_path) or os.path.getsize(chunk_path) == 0:
+                logger.warning(
+                    f"Chunk {i+1} não existe ou está vazio, pulando...")
+                continue
+
+            chunk_size = os.path.getsize(chunk_path)
+            logger.info(
+                f"Tamanho do chunk: {chunk_size / (1024 * 1024):.2f} MB")
+
+            with timed_stage('transcricao', events, api='transcription', chunk=i + 1,
+                             bytes_in=chunk_size) as record:
+                chunk_transcript = transcreve_audio_chunk(chunk_path, client)
+                record['bytes_out'] = len((chunk_transcript or '').encode('utf-8'))
+            if chunk_transcript:
+                adjusted_transcript = ajusta_tempo_srt(
+                    chunk_transcript, start_time)
+                transcript_parts.append(adjusted_transcript + "\n\n")
+                # As legendas do chunk já podem ser lidas antes do fim do vídeo
+                events.transcript_chunk(adjusted_transcript, start_time, chunk_ends[i])
+
+            # Remove o chunk de áudio após a transcrição
+            try:
+                os.remove(chunk_path)
+            except Exception as e:
+                logger.warning(
+                    f"Não foi possível remover o chunk {chunk_path}: {str(e)}")
+
+            if total_seconds:
+                events.progress('transcricao', chunk_ends[i], total_seconds,
+                                _transcribed_message(chunk_ends[i], total_seconds))
+            else:
+                events.progress('transcricao', i + 1, len(audio_chunks))
+
+        logger.info("Transcrição completa")
+        return "".join(transcript_parts)
+
+    except Exception as e:
+        logger.exception(f"Erro ao processar o áudio: {str(e)}")
+        raise
+
+
+def process_video(video_path_or_url, client=None, media_info=None, events=DEFAULT_EVENTS,
+                  workdir=None):
+    """
+    Processa um arquivo de vídeo, extraindo o áudio e retornando a transcrição.
+    media_info (ver probe_media) é sondado aqui apenas se não for informado.
+    O áudio e os chunks são gravados em workdir (ver workspace.py).
+    """
+    temp_audio_file = None
+    try:
+        # Criar um arquivo temporário para o áudio
+        temp_audio_file = tempfile.NamedTemporaryFile(
+            delete=False, suffix='.mp3', dir=workdir)
+        temp_audio_file.close()
+        audio_path = temp_audio_file.name
+
+        logger.info(f"Iniciando processamento do vídeo: {video_path_or_url}")
+        logger.info(f"Arquivo de áudio temporário criado: {audio_path}")
+
+        if media_info is None:
+            media_info = probe_source(video_path_or_url, events)
+        if not media_info.has_audio:
+            raise ValueError("O vídeo não possui faixa de áudio")
+
+        # Extrair somente a faixa de áudio, já na codificação para fala
+        events.info("Extraindo o áudio do vídeo...")
+        try:
+            with timed_stage('extracao', events, bytes_in=media_info.size) as record:
+                extract_audio_to_file(video_path_or_url, audio_path)
+                record['bytes_out'] = os.path.getsize(audio_path)
+        except Exception as e:
+            logger.error(f"Erro ao extrair áudio: {str(e)}")
+            raise
+
+        logger.info(f"Áudio extraído e salvo em: {audio_path}")
+
+        # Verificar se o arquivo de áudio foi criado corretamente
+        if not os.path.exists(audio_path):
+            raise FileNotFoundError(
+                f"O arquivo de áudio não foi criado: {audio_path}")
+
+        # Verificar se o arquivo tem tamanho > 0
+        if os.path.getsize(audio_path) == 0:
+            raise ValueError("O arquivo de áudio foi criado mas está vazio")
+
+        # Processar o áudio extraído (metadados conhecidos, sem nova sondagem)
+        return process_audio_for_transcription(
+            audio_path, media_info.duration, client=client,
+            media_info=speech_audio_info(audio_path, media_info.duration),
+            events=events)
+
+    except Exception as e:
+        logger.exception(f"Erro ao processar o vídeo: {str(e)}")
+        raise
+
+    finally:
+        # Limpar arquivo temporário
+        if temp_audio_file and os.path.exists(temp_audio_file.name):
+            try:
+                os.remove(temp_audio_file.name)
+            except Exception as e:
+                logger.warning(
+                    f"Não foi possível remover o arquivo temporário {temp_audio_file.name}: {str(e)}")
+
+########################################
+# FUNÇÕES DE TRANSCRIÇÃO DE VIDEO DO YOUTUBE
+########################################
+
+
+def process_youtube_video_simple(youtube_url, client=None, caption_policy=None, events=DEFAULT_EVENTS,
+                                 workdir=None):
+    """
+    Função simplificada para processar vídeos do YouTube usando yt-dlp.
+
+    Os metadados são extraídos uma única vez. Se o vídeo tiver legendas em
+    português aceitas pela caption_policy (ver select_youtube_caption_track),
+    elas são usadas diretamente. Caso contrário, o menor formato somente de
+    áudio é baixado sem transcodificação e segue direto para a divisão em
+    chunks, que já codifica no formato otimizado para fala.
+
+    Erros são propagados (com a causa original encadeada) para quem chamou.
+    """
+    try:
+        import yt_dlp
+    except ImportError as e:
+        raise RuntimeError(
+            "Biblioteca yt-dlp não encontrada. Instale com: pip install yt-dlp") from e
+
+    with tempfile.TemporaryDirectory(dir=workdir) as temp_dir:
+        ydl_opts = {
+            'format': YOUTUBE_AUDIO_FORMAT,
+            'outtmpl': os.path.join(temp_dir, '%(id)s.%(ext)s'),
+            'quiet': True,
+            'no_warnings': True,
+            'extract_flat': False,
+            'noplaylist': True,
+        }
+
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            try:
+                info = ydl.extract_info(youtube_url, download=False)
+            except Exception as e:
+                logger.error(f"Erro ao extrair informações do vídeo: {str(e)}")
+                raise Exception(
+                    f"Não foi possível acessar o vídeo: {str(e)}") from e
+
+            video_title = info.get('title') or 'video_youtube'
+            video_duration = info.get('duration') or 0
+
+            # Legendas existentes dispensam o download e a transcrição do áudio
+            srt_content = fetch_youtube_captions(info, caption_policy)
+            if srt_content:
+                events.info("Usando as legendas existentes do vídeo.")
+                return srt_content, video_title, video_duration
+
+            # Baixar o áudio reaproveitando as informações já extraídas
+            events.info("Baixando o áudio do YouTube...")
+            try:
+                with timed_stage('download', events, source='youtube') as record:
+                    info = ydl.process_ie_result(info, download=True)
+                    record['bytes_in'] = sum(
+                        os.path.getsize(download['filepath'])
+                        for download in info.get('requested_downloads') or []
+                        if download.get('filepath') and os.path.exists(download['filepath']))
+            except Exception as e:
+                logger.error(f"Erro ao baixar vídeo: {str(e)}")
+                raise Exception(
+                    f"Não foi possível baixar o vídeo: {str(e)}") from e
+
+        # Encontrar o arquivo de áudio baixado
+        downloads = info.get('requested_downloads') or []
+        audio_path = downloads[0].get('filepath') if downloads else None
+        if not audio_path or not os.path.exists(audio_path):
+            audio_files = os.listdir(temp_dir)
+            if not audio_files:
+                raise Exception("Não foi possível baixar o áudio do vídeo")
+            audio_path = os.path.join(temp_dir, audio_files[0])
+
+        # Verificar se o arquivo tem tamanho > 0
+        if os.path.getsize(audio_path) == 0:
+            raise Exception(
+                "O arquivo de áudio foi baixado mas está vazio")
+
+        logger.info(
+            f"Áudio do YouTube baixado ({info.get('format_id')}, "
+            f"{os.path.getsize(audio_path) / (1024 * 1024):.2f} MB): {audio_path}")
+
+        # Processar o áudio usando a função específica para áudio
+        srt_content = process_audio_for_transcription(
+            audio_path, video_duration, client=client, events=events)
+
+        # Retornar tanto o conteúdo SRT quanto o título do vídeo e duração
+        return srt_content, video_title, video_duration
+
+########################################
+# FUNÇÕES DE TRANSCRIÇÃO DE VIDEO DO VIMEO
+########################################
+
+
+def process_vimeo_video(vimeo_url, client=None, events=DEFAULT_EVENTS, workdir=None):
+    """
+    Processa um vídeo do Vimeo extraindo apenas o áudio da fonte mais leve
+    disponível (rendição de áudio ou playlist adaptativa)
+    """
+    vimeo_client = get_vimeo_client()
+    if not vimeo_client:
+        raise RuntimeError(
+            "Credenciais do Vimeo não configuradas (VIMEO_ACCESS_TOKEN).")
+
+    video_id = extrair_video_id(vimeo_url)
+    if not video_id:
+        raise ValueError(f"URL do Vimeo inválida: {vimeo_url}")
+
+    video_info = get_vimeo_video_info(video_id, vimeo_client)
+    source_url, source_type = select_vimeo_audio_source(video_info)
+    if not source_url:
+        raise Exception("Não foi possível encontrar uma fonte de áudio no Vimeo")
+
+    video_title = video_info.get('name') or f"vimeo_{video_id}"
+    video_duration = video_info.get('duration') or 0
+    logger.info(
+        f"Extraindo áudio do Vimeo ({source_type}) para o vídeo {video_id}")
+    events.info("Extraindo o áudio do Vimeo...")
+
+    with tempfile.TemporaryDirectory(dir=workdir) as temp_dir:
+        audio_path = os.path.join(temp_dir, f"vimeo_{video_id}.mp3")
+        # Leitura remota e extração acontecem juntas no ffmpeg
+        with timed_stage('extracao', events, source='vimeo') as record:
+            extract_audio_to_file(source_url, audio_path)
+            record['bytes_out'] = os.path.getsize(audio_path)
+
+        if os.path.getsize(audio_path) == 0:
+            raise Exception("O áudio extraído do Vimeo está vazio")
+
+        srt_content = process_audio_for_transcription(
+            audio_path, video_duration, client=client,
+            media_info=speech_audio_info(audio_path, video_duration),
+            events=events)
+        return srt_content, video_title, video_duration
+
+########################################
+# FUNÇÕES DE PROCESSO DE TRANSCRIÇÃO EM SRT E PDF
+########################################
+
+
+def generate_summarized_srt_from_full(srt_content, client, model, events=DEFAULT_EVENTS):
+    """
+    Generate a summarized SRT that maintains timing but provides concise summaries
+    of key points with topic and explanation format.
+    """
+    segments = []
+    current_segment = {}
+    current_text = []
+
+    # Parse original SRT content
+    for line in srt_content.strip().split('\n'):
+        line = line.strip()
+        if line.isdigit():  # Segment number
+            if current_segment:
+                current_segment['text'] = ' '.join(current_text)
+                segments.append(current_segment)
+                current_segment = {}
+                current_text = []
+        elif '-->' in line:  # Timestamp
+            start, end = line.split(' --> ')
+            current_segment['start_time'] = start.strip()
+            current_segment['end_time'] = end.strip()
+        elif line:  # Content
+            current_text.append(line)
+
+    # Add last segment if exists
+    if current_segment and current_text:
+        current_segment['text'] = ' '.join(current_text)
+        segments.append(current_segment)
+
+    # Group segments into meaningful chunks
+    chunk_size = 3  # Adjust based on your needs
+    chunks = [segments[i:i + chunk_size]
+              for i in range(0, len(segments), chunk_size)]
+
+    # Generate summaries for each chunk
+    summarized_segments = []
+    events.progress('resumo', 0, len(chunks))
+    for done, chunk in enumerate(chunks, 1):
+        # Combine text from segments in chunk
+        chunk_text = " ".join(seg['text'] for seg in chunk)
+
+        # Generate summary using OpenAI with specific format prompt
+        with timed_stage('resumo', events, api='chat', chunk=done) as record:
+            response = _summarize_chunk(client, model, chunk_text)
+            usage = getattr(response, 'usage', None)
+            if usage:
+                record['tokens_in'] = usage.prompt_tokens
+                record['tokens_out'] = usage.completion_tokens
+
+        summary = response.choices[0].message.content.strip()
+
+        # Create new segment with summary
+        summarized_segments.append({
+            'start_time': chunk[0]['start_time'],
+            'end_time': chunk[-1]['end_time'],
+            'text': summary
+        })
+        events.progress('resumo', done, len(chunks))
+
+    # Convert summarized segments back to SRT format
+    srt_output = ""
+    for i, segment in enumerate(summarized_segments, 1):
+        srt_output += f"{i}\n"
+        srt_output += f"{segment['start_time']} --> {segment['end_time']}\n"
+        srt_output += f"{segment['text']}\n\n"
+
+    # Para a versão sem timestamps, criar uma versão separada com linhas em branco entre os segmentos
+    text_only_output = "\n\n".join(
+        segment['text'] for segment in summarized_segments)
+
+    return srt_output, text_only_output
+
+
+def _summarize_chunk(client, model, chunk_text):
+    """
+    Pede à OpenAI o resumo de um trecho da transcrição no formato "Tópico: explicação"
+    """
+    return create_chat_completion(
+        client,
+        model=model,
+        messages=[
+            {"role": "system",
+             "content": """Você é um especialista em criar resumos estruturados em português do Brasil.
+                Para cada segmento, forneça um resumo EXATAMENTE neste formato:
+
+                Título do tópico: Explicação concisa e direta do conteúdo.
+
+                O título deve ser curto e direto, seguido de dois pontos.
+                A explicação deve ser uma única frase clara e informativa.
+                Cada resumo deve ter exatamente uma linha com o título e a explicação.
+
+                Exemplo exato do formato:
+                Curso Intensivo sobre Nietzsche: O curso foca em uma das obras mais significativas de Nietzsche, considerada por alguns como uma das maiores contribuições da humanidade."""},
+            {"role": "user",
+             "content": f"Resuma este segmento no formato especificado: {chunk_text}"}
+        ],
+        max_tokens=150,
+        temperature=0.4
+    )
+
+
+def build_transcription_result(srt_content, client, model, name, duration=0, events=DEFAULT_EVENTS):
+    """
+    Gera o resumo de uma transcrição e monta o resultado do pipeline:
+    um dicionário com o nome base dos arquivos, a duração, o SRT completo,
+    o SRT resumido e o resumo em texto
+    """
+    events.info("Gerando resumo da transcrição...")
+    summarized_srt, text_only_summary = generate_summarized_srt_from_full(
+        srt_content, client, model, events=events)
+    return {
+        'name': name,
+        'duration': duration or 0,
+        'srt': srt_content,
+        'summary_srt': summarized_srt,
+        'summary_text': text_only_summary,
+    }
+
+
+def _render_pdf(text, filename, events, output_path=None):
+    """
+    Gera um PDF medido como a etapa 'pdf'. Com output_path, grava direto no
+    arquivo e retorna o caminho; sem ele, retorna os bytes.
+    """
+    with timed_stage('pdf', events, file=filename, bytes_in=len(text.encode('utf-8'))) as record:
+        if output_path:
+            create_pdf(text, filename, output_path=output_path)
+            record['bytes_out'] = os.path.getsize(output_path)
+            return output_path
+        content = create_pdf(text, filename).getvalue()
+        record['bytes_out'] = len(content)
+    return content
+
+
+def render_transcription_files(result, events=DEFAULT_EVENTS):
+    """
+    Gera os arquivos de um resultado do pipeline. Retorna um dicionário
+    {nome do arquivo: bytes} com os SRTs e PDFs completos e resumidos.
+    """
+    name = result['name']
+    transcript_pdf = _render_pdf(processa_srt_sem_timestamp(
+        result['srt']), f"{name}{TRANSCRIPTION_PDF_SUFFIX}", events)
+    summarized_pdf = _render_pdf(
+        result['summary_text'], f"{name}{SUMMARY_PDF_SUFFIX}", events)
+    return {
+        f"{name}{SUMMARY_PDF_SUFFIX}": summarized_pdf,
+        f"{name}{SUMMARY_SRT_SUFFIX}": result['summary_srt'].encode('utf-8'),
+        f"{name}{TRANSCRIPTION_PDF_SUFFIX}": transcript_pdf,
+        f"{name}{TRANSCRIPTION_SRT_SUFFIX}": result['srt'].encode('utf-8'),
+    }
+
+
+def artifact_kind(path):
+    """
+    Tipo de artefato (ver ARTIFACT_SUFFIXES) de um arquivo gerado pelo pipeline
+    """
+    for kind, suffix in ARTIFACT_SUFFIXES.items():
+        if path.endswith(suffix):
+            return kind
+    return None
+
+
+def stored_artifact_files(result):
+    """
+    Caminhos dos arquivos já gerados para um resultado do histórico, se todos
+    ainda existem com o nome atual do resultado (senão, None)
+    """
+    artifacts = result.get('artifacts') or {}
+    paths = []
+    for kind, suffix in ARTIFACT_SUFFIXES.items():
+        path = artifacts.get(kind)
+        if (not path or os.path.basename(path) != f"{result['name']}{suffix}"
+                or not os.path.exists(path)):
+            return None
+        paths.append(path)
+    return paths
+
+
+def write_transcription_files(result, out_dir, events=DEFAULT_EVENTS):
+    """
+    Grava os arquivos de um resultado do pipeline em out_dir e retorna os
+    caminhos. Cada arquivo vai direto para o disco, sem passar por um buffer
+    com todos eles (ver render_transcription_files).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    name = result['name']
+
+    def write_text(suffix, content):
+        path = output_file_path(out_dir, f"{name}{suffix}")
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            f.write(content)
+        return path
+
+    def write_pdf(suffix, text):
+        path = output_file_path(out_dir, f"{name}{suffix}")
+        return _render_pdf(text, os.path.basename(path), events, output_path=path)
+
+    paths = [
+        write_pdf(SUMMARY_PDF_SUFFIX, result['summary_text']),
+        write_text(SUMMARY_SRT_SUFFIX, result['summary_srt']),
+        write_pdf(TRANSCRIPTION_PDF_SUFFIX, processa_srt_sem_timestamp(result['srt'])),
+        write_text(TRANSCRIPTION_SRT_SUFFIX, result['srt']),
+    ]
+    return paths
+
+
+def save_result_to_drive(drive_service, video_file_id, result, events=DEFAULT_EVENTS, workdir=None):
+    """
+    Salva a transcrição completa e o resumo na pasta do vídeo original no Drive
+    """
+    with timed_stage('upload_drive', events) as record:
+        uploaded_files = save_transcription_to_drive(
+            drive_service,
+            video_file_id,
+            result['srt'],
+            result['summary_text'],
+            result['name'],
+            events=events,
+            workdir=workdir
+        )
+        record['files'] = len(uploaded_files or [])
+    return uploaded_files
+
+########################################
+# PIPELINE COMPLETO POR FONTE
+########################################
+
+
+def is_youtube_url(source):
+    return re.search(r'(youtube\.com|youtu\.be)/', source) is not None
+
+
+def is_vimeo_url(source):
+    return re.search(r'vimeo\.com/', source) is not None
+
+
+def transcribe_source(source, client, model=DEFAULT_SUMMARY_MODEL, drive_service=None, name=None,
+                      events=DEFAULT_EVENTS, workdir=None, history=None, source_key=None,
+                      refresh_history=False, owner=None):
+    """
+    Transcreve e resume um vídeo de qualquer fonte suportada: URL do YouTube
+    ou do Vimeo, URI gs:// ou URL do Cloud Storage, URL de arquivo do Drive
+    (ou 'drive:<ID>', exige drive_service), caminho local ou outra URL lida
+    diretamente pelo ffmpeg.
+
+    Os arquivos intermediários ficam em workdir; sem ele, um diretório de
+    trabalho próprio é criado e liberado ao final (ver workspace.py).
+
+    Com history (ver history_store.HistoryStore), a fonte é procurada no
+    histórico pela sua identidade, que para arquivos do Drive e objetos do
+    Cloud Storage inclui a versão lida dos metadados e para outras URLs é o
+    hash do vídeo baixado. Se encontrada, o resultado guardado é retornado
+    com 'from_history' e 'history_id', sem transcrever; senão, o resultado
+    novo é guardado em nome de owner. source_key evita recalcular a
+    identidade da fonte (ver history_store.source_identity) e
+    refresh_history transcreve de novo, substituindo o que estava guardado.
+
+    Retorna o resultado de build_transcription_result com 'title', 'seconds'
+    (tempo total) e, para vídeos do Drive, 'drive_file_id'. Levanta RuntimeError se
+    a transcrição falhar.
+    """
+    if workdir is None:
+        with get_workspace_manager().workspace() as workdir:
+            return transcribe_source(source, client, model, drive_service, name,
+                                     events=events, workdir=workdir, history=history,
+                                     source_key=source_key, refresh_history=refresh_history,
+                                     owner=owner)
+
+    started = time.time()
+    drive_file_id = None
+
+    def from_history(key):
+        if history is None or not key or refresh_history:
+            return None
+        stored = history.find(key, model, owner=owner)
+        if stored is not None:
+            events.success("Transcrição encontrada no histórico, sem processar o vídeo novamente.")
+            if name:
+                stored['name'] = name
+            stored['seconds'] = time.time() - started
+            stored['from_history'] = True
+        return stored
+
+    if history is not None and source_key is None:
+        source_key = source_identity(source)
+    stored = from_history(source_key)
+    if stored is not None:
+        return stored
+
+    if is_youtube_url(source):
+        srt_content, title, duration = process_youtube_video_simple(
+            source, client=client, events=events, workdir=workdir)
+        default_name = clean_filename(title) if title else None
+
+    elif is_vimeo_url(source):
+        srt_content, title, duration = process_vimeo_video(
+            source, client=client, events=events, workdir=workdir)
+        default_name = clean_filename(title) if title else None
+
+    elif source.startswith('drive:') or 'drive.google.com/' in source:
+        drive_file_id = source[len('drive:'):] if source.startswith(
+            'drive:') else get_file_id_from_url(source)
+        if not drive_file_id:
+            raise ValueError(f"Não foi possível extrair o ID do arquivo de {source}")
+        if drive_service is None:
+            raise ValueError("Vídeos do Google Drive exigem o serviço do Drive")
+        video = drive_service.files().get(
+            fileId=drive_file_id, fields='id, name, md5Checksum, headRevisionId',
+            supportsAllDrives=True).execute()
+        if history is not None and source_key is None:
+            source_key = drive_identity(video)
+            stored = from_history(source_key)
+            if stored is not None:
+                stored['drive_file_id'] = drive_file_id
+                return stored
+        srt_content, duration = _transcribe_downloaded(
+            lambda: download_video_from_drive(
+                drive_service, drive_file_id, video['name'], events=events, dest_dir=workdir),
+            client, events, workdir)
+        title = video['name']
+        default_name = output_basename_from_filename(title)
+
+    elif parse_gcs_url(source):
+        generation = None
+        if history is not None and source_key is None:
+            # A geração consultada aqui é a baixada: a chave corresponde ao que foi transcrito
+            generation = get_gcs_generation(source)
+            source_key = gcs_identity(*parse_gcs_url(source), generation)
+            stored = from_history(source_key)
+            if stored is not None:
+                return stored
+
+        def download():
+            events.info("Baixando o vídeo do GCS...")
+            return download_gcs_video(
+                source, progress_callback=lambda done, total: events.progress('download', done, total),
+                dest_dir=workdir, generation=generation)
+        srt_content, duration = _transcribe_downloaded(download, client, events, workdir)
+        title = default_name = extract_filename_from_path(source)
+
+    elif source.startswith(('http://', 'https://')) and history is not None and source_key is None:
+        # O conteúdo de uma URL pode mudar sem que ela mude: com histórico, o
+        # vídeo é baixado e identificado pelo hash, como um arquivo local
+        def download():
+            events.info("Baixando o vídeo...")
+            return download_video_from_url(
+                source, progress_callback=lambda done, total: events.progress('download', done, total),
+                dest_dir=workdir)
+        local_path = _download(download, events)
+        with open(local_path, 'rb') as f:
+            source_key = f"sha256:{file_sha256(f)}"
+        stored = from_history(source_key)
+        if stored is not None:
+            os.remove(local_path)
+            return stored
+        srt_content, duration = _transcribe_local_copy(local_path, client, events, workdir)
+        title = default_name = extract_filename_from_path(source)
+
+    else:
+        if not source.startswith(('http://', 'https://')) and not os.path.exists(source):
+            raise FileNotFoundError(f"Arquivo não encontrado: {source}")
+        # Metadados lidos uma única vez e repassados às etapas seguintes
+        media_info = probe_source(source, events)
+        srt_content = process_video(
+            source, client=client, media_info=media_info, events=events, workdir=workdir)
+        duration = media_info.duration
+        title = default_name = extract_filename_from_path(source)
+
+    if not srt_content:
+        raise RuntimeError("Não foi possível realizar a transcrição.")
+
+    events.success("Transcrição automática concluída!")
+    result = build_transcription_result(
+        srt_content, client, model, name or default_name or 'video', duration, events=events)
+    result['title'] = title or result['name']
+    result['seconds'] = time.time() - started
+    if drive_file_id:
+        result['drive_file_id'] = drive_file_id
+    if history is not None and source_key:
+        result['history_id'] = history.save(source_key, model, source, result, owner=owner)
+    return result
+
+
+def _download(download, events):
+    """
+    Executa download() (que retorna o caminho local), medindo a etapa de download
+    """
+    with timed_stage('download', events) as record:
+        local_path = download()
+        if local_path and os.path.exists(local_path):
+            record['bytes_in'] = os.path.getsize(local_path)
+    if not local_path:
+        raise RuntimeError("Erro ao fazer download do vídeo.")
+    return local_path
+
+
+def _transcribe_downloaded(download, client, events, workdir=None):
+    """
+    Baixa um vídeo com download() (que retorna o caminho local), transcreve e
+    remove o arquivo baixado. Retorna (srt, duração).
+    """
+    return _transcribe_local_copy(_download(download, events), client, events, workdir)
+
+
+def _transcribe_local_copy(local_path, client, events, workdir=None):
+    """
+    Transcreve um vídeo já baixado e remove o arquivo. Retorna (srt, duração).
+    """
+    try:
+        media_info = probe_source(local_path, events)
+        srt_content = process_video(
+            local_path, client=client, media_info=media_info, events=events, workdir=workdir)
+        return srt_content, media_info.duration
+    finally:
+        try:
+            os.remove(local_path)
+        except Exception as e:
+            logger.warning(
+                f"Não foi possível remover o arquivo temporário {local_path}: {str(e)}")
+
+
+def _drive_source_key(drive_service, video):
+    """
+    Identidade no histórico de um vídeo do Drive (ver history_store.drive_identity).
+    As listagens já trazem a versão; na falta dela, os metadados são consultados.
+    """
+    if not (video.get('md5Checksum') or video.get('headRevisionId')):
+        video = drive_service.files().get(
+            fileId=video['id'], fields='id, md5Checksum, headRevisionId',
+            supportsAllDrives=True).execute()
+    return drive_identity(video)
+
+
+def transcribe_drive_video_job(drive_service, video, client, model, download_progress=None,
+                               events=DEFAULT_EVENTS, history=None):
+    """
+    Pipeline completo de um vídeo do Drive: download, transcrição, resumo e
+    salvamento na pasta do vídeo. Pode ser executado fora da thread principal
+    (modo em lote, observador de pastas). Com history, um vídeo já guardado
+    no histórico só é salvo na pasta, sem novo download.
+    """
+    started = time.time()
+    if download_progress is None:
+        def download_progress(downloaded, total):
+            events.progress('download', downloaded, total)
+
+    source = f"drive:{video['id']}"
+    source_key = _drive_source_key(drive_service, video) if history is not None else None
+    result = history.find(source_key, model) if source_key else None
+    if result is not None:
+        events.success("Transcrição encontrada no histórico, sem baixar o vídeo novamente.")
+    with get_workspace_manager().workspace() as workdir:
+        if result is None:
+            srt_content, duration = _transcribe_downloaded(
+                lambda: download_video_from_drive(
+                    drive_service, video['id'], video['name'],
+                    progress_callback=download_progress, events=events, dest_dir=workdir),
+                client, events, workdir)
+            if not srt_content:
+                raise RuntimeError("Não foi possível realizar a transcrição.")
+
+            result = build_transcription_result(
+                srt_content, client, model, output_basename_from_filename(video['name']),
+                duration, events=events)
+            result['title'] = video['name']
+            if source_key:
+                history.save(source_key, model, source, result)
+        uploaded_files = save_result_to_drive(
+            drive_service, video['id'], result, events=events, workdir=workdir)
+
+    return {'uploaded_files': uploaded_files, 'seconds': time.time() - started}
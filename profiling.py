@@ -0,0 +1,245 @@
+"""
+Perfil de CPU e de memória de um job, sob demanda.
+
+profile_run envolve a execução de um job: uma thread de fundo amostra a pilha
+da thread do job em intervalos fixos de tempo real (as esperas em
+subprocessos do ffmpeg e na rede também aparecem, como no relógio do
+usuário) e o tracemalloc registra as alocações, com um snapshot a cada novo
+pico de memória. Ao final, com ou sem erro, são gravados:
+
+- perfil.txt: funções com mais tempo (próprio e acumulado) e os pontos de
+  alocação no pico de memória;
+- perfil_cpu.folded: pilhas no formato "folded", que abre direto no
+  speedscope (https://www.speedscope.app) ou no flamegraph.pl.
+
+O tracemalloc é global ao processo: só um job por vez tem perfil de memória
+(os demais ficam só com o de CPU). Ele também deixa mais lento o código que
+aloca muito (imports, por exemplo), então os tempos de um job com perfil não
+são comparáveis aos de um job sem perfil; use memory=False para medir só CPU.
+
+Cada amostra vale o tempo real desde a amostra anterior: se a thread de
+amostragem atrasar (disputando o GIL com código Python intenso), o tempo não
+se perde, fica com a pilha observada.
+"""
+
+import os
+import sys
+import time
+import logging
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+PROFILE_SAMPLE_INTERVAL = float(os.getenv('TRANSCRIPTION_PROFILE_INTERVAL', '0.005'))  # segundos
+# Quadros guardados por alocação. O custo do tracemalloc cresce muito com a
+# profundidade (importar o reportlab leva ~6x mais com 1 quadro e ~80x com 15)
+PROFILE_TRACEMALLOC_FRAMES = int(os.getenv('TRANSCRIPTION_PROFILE_TRACEMALLOC_FRAMES', '1'))
+PROFILE_SNAPSHOT_GROWTH = 1.2  # novo snapshot quando o pico cresce 20%
+PROFILE_SNAPSHOT_MIN_INTERVAL = 1.0  # segundos entre snapshots do tracemalloc
+PROFILE_TOP = 30  # linhas de cada tabela do relatório
+
+PROFILE_ARTIFACTS = {
+    'profile': 'perfil.txt',
+    'profile_stacks': 'perfil_cpu.folded',
+}
+
+_REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+_tracemalloc_lock = threading.Lock()
+
+
+def _short_path(filename):
+    """
+    Caminho relativo ao projeto ou, para bibliotecas, a partir do pacote
+    """
+    if filename.startswith(_REPO_DIR + os.sep):
+        return os.path.relpath(filename, _REPO_DIR)
+    for marker in ('site-packages', 'dist-packages'):
+        if marker in filename:
+            return filename.split(marker, 1)[1].lstrip(os.sep)
+    parts = filename.split(os.sep)
+    return os.sep.join(parts[-2:])
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+
+
+class JobProfiler:
+    """
+    Amostragem de CPU de uma thread e snapshots do tracemalloc. Use via
+    profile_run; files traz os caminhos gravados por tipo de artefato.
+    """
+
+    def __init__(self, thread_id, interval=PROFILE_SAMPLE_INTERVAL, memory=True):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.memory = memory
+        self.stacks = Counter()  # pilha -> segundos
+        self.samples = 0
+        self.started = None
+        self.seconds = 0.0
+        self.files = {}
+        self.memory_peak = 0
+        self.memory_snapshot = None
+        self.memory_unavailable = None
+        self._snapshot_peak = 0
+        self._snapshot_at = 0.0
+        self._labels = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self._owns_tracemalloc = False
+
+    def start(self):
+        if not self.memory:
+            self.memory_unavailable = "desativada"
+        elif not _tracemalloc_lock.acquire(blocking=False):
+            self.memory_unavailable = "outro job já está com o perfil de memória ativo"
+        elif tracemalloc.is_tracing():
+            _tracemalloc_lock.release()
+            self.memory_unavailable = "o tracemalloc já estava ativo no processo"
+        else:
+            self._owns_tracemalloc = True
+            tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._sample_loop, name="job-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.seconds = time.perf_counter() - self.started
+        if self._owns_tracemalloc:
+            try:
+                self._maybe_snapshot(force=True)
+            finally:
+                tracemalloc.stop()
+                self._owns_tracemalloc = False
+                _tracemalloc_lock.release()
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = _frame_label(code)
+        return label
+
+    def _sample_loop(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            self.stacks[tuple(reversed(stack))] += elapsed
+            self.samples += 1
+            if self._owns_tracemalloc:
+                self._maybe_snapshot()
+
+    def _maybe_snapshot(self, force=False):
+        """
+        Guarda um snapshot das alocações quando a memória rastreada atinge
+        um novo pico (com intervalo mínimo, porque o snapshot é caro)
+        """
+        current, peak = tracemalloc.get_traced_memory()
+        self.memory_peak = max(self.memory_peak, peak)
+        now = time.perf_counter()
+        if force:
+            if self.memory_snapshot is not None and current <= self._snapshot_peak:
+                return
+        elif (current <= self._snapshot_peak * PROFILE_SNAPSHOT_GROWTH
+              or now - self._snapshot_at < PROFILE_SNAPSHOT_MIN_INTERVAL):
+            return
+        self.memory_snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+        ))
+        self._snapshot_peak = current
+        self._snapshot_at = now
+
+    def report(self, title=None):
+        """
+        Relatório em texto: funções com mais tempo e pontos de alocação
+        """
+        own = Counter()
+        total = Counter()
+        for stack, seconds in self.stacks.items():
+            own[stack[-1]] += seconds
+            for label in set(stack):
+                total[label] += seconds
+        sampled = sum(self.stacks.values())
+
+        lines = []
+        if title:
+            lines += [title, '']
+        lines.append(f"Duração: {self.seconds:.2f}s · {self.samples} amostras, uma a cada "
+                     f"{self.interval * 1000:.0f} ms (tempo real, inclui esperas)")
+        for heading, totals in (("Tempo próprio (função no topo da pilha)", own),
+                                ("Tempo acumulado (função em qualquer ponto da pilha)", total)):
+            lines += ['', heading, f"{'s':>9} {'%':>6}  função"]
+            for label, seconds in totals.most_common(PROFILE_TOP):
+                share = seconds / sampled * 100 if sampled else 0
+                lines.append(f"{seconds:>9.2f} {share:>5.1f}%  {label}")
+
+        lines += ['', "Memória (tracemalloc)"]
+        if self.memory_snapshot is None:
+            lines.append(f"Não medida: {self.memory_unavailable or 'sem snapshot'}")
+        else:
+            lines.append(f"Pico rastreado: {self.memory_peak / (1024 * 1024):.1f} MB")
+            lines += ['', "Pontos de alocação no snapshot do maior uso de memória",
+                      f"{'KB':>9} {'blocos':>8}  linha"]
+            for stat in self.memory_snapshot.statistics('lineno')[:PROFILE_TOP]:
+                frame = stat.traceback[0]
+                lines.append(f"{stat.size / 1024:>9.1f} {stat.count:>8}  "
+                             f"{_short_path(frame.filename)}:{frame.lineno}")
+        return '\n'.join(lines) + '\n'
+
+    def folded(self):
+        """
+        Pilhas no formato folded ("a;b;c milissegundos" por linha)
+        """
+        lines = []
+        for stack, seconds in sorted(self.stacks.items()):
+            millis = round(seconds * 1000)
+            if millis:
+                lines.append(f"{';'.join(stack)} {millis}\n")
+        return ''.join(lines)
+
+    def write(self, out_dir, prefix='', title=None):
+        os.makedirs(out_dir, exist_ok=True)
+        contents = {'profile': self.report(title), 'profile_stacks': self.folded()}
+        for kind, filename in PROFILE_ARTIFACTS.items():
+            path = os.path.join(out_dir, prefix + filename)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(contents[kind])
+            self.files[kind] = path
+        return self.files
+
+
+@contextmanager
+def profile_run(out_dir, prefix='', title=None, memory=True):
+    """
+    Perfila o bloco (executado na thread atual) e grava os arquivos em
+    out_dir ao final, mesmo se o bloco falhar. Retorna o JobProfiler, cujo
+    atributo files traz os caminhos gravados por tipo de artefato.
+    """
+    profiler = JobProfiler(threading.get_ident(), memory=memory)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        try:
+            profiler.write(out_dir, prefix=prefix, title=title)
+            logger.info(f"Perfil gravado em {profiler.files['profile']}")
+        except Exception as e:
+            logger.warning(f"Não foi possível gravar o perfil em {out_dir}: {str(e)}")
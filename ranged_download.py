@@ -0,0 +1,338 @@
+"""
+Download paralelo por faixas de bytes (HTTP Range) com retomada.
+
+O arquivo de destino é pré-alocado e cada faixa é escrita diretamente na sua
+posição final. As faixas concluídas ficam registradas em um arquivo de estado
+ao lado do destino, de forma que um download interrompido recomeça apenas as
+faixas que faltam.
+"""
+
+import os
+import json
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+import requests
+from requests.adapters import HTTPAdapter
+from metrics import RETRIES
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_PART_SIZE = 16 * 1024 * 1024  # 16 MB por faixa
+DEFAULT_WORKERS = 8
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_TIMEOUT = 60
+STREAM_BLOCK_SIZE = 1024 * 1024  # 1 MB por escrita
+PROGRESS_INTERVAL = 0.5  # segundos entre chamadas do callback de progresso
+
+
+class RangedDownloadError(Exception):
+    """
+    Erro em um download por faixas (servidor sem suporte a Range, faixa incompleta, etc.)
+    """
+
+
+def plan_byte_ranges(total_size, part_size=DEFAULT_PART_SIZE):
+    """
+    Divide um arquivo de total_size bytes em faixas (início, fim) inclusivas
+    """
+    return [(start, min(start + part_size, total_size) - 1)
+            for start in range(0, total_size, part_size)]
+
+
+def _state_path(dest_path):
+    return f"{dest_path}.partes.json"
+
+
+def _load_completed_ranges(dest_path, total_size, part_size):
+    """
+    Lê as faixas já concluídas de um download anterior do mesmo arquivo
+    """
+    state_path = _state_path(dest_path)
+    if not os.path.exists(dest_path) or not os.path.exists(state_path):
+        return set()
+
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except Exception as e:
+        logger.warning(f"Estado de download inválido em {state_path}: {str(e)}")
+        return set()
+
+    # Só retoma se o download anterior usou o mesmo tamanho e o mesmo plano de faixas
+    if state.get('total_size') != total_size or state.get('part_size') != part_size:
+        return set()
+    if os.path.getsize(dest_path) != total_size:
+        return set()
+
+    return {tuple(r) for r in state.get('completed', [])}
+
+
+def _save_completed_ranges(dest_path, total_size, part_size, completed):
+    state_path = _state_path(dest_path)
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'total_size': total_size,
+            'part_size': part_size,
+            'completed': sorted(completed)
+        }, f)
+    os.replace(tmp_path, state_path)
+
+
+def _preallocate(dest_path, total_size):
+    with open(dest_path, 'wb') as fh:
+        if total_size and hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(fh.fileno(), 0, total_size)
+                return
+            except OSError:
+                pass
+        fh.truncate(total_size)
+
+
+def _resolve_headers(headers):
+    # Aceita um dicionário fixo ou uma função (útil para tokens que expiram)
+    if callable(headers):
+        return dict(headers() or {})
+    return dict(headers or {})
+
+
+class _ProgressCounter:
+    def __init__(self, initial=0):
+        self._lock = threading.Lock()
+        self.value = initial
+
+    def add(self, amount):
+        with self._lock:
+            self.value += amount
+
+
+def _fetch_range(session, url, headers, dest_path, start, end, counter,
+                 max_retries, timeout):
+    """
+    Baixa a faixa [start, end] para a posição correspondente do arquivo,
+    retomando do último byte escrito em caso de falha
+    """
+    offset = start
+    attempt = 0
+    while True:
+        try:
+            request_headers = _resolve_headers(headers)
+            request_headers['Range'] = f"bytes={offset}-{end}"
+            with session.get(url, headers=request_headers, stream=True, timeout=timeout) as response:
+                if response.status_code == 200:
+                    raise RangedDownloadError(
+                        "O servidor ignorou o cabeçalho Range")
+                response.raise_for_status()
+                if response.status_code != 206:
+                    raise RangedDownloadError(
+                        f"Resposta inesperada para faixa: HTTP {response.status_code}")
+
+                with open(dest_path, 'r+b') as fh:
+                    fh.seek(offset)
+                    for block in response.iter_content(STREAM_BLOCK_SIZE):
+                        if not block:
+                            continue
+                        block = block[:end + 1 - offset]
+                        fh.write(block)
+                        offset += len(block)
+                        counter.add(len(block))
+                        if offset > end:
+                            break
+
+            if offset <= end:
+                raise RangedDownloadError(
+                    f"Faixa {start}-{end} incompleta: parou em {offset}")
+            return start, end
+
+        except RangedDownloadError:
+            if offset == start:
+                raise
+            # Faixa parcialmente escrita: tentar novamente a partir do offset
+            attempt += 1
+        except requests.HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+            # Erros 4xx (exceto 408/429) não adiantam repetir
+            if status and 400 <= status < 500 and status not in (408, 429):
+                raise
+            attempt += 1
+        except (requests.RequestException, OSError) as e:
+            logger.warning(
+                f"Falha na faixa {start}-{end} (offset {offset}): {str(e)}")
+            attempt += 1
+
+        if attempt > max_retries:
+            raise RangedDownloadError(
+                f"Faixa {start}-{end} falhou após {max_retries} tentativas")
+
+        RETRIES.inc(operation='download')
+        # Backoff exponencial com jitter
+        time.sleep(min(2 ** attempt, 30) * random.uniform(0.5, 1.0))
+
+
+def _new_session(num_workers):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=num_workers)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def download_parts(dest_path, total_size, fetch_part, num_workers=DEFAULT_WORKERS,
+                   part_size=DEFAULT_PART_SIZE, progress_callback=None):
+    """
+    Motor genérico do download por faixas.
+
+    fetch_part(start, end, counter) deve escrever os bytes [start, end] na
+    posição correspondente de dest_path (ver RangeWriter) e somar os bytes
+    escritos em counter. O arquivo é pré-alocado, as faixas concluídas são
+    registradas para retomada e progress_callback(baixados, total) é chamado
+    na thread que chamou esta função.
+    """
+    ranges = plan_byte_ranges(total_size, part_size)
+    completed = _load_completed_ranges(dest_path, total_size, part_size)
+
+    if completed:
+        logger.info(
+            f"Retomando download de {dest_path}: {len(completed)}/{len(ranges)} faixas já concluídas")
+    else:
+        _preallocate(dest_path, total_size)
+
+    pending = [r for r in ranges if r not in completed]
+    already_done = sum(end - start + 1 for start, end in completed)
+    counter = _ProgressCounter(already_done)
+
+    if progress_callback:
+        progress_callback(counter.value, total_size)
+
+    if not pending:
+        _cleanup_state(dest_path)
+        return dest_path
+
+    state_lock = threading.Lock()
+
+    def run_range(start, end):
+        fetch_part(start, end, counter)
+        # Registrar a faixa assim que termina, para que uma falha em outra
+        # faixa não descarte o que já foi baixado
+        with state_lock:
+            completed.add((start, end))
+            _save_completed_ranges(dest_path, total_size, part_size, completed)
+
+    executor = ThreadPoolExecutor(max_workers=min(num_workers, len(pending)))
+    try:
+        not_done = {executor.submit(run_range, start, end)
+                    for start, end in pending}
+        while not_done:
+            done, not_done = wait(
+                not_done, timeout=PROGRESS_INTERVAL, return_when=FIRST_EXCEPTION)
+            for future in done:
+                # Propaga a primeira falha
+                future.result()
+            if progress_callback:
+                progress_callback(counter.value, total_size)
+
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    _cleanup_state(dest_path)
+    return dest_path
+
+
+class RangeWriter:
+    """
+    Arquivo "somente escrita" restrito à faixa [start, end] de dest_path,
+    para bibliotecas que baixam para um objeto file-like
+    """
+
+    def __init__(self, dest_path, start, end, counter):
+        self.start = start
+        self.end = end
+        self.counter = counter
+        self.written = 0
+        self._fh = open(dest_path, 'r+b')
+        self._fh.seek(start)
+
+    def write(self, data):
+        data = data[:self.end + 1 - self.start - self.written]
+        self._fh.write(data)
+        self.written += len(data)
+        self.counter.add(len(data))
+        return len(data)
+
+    def rewind(self):
+        # Recomeçar a faixa (nova tentativa), descontando o progresso já contado
+        self.counter.add(-self.written)
+        self.written = 0
+        self._fh.seek(self.start)
+
+    @property
+    def complete(self):
+        return self.written == self.end - self.start + 1
+
+    def close(self):
+        self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def retry_with_backoff(fn, max_retries=DEFAULT_MAX_RETRIES, retry_on=(Exception,), description="",
+                       operation='download'):
+    """
+    Executa fn() repetindo com backoff exponencial e jitter em caso de falha.
+    As novas tentativas são contadas na métrica de retries com o rótulo operation.
+    """
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except retry_on as e:
+            attempt += 1
+            if attempt > max_retries:
+                raise
+            logger.warning(
+                f"Falha em {description or 'operação'} (tentativa {attempt}/{max_retries}): {str(e)}")
+            RETRIES.inc(operation=operation)
+            time.sleep(min(2 ** attempt, 30) * random.uniform(0.5, 1.0))
+
+
+def download_ranged(url, dest_path, total_size, headers=None,
+                    num_workers=DEFAULT_WORKERS, part_size=DEFAULT_PART_SIZE,
+                    progress_callback=None, session=None,
+                    max_retries=DEFAULT_MAX_RETRIES, timeout=DEFAULT_TIMEOUT):
+    """
+    Baixa url para dest_path usando várias faixas de bytes HTTP em paralelo.
+
+    headers pode ser um dicionário ou uma função que retorna um dicionário
+    (chamada a cada requisição). progress_callback(baixados, total) é sempre
+    chamado na thread que chamou esta função, no máximo a cada PROGRESS_INTERVAL.
+    """
+    own_session = session is None
+    if own_session:
+        session = _new_session(num_workers)
+
+    def fetch_part(start, end, counter):
+        _fetch_range(session, url, headers, dest_path, start, end, counter,
+                     max_retries, timeout)
+
+    try:
+        return download_parts(dest_path, total_size, fetch_part, num_workers,
+                              part_size, progress_callback)
+    finally:
+        if own_session:
+            session.close()
+
+
+def _cleanup_state(dest_path):
+    try:
+        os.remove(_state_path(dest_path))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,119 @@
+"""
+Resultados de jobs prontos para exibir, compartilhados pelo processo.
+
+O app Streamlit reexecuta o script a cada interação (e a cada poucos segundos
+enquanto há jobs em andamento). Sem cache, cada rerun releria do disco os
+arquivos gerados de todos os jobs concluídos e converteria de novo as
+transcrições para texto. O ResultStore guarda esse conteúdo em memória,
+indexado pelo job, com limite de tamanho total e de número de entradas: os
+resultados usados há mais tempo saem primeiro e, se pedidos de novo, são
+recarregados dos arquivos do job.
+"""
+
+import os
+import logging
+import threading
+from collections import OrderedDict
+from metrics import CACHE_REQUESTS
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+RESULT_STORE_MB = float(os.getenv('TRANSCRIPTION_RESULT_STORE_MB', '256'))
+RESULT_STORE_ENTRIES = int(os.getenv('TRANSCRIPTION_RESULT_STORE_ENTRIES', '200'))
+
+
+def value_size(value):
+    """
+    Tamanho aproximado em bytes de um resultado (textos e conteúdos de
+    arquivos; o restante é desprezível)
+    """
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(value_size(key) + value_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(value_size(item) for item in value)
+    return 0
+
+
+class ResultStore:
+    """
+    Cache LRU com limite de bytes e de entradas. Pode ser usado por várias
+    threads (sessões do Streamlit) ao mesmo tempo.
+    """
+
+    def __init__(self, max_bytes=RESULT_STORE_MB * 1024 * 1024, max_entries=RESULT_STORE_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.bytes = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # chave -> (valor, tamanho)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                CACHE_REQUESTS.inc(cache='resultados', result='miss')
+                return None
+            self._entries.move_to_end(key)
+        CACHE_REQUESTS.inc(cache='resultados', result='hit')
+        return entry[0]
+
+    def put(self, key, value):
+        """
+        Guarda um valor. Valores maiores que o limite total não são guardados.
+        """
+        size = value_size(value)
+        if size > self.max_bytes:
+            logger.info(f"Resultado {key} ({size / (1024 * 1024):.1f} MB) maior que o "
+                        f"limite do cache, não armazenado")
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_load(self, key, load):
+        """
+        Valor da chave; na falta dele, chama load() e guarda o retorno (exceto
+        None, que indica que o resultado não está disponível)
+        """
+        value = self.get(key)
+        if value is None:
+            value = load()
+            if value is not None:
+                self.put(key, value)
+        return value
+
+    def discard(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.bytes -= entry[1]
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self.bytes,
+                    'evictions': self.evictions}
+
+
+_default_store = {'store': None}
+_default_store_lock = threading.Lock()
+
+
+def get_result_store():
+    """
+    ResultStore compartilhado pelo processo
+    """
+    with _default_store_lock:
+        if _default_store['store'] is None:
+            _default_store['store'] = ResultStore()
+        return _default_store['store']
@@ -0,0 +1,85 @@
+"""
+POST /jobs da API HTTP (api_server.py): uploads multipart e URLs de hosts internos
+"""
+
+import os
+import asyncio
+
+import pytest
+from aiohttp import FormData
+from aiohttp.test_utils import TestClient, TestServer
+
+from api_server import create_app, MockJobWorkerPool
+from job_queue import JobQueue
+
+
+@pytest.fixture
+def api(tmp_path):
+    upload_dir = str(tmp_path / 'uploads')
+
+    def post(allow_private_urls=False, **kwargs):
+        async def run():
+            queue = JobQueue(str(tmp_path / 'jobs.db'))
+            # Sem workers: os jobs só são enfileirados
+            pool = MockJobWorkerPool(queue, num_workers=0, output_dir=str(tmp_path / 'out'))
+            app = create_app(queue, pool, upload_dir, allow_private_urls=allow_private_urls)
+            async with TestClient(TestServer(app)) as client:
+                response = await client.post('/jobs', **kwargs)
+                return response.status, await response.json()
+        return asyncio.run(run())
+
+    post.upload_dir = upload_dir
+    return post
+
+
+def test_single_upload_is_accepted(api):
+    form = FormData()
+    form.add_field('file', b'video', filename='aula.mp4')
+    status, job = api(data=form)
+    assert status == 202
+    assert job['source'] == 'upload' and job['name'] == 'aula'
+    assert len(os.listdir(api.upload_dir)) == 1
+
+
+def test_second_file_part_is_rejected_and_cleaned_up(api):
+    form = FormData()
+    form.add_field('file', b'primeiro', filename='a.mp4')
+    form.add_field('file', b'segundo', filename='b.mp4')
+    status, body = api(data=form)
+    assert status == 400
+    assert 'único arquivo' in body['error']
+    assert os.listdir(api.upload_dir) == []
+
+
+@pytest.mark.parametrize('url', [
+    'http://127.0.0.1:8000/video.mp4',
+    'http://localhost/video.mp4',
+    'http://169.254.169.254/latest/meta-data/',
+    'https://10.0.0.5/video.mp4',
+    'http://192.168.1.10/video.mp4',
+    'http://[::1]/video.mp4',
+    'http://[::ffff:127.0.0.1]/video.mp4',
+])
+def test_internal_urls_are_rejected(api, url):
+    status, body = api(json={'url': url})
+    assert status == 400
+    assert 'endereço interno' in body['error']
+
+
+def test_unresolvable_host_is_rejected(api):
+    status, body = api(json={'url': 'https://host-inexistente.invalid/video.mp4'})
+    assert status == 400
+    assert 'resolver' in body['error']
+
+
+def test_public_and_non_http_sources_are_accepted(api):
+    for source in ({'url': 'https://93.184.215.14/video.mp4'},
+                   {'url': 'gs://videos/aula.mp4'}, {'drive_file_id': 'F1'}):
+        status, job = api(json=source)
+        assert status == 202, source
+
+
+def test_internal_urls_can_be_allowed(api):
+    status, job = api(allow_private_urls=True, json={'url': 'http://127.0.0.1:8000/video.mp4'})
+    assert status == 202
+    assert job['source'] == 'http://127.0.0.1:8000/video.mp4'
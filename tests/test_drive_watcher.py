@@ -0,0 +1,309 @@
+"""
+Observador de pastas do Drive (drive_watcher.py) contra um serviço falso que
+implementa changes().getStartPageToken/list e files().get/list
+"""
+
+import re
+import json
+from concurrent.futures import Future
+
+import pytest
+
+import drive_watcher
+from drive_watcher import DriveWatcher, MAX_FOLDER_DEPTH, MAX_VIDEO_ATTEMPTS
+
+WATCHED = 'pasta_observada'
+
+
+class _Request:
+    def __init__(self, fn):
+        self._fn = fn
+
+    def execute(self):
+        return self._fn()
+
+
+class FakeDrive:
+    """
+    Drive em memória. Cada chamada a add_changes acrescenta uma página ao
+    feed de alterações; o page token 'pN' aponta para a página N e
+    getStartPageToken aponta para depois da última página.
+    """
+
+    def __init__(self):
+        self.parents = {}  # pasta -> pastas pai
+        self.folder_files = {}  # pasta -> nomes dos arquivos
+        self.pages = []
+        self.calls = []
+        self.fail_on_page = None
+
+    # Montagem do cenário
+
+    def add_folder(self, folder_id, parent_id):
+        self.parents[folder_id] = [parent_id]
+
+    def add_changes(self, *files):
+        self.pages.append([{'fileId': f['id'], 'removed': False, 'file': f} for f in files])
+
+    # API do Drive usada pelo observador
+
+    def changes(self):
+        return self
+
+    def files(self):
+        return self
+
+    def getStartPageToken(self, **kwargs):
+        self.calls.append(('getStartPageToken',))
+        return _Request(lambda: {'startPageToken': f"p{len(self.pages)}"})
+
+    def list(self, pageToken=None, q=None, **kwargs):
+        if q is not None:
+            return self._list_files(q)
+        self.calls.append(('changes.list', pageToken))
+
+        def execute():
+            index = int(pageToken[1:])
+            if index == self.fail_on_page:
+                raise IOError("falha simulada no feed de alterações")
+            response = {'changes': self.pages[index] if index < len(self.pages) else []}
+            if index + 1 < len(self.pages):
+                response['nextPageToken'] = f"p{index + 1}"
+            else:
+                response['newStartPageToken'] = f"p{max(len(self.pages), index + 1)}"
+            return response
+        return _Request(execute)
+
+    def _list_files(self, q):
+        folder_id, fragment = re.match(r"'([^']+)' in parents and name contains '([^']+)'", q).groups()
+        self.calls.append(('files.list', folder_id))
+        names = [name for name in self.folder_files.get(folder_id, []) if fragment in name]
+        return _Request(lambda: {'files': [{'name': name} for name in names]})
+
+    def get(self, fileId, fields=None, **kwargs):
+        self.calls.append(('files.get', fileId))
+        return _Request(lambda: {'parents': self.parents.get(fileId, [])})
+
+
+def video(file_id, parent=WATCHED, name=None, **extra):
+    return dict({'id': file_id, 'name': name or f"{file_id}.mp4", 'mimeType': 'video/mp4',
+                 'parents': [parent]}, **extra)
+
+
+@pytest.fixture
+def drive():
+    return FakeDrive()
+
+
+@pytest.fixture
+def state_path(tmp_path):
+    return str(tmp_path / 'estado.json')
+
+
+def make_watcher(drive, state_path, submitted, **kwargs):
+    return DriveWatcher(drive, [WATCHED], lambda file: submitted.append(file['id']),
+                        state_path=state_path, **kwargs)
+
+
+def started_watcher(drive, state_path, submitted, **kwargs):
+    watcher = make_watcher(drive, state_path, submitted, **kwargs)
+    assert watcher.poll_once() == []
+    return watcher
+
+
+def test_first_run_only_stores_the_start_token(drive, state_path):
+    drive.add_changes(video('antigo'))
+    submitted = []
+
+    watcher = make_watcher(drive, state_path, submitted)
+    assert watcher.poll_once() == []
+
+    assert submitted == []
+    assert [call[0] for call in drive.calls] == ['getStartPageToken']
+    with open(state_path, encoding='utf-8') as f:
+        assert json.load(f)['page_token'] == 'p1'
+
+
+def test_new_videos_across_pages_and_restart(drive, state_path):
+    submitted = []
+    started_watcher(drive, state_path, submitted)
+    drive.add_changes(video('a'), video('b'))
+    drive.add_changes(video('c'))
+
+    watcher = make_watcher(drive, state_path, submitted)
+    assert [f['id'] for f in watcher.poll_once()] == ['a', 'b', 'c']
+    assert watcher.state['page_token'] == 'p2'
+
+    # Depois de reiniciar, só as alterações novas são lidas
+    drive.add_changes(video('d'), video('a'))
+    restarted = make_watcher(drive, state_path, submitted)
+    restarted.poll_once()
+    assert submitted == ['a', 'b', 'c', 'd']
+    assert ('getStartPageToken',) not in drive.calls[1:]
+
+
+def test_page_token_is_saved_after_each_page(drive, state_path):
+    submitted = []
+    started_watcher(drive, state_path, submitted)
+    drive.add_changes(video('a'))
+    drive.add_changes(video('b'))
+    drive.fail_on_page = 1
+
+    with pytest.raises(IOError):
+        make_watcher(drive, state_path, submitted).poll_once()
+    with open(state_path, encoding='utf-8') as f:
+        assert json.load(f)['page_token'] == 'p1'
+
+    # Retoma da página que falhou, sem reenviar a anterior
+    drive.fail_on_page = None
+    make_watcher(drive, state_path, submitted).poll_once()
+    assert submitted == ['a', 'b']
+
+
+def test_only_videos_under_watched_folders(drive, state_path):
+    submitted = []
+    watcher = started_watcher(drive, state_path, submitted)
+    drive.add_folder('sub', WATCHED)
+    drive.add_folder('subsub', 'sub')
+    drive.add_folder('outra', 'raiz')
+    drive.add_changes(
+        video('direto'),
+        video('neto', parent='subsub'),
+        video('fora', parent='outra'),
+        video('lixeira', trashed=True),
+        dict(video('audio'), mimeType='audio/mpeg'),
+    )
+
+    watcher.poll_once()
+    assert submitted == ['direto', 'neto']
+
+
+def test_folder_ancestry_stops_at_max_depth(drive, state_path):
+    # pasta_0 -> pasta_1 -> ... -> pasta_N -> pasta observada
+    for depth in range(MAX_FOLDER_DEPTH + 1):
+        parent = WATCHED if depth == MAX_FOLDER_DEPTH else f"pasta_{depth + 1}"
+        drive.add_folder(f"pasta_{depth}", parent)
+    submitted = []
+    watcher = started_watcher(drive, state_path, submitted)
+    # A pasta do vídeo é o nível 1: em pasta_2 a observada fica no nível
+    # MAX_FOLDER_DEPTH, em pasta_1 um nível além
+    drive.add_changes(video('limite', parent='pasta_2'), video('fundo', parent='pasta_1'))
+
+    watcher.poll_once()
+    assert submitted == ['limite']
+
+
+def test_skip_transcribed(drive, state_path):
+    drive.folder_files[WATCHED] = ['aula 1_transcricao_completa.srt']
+    submitted = []
+    watcher = started_watcher(drive, state_path, submitted)
+    drive.add_changes(video('v1', name='aula 1.mp4'), video('v2', name='aula 2.mp4'))
+
+    watcher.poll_once()
+    assert submitted == ['v2']
+    # O vídeo já transcrito também não é verificado de novo
+    assert 'v1' in watcher.state['seen_ids']
+
+    drive.add_changes(video('v3', name='aula 1.mp4'))
+    keep_all = make_watcher(drive, state_path, submitted, skip_transcribed=False)
+    keep_all.poll_once()
+    assert submitted == ['v2', 'v3']
+
+
+def finished_future(error=None):
+    future = Future()
+    if error is None:
+        future.set_result(None)
+    else:
+        future.set_exception(error)
+    return future
+
+
+def test_failed_processing_is_retried_until_max_attempts(drive, state_path):
+    outcomes = {'bom': [RuntimeError("falha"), None], 'ruim': []}
+    attempts = []
+
+    def on_new_video(file):
+        attempts.append(file['id'])
+        pending = outcomes[file['id']]
+        return finished_future(pending.pop(0) if pending else RuntimeError("falha"))
+
+    watcher = DriveWatcher(drive, [WATCHED], on_new_video, state_path=state_path)
+    watcher.poll_once()
+    drive.add_changes(video('bom'), video('ruim'))
+
+    for _ in range(MAX_VIDEO_ATTEMPTS + 2):
+        watcher.poll_once()
+
+    assert attempts.count('bom') == 2
+    assert attempts.count('ruim') == MAX_VIDEO_ATTEMPTS
+    assert watcher.state['retry'] == []
+    assert watcher.state['failures'] == {}
+    with open(state_path, encoding='utf-8') as f:
+        saved = json.load(f)
+    assert saved['retry'] == [] and sorted(saved['seen_ids']) == ['bom', 'ruim']
+
+
+def test_retry_survives_a_restart(drive, state_path):
+    def failing(file):
+        return finished_future(RuntimeError("falha"))
+
+    watcher = DriveWatcher(drive, [WATCHED], failing, state_path=state_path)
+    watcher.poll_once()
+    drive.add_changes(video('v1'))
+    watcher.poll_once()
+
+    submitted = []
+    restarted = make_watcher(drive, state_path, submitted)
+    assert restarted.state['failures'] == {'v1': 1}
+    restarted.poll_once()
+    assert submitted == ['v1']
+
+
+def test_submit_error_goes_to_retry(drive, state_path):
+    calls = []
+
+    def on_new_video(file):
+        calls.append(file['id'])
+        if len(calls) == 1:
+            raise RuntimeError("pool indisponível")
+
+    watcher = DriveWatcher(drive, [WATCHED], on_new_video, state_path=state_path)
+    watcher.poll_once()
+    drive.add_changes(video('v1'))
+
+    assert watcher.poll_once() == []
+    assert [f['id'] for f in watcher.state['retry']] == ['v1']
+    assert [f['id'] for f in watcher.poll_once()] == ['v1']
+    assert calls == ['v1', 'v1']
+
+
+def test_pipeline_submitter_future_reports_failures(monkeypatch):
+    import pipeline
+    import openai_clients
+
+    def transcribe(drive_service, file, client, model, history=None):
+        raise RuntimeError("vídeo privado")
+
+    monkeypatch.setattr(pipeline, 'transcribe_drive_video_job', transcribe)
+    monkeypatch.setattr(openai_clients, 'get_openai_client', lambda api_key: object())
+    monkeypatch.setattr(drive_watcher, 'ThreadPoolExecutor', _InlineExecutor)
+    monkeypatch.setattr('history_store.get_history_store', lambda: None)
+
+    on_new_video = drive_watcher.make_pipeline_submitter(FakeDrive(), 'modelo', 1)
+    future = on_new_video(video('v1'))
+    with pytest.raises(RuntimeError, match="vídeo privado"):
+        future.result()
+
+
+class _InlineExecutor:
+    def __init__(self, max_workers=None):
+        pass
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
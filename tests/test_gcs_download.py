@@ -0,0 +1,228 @@
+"""
+Download do Cloud Storage (utils.download_gcs_video) contra um servidor
+local que imita a API JSON e o endpoint de mídia do GCS, usado pelo cliente
+oficial por meio de STORAGE_EMULATOR_HOST
+"""
+
+import os
+import re
+import json
+import time
+import threading
+import urllib.parse
+from types import SimpleNamespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import utils
+import ranged_download
+from utils import parse_gcs_url, download_gcs_video, get_gcs_generation
+
+PART_SIZE = 32 * 1024
+
+
+class FakeGCS:
+    """
+    Objetos em memória, sem versionamento: substituir um objeto cria uma
+    nova geração e a anterior deixa de existir. on_range(inicio) é chamado
+    antes de servir cada faixa e fail_ranges faz as próximas faixas
+    responderem 503.
+    """
+
+    def __init__(self):
+        self.objects = {}  # (bucket, nome) -> (geração, bytes)
+        self.ranges = []
+        self.fail_ranges = 0
+        self.on_range = None
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    @property
+    def host(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def put(self, bucket, name, data):
+        with self._lock:
+            generation = self.objects.get((bucket, name), (1000, b''))[0] + 1
+            self.objects[(bucket, name)] = (generation, data)
+        return generation
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _json(self, status, body):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _error(self, status, message):
+                self._json(status, {'error': {'code': status, 'message': message}})
+
+            def do_GET(self):
+                parsed = urllib.parse.urlparse(self.path)
+                query = urllib.parse.parse_qs(parsed.query)
+                match = re.match(r'(/download)?/storage/v1/b/([^/]+)/o/(.+)$', parsed.path)
+                if not match:
+                    return self._error(404, "rota desconhecida")
+                media, bucket, name = match.group(1), match.group(2), urllib.parse.unquote(match.group(3))
+                with fake._lock:
+                    stored = fake.objects.get((bucket, name))
+                if stored is None:
+                    return self._error(404, "objeto não encontrado")
+                generation, data = stored
+                if 'generation' in query and int(query['generation'][0]) != generation:
+                    return self._error(404, "geração não encontrada")
+                if not media:
+                    return self._json(200, {
+                        'kind': 'storage#object', 'bucket': bucket, 'name': name,
+                        'id': f"{bucket}/{name}/{generation}", 'generation': str(generation),
+                        'size': str(len(data)), 'contentType': 'video/mp4'})
+                self._media(query, data, generation)
+
+            def _media(self, query, data, generation):
+                start, end = map(int, re.match(
+                    r'bytes=(\d+)-(\d+)', self.headers['Range']).groups())
+                if fake.on_range:
+                    fake.on_range(start)
+                with fake._lock:
+                    fake.ranges.append(start)
+                    fail = fake.fail_ranges > 0
+                    if fail:
+                        fake.fail_ranges -= 1
+                    fake.active += 1
+                    fake.max_active = max(fake.max_active, fake.active)
+                try:
+                    if fail:
+                        return self._error(503, "indisponível")
+                    # A geração atual é conferida no momento de servir a faixa
+                    if ('ifGenerationMatch' in query
+                            and int(query['ifGenerationMatch'][0]) != fake.objects[self._key()][0]):
+                        return self._error(412, "a geração mudou")
+                    time.sleep(0.05)
+                    body = data[start:end + 1]
+                    self.send_response(206)
+                    self.send_header('Content-Length', str(len(body)))
+                    self.send_header('Content-Range', f"bytes {start}-{end}/{len(data)}")
+                    self.send_header('x-goog-generation', str(generation))
+                    self.end_headers()
+                    self.wfile.write(body)
+                finally:
+                    with fake._lock:
+                        fake.active -= 1
+
+            def _key(self):
+                match = re.match(r'/download/storage/v1/b/([^/]+)/o/([^?]+)', self.path)
+                return match.group(1), urllib.parse.unquote(match.group(2))
+
+        return Handler
+
+
+@pytest.fixture
+def gcs(monkeypatch):
+    fake = FakeGCS()
+    monkeypatch.setenv('STORAGE_EMULATOR_HOST', fake.host)
+    monkeypatch.setitem(utils._gcs_client, 'client', None)
+    monkeypatch.setattr(utils, 'GCS_DOWNLOAD_PART_SIZE', PART_SIZE)
+    # Backoff sem esperar de verdade
+    monkeypatch.setattr(ranged_download, 'time', SimpleNamespace(sleep=lambda seconds: None))
+    yield fake
+    fake.close()
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('url, expected', [
+    ('gs://videos/aulas/aula 1.mp4', ('videos', 'aulas/aula 1.mp4')),
+    ('https://storage.googleapis.com/videos/aulas/aula%201.mp4', ('videos', 'aulas/aula 1.mp4')),
+    ('https://storage.cloud.google.com/videos/aula.mp4', ('videos', 'aula.mp4')),
+    ('https://videos.storage.googleapis.com/aulas/aula.mp4', ('videos', 'aulas/aula.mp4')),
+    ('  gs://videos/aula.mp4  ', ('videos', 'aula.mp4')),
+    ('gs://videos', None),
+    ('https://storage.googleapis.com/videos', None),
+    ('https://example.com/videos/aula.mp4', None),
+    ('/tmp/aula.mp4', None),
+])
+def test_parse_gcs_url(url, expected):
+    assert parse_gcs_url(url) == expected
+
+
+def test_parallel_ranged_download_is_byte_identical(gcs, tmp_path):
+    data = os.urandom(6 * PART_SIZE + 100)
+    gcs.put('videos', 'aulas/aula 1.mp4', data)
+    progress = []
+
+    path = download_gcs_video(
+        'https://storage.googleapis.com/videos/aulas/aula%201.mp4', num_workers=4,
+        dest_dir=str(tmp_path), progress_callback=lambda done, total: progress.append(done))
+
+    assert read(path) == data
+    assert sorted(gcs.ranges) == [i * PART_SIZE for i in range(7)]
+    assert gcs.max_active > 1
+    assert progress[-1] == len(data)
+
+
+def test_failed_range_is_retried(gcs, tmp_path):
+    data = os.urandom(3 * PART_SIZE)
+    gcs.put('videos', 'aula.mp4', data)
+    gcs.fail_ranges = 2
+
+    path = download_gcs_video('gs://videos/aula.mp4', num_workers=1, dest_dir=str(tmp_path))
+
+    assert read(path) == data
+    assert len(gcs.ranges) == 3 + 2
+
+
+def test_overwrite_during_download_fails_instead_of_mixing_generations(gcs, tmp_path):
+    gcs.put('videos', 'aula.mp4', b'a' * (4 * PART_SIZE))
+
+    def overwrite_after_first_range(start):
+        if start > 0 and gcs.objects[('videos', 'aula.mp4')][1][:1] == b'a':
+            gcs.put('videos', 'aula.mp4', b'b' * (4 * PART_SIZE))
+    gcs.on_range = overwrite_after_first_range
+
+    with pytest.raises(Exception) as error:
+        download_gcs_video('gs://videos/aula.mp4', num_workers=1, dest_dir=str(tmp_path))
+    assert '404' in str(error.value) or '412' in str(error.value)
+
+
+def test_download_is_pinned_to_the_generation_read_before(gcs, tmp_path):
+    data = os.urandom(2 * PART_SIZE)
+    generation = gcs.put('videos', 'aula.mp4', data)
+    assert get_gcs_generation('gs://videos/aula.mp4') == generation
+
+    path = download_gcs_video('gs://videos/aula.mp4', dest_dir=str(tmp_path),
+                              generation=generation)
+    assert read(path) == data
+
+    gcs.put('videos', 'aula.mp4', os.urandom(2 * PART_SIZE))
+    with pytest.raises(FileNotFoundError):
+        download_gcs_video('gs://videos/aula.mp4', dest_dir=str(tmp_path), generation=generation)
+
+
+def test_missing_object(gcs, tmp_path):
+    with pytest.raises(FileNotFoundError):
+        get_gcs_generation('gs://videos/nada.mp4')
+    with pytest.raises(FileNotFoundError):
+        download_gcs_video('gs://videos/nada.mp4', dest_dir=str(tmp_path))
+    with pytest.raises(ValueError):
+        download_gcs_video('https://example.com/aula.mp4', dest_dir=str(tmp_path))
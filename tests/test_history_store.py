@@ -0,0 +1,82 @@
+"""
+Histórico de transcrições (history_store.py): chaves por versão da fonte e
+usuários de cada entrada
+"""
+
+import sqlite3
+
+import pytest
+
+from history_store import HistoryStore, drive_identity, gcs_identity, source_identity
+
+
+def result(srt="1\n00:00:00,000 --> 00:00:01,000\nolá\n", name='aula'):
+    return {'name': name, 'title': name, 'duration': 1.0, 'srt': srt,
+            'summary_srt': '', 'summary_text': 'resumo'}
+
+
+@pytest.fixture
+def history(tmp_path):
+    return HistoryStore(str(tmp_path / 'historico.db'))
+
+
+def ids(entries):
+    return [entry['id'] for entry in entries]
+
+
+def test_versioned_identities(tmp_path):
+    assert drive_identity({'id': 'F1', 'md5Checksum': 'abc', 'headRevisionId': 'r1'}) == 'drive:F1@abc'
+    assert drive_identity({'id': 'F1', 'headRevisionId': 'r1'}) == 'drive:F1@r1'
+    assert drive_identity({'id': 'F1'}) is None
+    assert gcs_identity('videos', 'aula.mp4', 7) == 'gcs:videos/aula.mp4#7'
+
+    assert source_identity('https://youtu.be/dQw4w9WgXcQ') == 'youtube:dQw4w9WgXcQ'
+    # Fontes que podem mudar no mesmo endereço dependem de metadados remotos
+    for source in ('drive:F1', 'gs://videos/aula.mp4', 'https://example.com/aula.mp4'):
+        assert source_identity(source) is None
+    video = tmp_path / 'aula.mp4'
+    video.write_bytes(b'video')
+    assert source_identity(str(video)).startswith('sha256:')
+
+
+def test_resaving_keeps_the_entry_in_its_owners_history(history):
+    entry_id = history.save('drive:F1@abc', 'modelo', 'drive:F1', result(), owner='ana')
+    # Lote ou observador do Drive: sem usuário
+    assert history.save('drive:F1@abc', 'modelo', 'drive:F1', result(name='novo')) == entry_id
+    history.save('drive:F1@abc', 'modelo', 'drive:F1', result(), owner='bruno')
+
+    assert ids(history.list_entries(owner='ana')) == [entry_id]
+    assert ids(history.list_entries(owner='bruno')) == [entry_id]
+    assert history.list_entries(owner='carla') == []
+    # O autor registrado é quem transcreveu primeiro
+    assert history.list_entries()[0]['owner'] == 'ana'
+
+
+def test_reuse_adds_the_user_and_get_follows_ownership(history):
+    entry_id = history.save('youtube:abc', 'modelo', 'https://youtu.be/abc', result(), owner='ana')
+
+    assert history.get(entry_id, owner='bruno') is None
+    found = history.find('youtube:abc', 'modelo', owner='bruno')
+    assert found['history_id'] == entry_id
+    assert history.get(entry_id, owner='bruno')['srt'] == result()['srt']
+    assert ids(history.list_entries(owner='bruno')) == [entry_id]
+    # Sem usuário (administrador, CLI), qualquer entrada
+    assert history.get(entry_id)['history_id'] == entry_id
+
+
+def test_delete_removes_ownership(history):
+    entry_id = history.save('youtube:abc', 'modelo', 'https://youtu.be/abc', result(), owner='ana')
+    history.delete(entry_id)
+    assert history.list_entries(owner='ana') == []
+    assert history.get(entry_id) is None
+
+
+def test_existing_database_keeps_its_owners(tmp_path):
+    path = str(tmp_path / 'antigo.db')
+    history = HistoryStore(path)
+    entry_id = history.save('youtube:abc', 'modelo', 'https://youtu.be/abc', result(), owner='ana')
+    # Banco criado antes da tabela de usuários
+    with sqlite3.connect(path) as conn:
+        conn.execute("DROP TABLE transcription_owners")
+
+    assert ids(HistoryStore(path).list_entries(owner='ana')) == [entry_id]
@@ -0,0 +1,227 @@
+"""
+Download por faixas (ranged_download.py) contra um servidor HTTP local que
+faz o papel do endpoint de mídia do Drive
+"""
+
+import os
+import re
+import threading
+from types import SimpleNamespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import ranged_download
+from ranged_download import (download_ranged, download_parts, RangeWriter,
+                             RangedDownloadError, _ProgressCounter, _state_path)
+
+PART_SIZE = 64 * 1024
+SOURCE = os.urandom(5 * PART_SIZE + 1234)
+
+
+class RangeServer:
+    """
+    Serve SOURCE em /media com suporte a Range. mode:
+    - 'range': responde 206 com a faixa pedida
+    - 'ignore_range': ignora o Range e responde 200 com o arquivo inteiro
+    - 'drop': nas primeiras drops respostas, envia metade da faixa e fecha a conexão
+    - 'fail_from': responde 404 às faixas que começam em fail_from ou depois
+    """
+
+    def __init__(self, data=SOURCE, mode='range', drops=1, fail_from=None):
+        self.data = data
+        self.mode = mode
+        self.drops = drops
+        self.fail_from = fail_from
+        self.requests = []
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/media"
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+                with server._lock:
+                    server.requests.append(match.group(0) if match else None)
+                    drop = server.mode == 'drop' and server.drops > 0
+                    if drop:
+                        server.drops -= 1
+
+                if server.mode == 'ignore_range' or not match:
+                    self.send_response(200)
+                    self.send_header('Content-Length', str(len(server.data)))
+                    self.end_headers()
+                    self.wfile.write(server.data)
+                    return
+
+                start = int(match.group(1))
+                end = int(match.group(2)) if match.group(2) else len(server.data) - 1
+                if server.fail_from is not None and start >= server.fail_from:
+                    self.send_error(404)
+                    return
+                body = server.data[start:end + 1]
+                self.send_response(206)
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('Content-Range', f"bytes {start}-{end}/{len(server.data)}")
+                self.end_headers()
+                if drop:
+                    self.wfile.write(body[:len(body) // 2])
+                    self.wfile.flush()
+                    self.close_connection = True
+                    return
+                self.wfile.write(body)
+
+        return Handler
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    # Backoff sem esperar de verdade; as esperas pedidas ficam registradas
+    calls = []
+    monkeypatch.setattr(ranged_download, 'time', SimpleNamespace(sleep=calls.append))
+    return calls
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(**kwargs):
+        servers.append(RangeServer(**kwargs))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_parallel_download_is_byte_identical(tmp_path, serve, sleeps):
+    server = serve()
+    dest = str(tmp_path / 'video.mp4')
+    progress = []
+
+    download_ranged(server.url, dest, len(SOURCE), num_workers=4, part_size=PART_SIZE,
+                    progress_callback=lambda done, total: progress.append((done, total)))
+
+    assert read(dest) == SOURCE
+    assert len(server.requests) == 6
+    assert progress[-1] == (len(SOURCE), len(SOURCE))
+    assert not os.path.exists(_state_path(dest))
+    assert sleeps == []
+
+
+def test_server_ignoring_range_is_an_error_without_retries(tmp_path, serve, sleeps):
+    # Quem chama (ex.: download_video_from_drive) recorre ao download sequencial
+    server = serve(data=SOURCE[:PART_SIZE], mode='ignore_range')
+
+    with pytest.raises(RangedDownloadError, match="ignorou"):
+        download_ranged(server.url, str(tmp_path / 'video.mp4'), PART_SIZE,
+                        num_workers=1, part_size=PART_SIZE)
+    assert len(server.requests) == 1
+    assert sleeps == []
+
+
+def test_dropped_connection_is_retried_from_the_last_byte(tmp_path, serve, sleeps, monkeypatch):
+    # Blocos menores que a faixa: o que chegou antes da queda fica gravado
+    monkeypatch.setattr(ranged_download, 'STREAM_BLOCK_SIZE', 4096)
+    server = serve(mode='drop', drops=2)
+    dest = str(tmp_path / 'video.mp4')
+
+    download_ranged(server.url, dest, len(SOURCE), num_workers=1, part_size=PART_SIZE)
+
+    assert read(dest) == SOURCE
+    assert len(sleeps) == 2
+    # A faixa interrompida é pedida de novo a partir de onde parou
+    assert f"bytes={PART_SIZE // 2}-{PART_SIZE - 1}" in server.requests
+
+
+def test_failing_range_gives_up_after_max_retries(tmp_path, serve, sleeps):
+    server = serve(data=SOURCE[:PART_SIZE], mode='drop', drops=100)
+
+    with pytest.raises(RangedDownloadError, match="após 3 tentativas"):
+        download_ranged(server.url, str(tmp_path / 'video.mp4'), PART_SIZE,
+                        num_workers=1, part_size=PART_SIZE, max_retries=3)
+    assert len(server.requests) == 4
+    # Backoff exponencial com jitter: entre 50% e 100% de 2, 4 e 8 segundos
+    assert len(sleeps) == 3
+    for attempt, seconds in enumerate(sleeps, start=1):
+        assert 2 ** attempt / 2 <= seconds <= 2 ** attempt
+
+
+def test_interrupted_download_resumes_from_state_file(tmp_path, serve, sleeps):
+    dest = str(tmp_path / 'video.mp4')
+    failing = serve(fail_from=2 * PART_SIZE)
+    with pytest.raises(Exception):
+        download_ranged(failing.url, dest, len(SOURCE), num_workers=1, part_size=PART_SIZE)
+    assert os.path.exists(_state_path(dest))
+
+    server = serve()
+    download_ranged(server.url, dest, len(SOURCE), num_workers=2, part_size=PART_SIZE)
+
+    assert read(dest) == SOURCE
+    # Só as faixas que faltavam foram baixadas de novo
+    requested_starts = sorted(int(r.split('=')[1].split('-')[0]) for r in server.requests)
+    assert requested_starts == [2 * PART_SIZE, 3 * PART_SIZE, 4 * PART_SIZE, 5 * PART_SIZE]
+    assert not os.path.exists(_state_path(dest))
+
+
+def test_state_from_a_different_plan_is_not_resumed(tmp_path, serve, sleeps):
+    dest = str(tmp_path / 'video.mp4')
+    with pytest.raises(Exception):
+        download_ranged(serve(fail_from=PART_SIZE).url, dest, len(SOURCE),
+                        num_workers=1, part_size=PART_SIZE)
+
+    server = serve()
+    download_ranged(server.url, dest, len(SOURCE), num_workers=2, part_size=2 * PART_SIZE)
+
+    assert read(dest) == SOURCE
+    assert len(server.requests) == 3
+
+
+def test_range_writer_stays_inside_its_range(tmp_path):
+    dest = str(tmp_path / 'out.bin')
+    with open(dest, 'wb') as f:
+        f.write(b'.' * 10)
+    counter = _ProgressCounter()
+
+    with RangeWriter(dest, 2, 5, counter) as writer:
+        writer.write(b'xx')
+        writer.rewind()
+        assert counter.value == 0
+        writer.write(b'abcdefgh')
+        assert writer.complete
+
+    assert read(dest) == b'..abcd....'
+    assert counter.value == 4
+
+
+def test_download_parts_with_range_writer(tmp_path):
+    dest = str(tmp_path / 'out.bin')
+
+    def fetch_part(start, end, counter):
+        with RangeWriter(dest, start, end, counter) as writer:
+            writer.write(SOURCE[start:end + 1])
+
+    download_parts(dest, len(SOURCE), fetch_part, num_workers=3, part_size=PART_SIZE)
+    assert read(dest) == SOURCE
@@ -0,0 +1,51 @@
+"""
+Erros das fontes YouTube e Vimeo chegam a quem chamou transcribe_source
+com a causa original
+"""
+
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+import pipeline
+
+
+class _FailingYoutubeDL:
+    def __init__(self, opts):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def extract_info(self, url, download=False):
+        raise OSError("HTTP Error 403: Forbidden")
+
+
+def test_youtube_error_keeps_its_cause(monkeypatch, tmp_path):
+    monkeypatch.setitem(sys.modules, 'yt_dlp', SimpleNamespace(YoutubeDL=_FailingYoutubeDL))
+
+    with pytest.raises(Exception, match='Não foi possível acessar o vídeo: HTTP Error 403') as info:
+        pipeline.transcribe_source('https://youtu.be/dQw4w9WgXcQ', client=None, workdir=str(tmp_path))
+    assert isinstance(info.value.__cause__, OSError)
+
+
+def test_vimeo_without_credentials_says_so(monkeypatch, tmp_path):
+    monkeypatch.setattr(pipeline, 'get_vimeo_client', lambda: None)
+
+    with pytest.raises(RuntimeError, match='VIMEO_ACCESS_TOKEN'):
+        pipeline.transcribe_source('https://vimeo.com/123456', client=None, workdir=str(tmp_path))
+
+
+def test_vimeo_api_error_propagates(monkeypatch, tmp_path):
+    def fail(video_id, vimeo_client):
+        raise RuntimeError("404 Client Error: Not Found")
+
+    monkeypatch.setattr(pipeline, 'get_vimeo_client', lambda: object())
+    monkeypatch.setattr(pipeline, 'get_vimeo_video_info', fail)
+
+    with pytest.raises(RuntimeError, match='404 Client Error'):
+        pipeline.transcribe_source('https://vimeo.com/123456', client=None, workdir=str(tmp_path))
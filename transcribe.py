@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Transcrição de vídeos pela linha de comando, sem o Streamlit.
+
+Uso:
+    python transcribe.py <fonte> [<fonte> ...] --out <pasta> [--workers 2] [--model gpt-4o-mini]
+        [--profile] [--no-history]
+
+Cada fonte pode ser uma URL do YouTube ou do Vimeo, uma URI gs:// ou URL do
+Cloud Storage, uma URL de arquivo do Google Drive (ou 'drive:<ID>'), um
+caminho local ou outra URL de vídeo. Para cada fonte são gravados em --out a
+transcrição completa e a resumida, em SRT e PDF. Com --profile, também o
+perfil de CPU e de memória de cada fonte (ver profiling.py).
+
+Fontes já transcritas com o mesmo modelo são lidas do histórico (ver
+history_store.py); --no-history transcreve tudo de novo sem consultá-lo nem
+gravar nele.
+"""
+
+import os
+import sys
+import logging
+import argparse
+import threading
+from events import PipelineEvents
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+
+
+class ConsoleEvents(PipelineEvents):
+    """
+    Escreve as mensagens do pipeline no terminal, prefixadas pela fonte.
+    O progresso é mostrado a cada 10% de cada etapa.
+    """
+
+    _print_lock = threading.Lock()
+
+    def __init__(self, label):
+        self.label = label
+        self._last_step = {}
+
+    def _print(self, message, stream=sys.stdout):
+        with self._print_lock:
+            print(f"[{self.label}] {message}", file=stream, flush=True)
+
+    def info(self, message):
+        self._print(message)
+
+    def success(self, message):
+        self._print(f"✅ {message}")
+
+    def warning(self, message):
+        self._print(f"⚠️ {message}", sys.stderr)
+
+    def error(self, message):
+        self._print(f"❌ {message}", sys.stderr)
+
+    def progress(self, stage, done, total=None, message=None):
+        if not total:
+            return
+        step = int(min(done / total, 1.0) * 10)
+        if self._last_step.get(stage) == step:
+            return
+        self._last_step[stage] = step
+        self._print(f"{stage}: {step * 10}%" + (f" ({message})" if message else ""))
+
+
+def _needs_drive(source):
+    return source.startswith('drive:') or 'drive.google.com/' in source
+
+
+def main(argv=None):
+    from dotenv import load_dotenv, find_dotenv
+    from openai_clients import get_openai_client
+    from utils import get_drive_service, run_jobs_in_pool, clean_filename
+    from pipeline import DEFAULT_SUMMARY_MODEL, transcribe_source, write_transcription_files
+
+    _ = load_dotenv(find_dotenv())
+
+    parser = argparse.ArgumentParser(
+        description="Transcreve e resume vídeos sem a interface Streamlit")
+    parser.add_argument('sources', nargs='+',
+                        help="URLs, URIs gs://, 'drive:<ID>' ou caminhos de vídeos")
+    parser.add_argument('--out', default='transcricoes',
+                        help="Pasta onde os arquivos gerados são gravados")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help="Vídeos processados em paralelo")
+    parser.add_argument('--model', default=DEFAULT_SUMMARY_MODEL,
+                        help="Modelo OpenAI usado nos resumos")
+    parser.add_argument('--profile', action='store_true',
+                        help="Grava o perfil de CPU e de memória de cada fonte em --out")
+    parser.add_argument('--no-history', action='store_true',
+                        help="Não consulta nem grava o histórico de transcrições")
+    args = parser.parse_args(argv)
+
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        print("❌ Defina OPENAI_API_KEY no ambiente ou no arquivo .env.", file=sys.stderr)
+        return 2
+    client = get_openai_client(api_key)
+
+    drive_service = None
+    if any(_needs_drive(source) for source in args.sources):
+        drive_service = get_drive_service()
+        if not drive_service:
+            print("❌ Não foi possível conectar ao Google Drive. Execute 'python setup_drive.py'.",
+                  file=sys.stderr)
+            return 2
+
+    history = None
+    if not args.no_history:
+        from history_store import get_history_store
+
+        history = get_history_store()
+
+    def transcribe(source):
+        result = transcribe_source(
+            source, client, args.model, drive_service=drive_service,
+            events=ConsoleEvents(source), history=history)
+        return result, write_transcription_files(result, args.out)
+
+    def job(source):
+        if not args.profile:
+            return transcribe(source)
+        from profiling import profile_run
+
+        prefix = clean_filename(os.path.basename(source.rstrip('/')) or 'fonte') + '_'
+        with profile_run(args.out, prefix=prefix, title=source) as profiler:
+            result, paths = transcribe(source)
+        return result, paths + list(profiler.files.values())
+
+    failed = 0
+    for finished in run_jobs_in_pool(args.sources, job, max_workers=args.workers):
+        for source, outcome, error in finished:
+            if error:
+                failed += 1
+                print(f"❌ {source}: {str(error)}", file=sys.stderr)
+                continue
+            result, paths = outcome
+            origin = ", do histórico" if result.get('from_history') else ""
+            print(f"✅ {source} ({result['seconds']:.0f}s{origin})")
+            for path in paths:
+                print(f"   {path}")
+
+    print(f"{len(args.sources) - failed} vídeo(s) transcritos, {failed} falha(s).")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,17 @@
 import streamlit as st
-from openai import OpenAI
 from dotenv import load_dotenv, find_dotenv
 import os
-import re
 import logging
-import tempfile
-import requests
+import shutil
 import hashlib
+import uuid
 import datetime
-from moviepy.editor import VideoFileClip
+import functools
+import time
 from utils import *
+from pipeline import *
+from events import PipelineEvents
+from job_queue import *
 
 # Load environment variables
 _ = load_dotenv(find_dotenv())
@@ -18,31 +20,46 @@ _ = load_dotenv(find_dotenv())
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Intervalo de atualização da página enquanto há jobs em andamento
+JOB_REFRESH_INTERVAL = 2  # segundos
+
+# Rótulos das etapas do pipeline nas barras de progresso
+STAGE_LABELS = {
+    'download': "Download",
+    'sondagem': "Leitura dos metadados",
+    'extracao': "Extração do áudio",
+    'divisao': "Divisão em chunks",
+    'transcricao': "Transcrição",
+    'resumo': "Resumo",
+    'pdf': "Geração dos PDFs",
+    'upload_drive': "Envio ao Google Drive",
+}
+
 
 st.set_page_config(page_title="Resumo de Transcrição de Vídeo",
                    page_icon="🎥", layout="wide")
 
 
 def get_openai_client():
-    if "openai_client" not in st.session_state:
-        api_key = st.session_state.get("openai_api_key")
-        if api_key:
-            st.session_state.openai_client = OpenAI(api_key=api_key)
-        else:
-            st.error(
-                "Chave da API OpenAI não encontrada. Por favor, faça login novamente.")
-            return None
-    return st.session_state.openai_client
+    from openai_clients import get_client_registry
+
+    api_key = st.session_state.get("openai_api_key")
+    if not api_key:
+        st.error(
+            "Chave da API OpenAI não encontrada. Por favor, faça login novamente.")
+        return None
+    # Cliente compartilhado pelo processo (pool de conexões único)
+    return get_client_registry().get(api_key)
 
 
 def validate_openai_api_key(api_key):
-    try:
-        test_client = OpenAI(api_key=api_key)
-        test_client.models.list()
-        return True
-    except Exception as e:
-        st.error(f"Erro ao validar a chave API do OpenAI: {str(e)}")
-        return False
+    from openai_clients import validate_api_key
+
+    # Resultado em cache por alguns minutos (ver openai_clients.py)
+    valid, error = validate_api_key(api_key)
+    if not valid:
+        st.error(f"Erro ao validar a chave API do OpenAI: {error}")
+    return valid
 
 
 def check_password():
@@ -103,6 +120,12 @@ def sidebar():
             key="temperature_slider"
         )
 
+        if st.session_state.get("user_role") == 'admin':
+            st.checkbox(
+                "Gerar perfil de desempenho dos próximos jobs",
+                key="profile_jobs",
+                help="Grava o perfil de CPU e de memória de cada job junto dos arquivos gerados")
+
         if st.button("Logout"):
             st.session_state["authentication_status"] = False
             st.session_state["openai_api_key"] = None
@@ -117,496 +140,642 @@ def sidebar():
     return model, max_tokens, temperature
 
 
-@st.cache_data
-def transcreve_audio_chunk(chunk_path, prompt=""):
-    client = get_openai_client()
-    if not client:
-        return None
 
-    with open(chunk_path, 'rb') as arquivo_audio:
-        transcricao = client.audio.transcriptions.create(
-            model='whisper-1',
-            language='pt',
-            response_format='srt',
-            file=arquivo_audio,
-            prompt=prompt,
-        )
-        return transcricao
+class StreamlitEvents(PipelineEvents):
+    """
+    Mostra as mensagens e o progresso do pipeline na página. Só pode ser
+    usado na thread do script Streamlit.
+    """
 
-# Função para usar o modelo WhisperX
-# def transcribe_with_whisperx(video_path):
-#     model = load_model("base")
-#     result = transcribe(model, video_path, task="transcribe", language="pt")
-#     return result.text
+    def __init__(self):
+        self._status = st.empty()
+        self._bars = {}
 
+    def info(self, message):
+        self._status.info(message)
 
-@st.cache_data
-def gera_resumo_tldv(transcricao, model, max_tokens, temperature):
-    client = get_openai_client()
-    if not client:
-        return None
+    def success(self, message):
+        self._status.success(message)
 
-    try:
-        # Dividir a transcrição em partes menores se necessário
-        max_chars = 15000  # Ajuste este valor conforme necessário
-        transcricao_parts = [transcricao[i:i+max_chars]
-                             for i in range(0, len(transcricao), max_chars)]
-
-        resumo_completo = ""
-        for part in transcricao_parts:
-            resposta = client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": "Você é um assistente especializado em criar resumos concisos e informativos."},
-                    {"role": "user", "content": f"""Crie um resumo desta parte da transcrição, seguindo estas diretrizes:
-                    1. Identifique os pontos principais do conteúdo sem repetições.
-                    2. Escreva uma breve descrição para cada ponto importante.
-                    3. Mantenha cada ponto conciso, mas informativo.
-                    4. Cubra todo o conteúdo desta parte, não apenas o início.
-                    5. Apresente os pontos em ordem cronológica.
-                    6. Não inclua timestamps no resumo.
-                    7. Verificar se o tempo da transcrição srt está compatível com o áudio do vídeo
-
-                    Transcrição:
-                    {part}"""}
-                ],
-                max_tokens=max_tokens,
-                temperature=temperature
-            )
-            resumo_completo += resposta.choices[0].message.content + "\n\n"
-
-        return resumo_completo.strip()
-    except Exception as e:
-        st.error(f"Erro ao gerar resumo: {str(e)}")
-        return None
+    def warning(self, message):
+        st.warning(message)
+
+    def error(self, message):
+        st.error(message)
+
+    def progress(self, stage, done, total=None, message=None):
+        if not total:
+            return
+        label = message or STAGE_LABELS.get(stage, stage)
+        if stage not in self._bars:
+            self._bars[stage] = st.progress(0.0, text=label)
+        self._bars[stage].progress(min(done / total, 1.0), text=label)
+
+    def clear(self):
+        self._status.empty()
 
 
-def process_audio_for_transcription(audio_path, duration_seconds=None):
+def _read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def render_download_link(files, filename, label, mime='file/txt', key=None):
     """
-    Processa um arquivo de áudio para transcrição
+    Link de download de um arquivo de files: embutido na página quando o
+    conteúdo já está em memória (bytes) ou, quando é um caminho, um botão que
+    só lê o arquivo no clique (modo de memória limitada). key distingue o
+    botão quando o mesmo arquivo aparece em mais de um lugar da página.
     """
-    try:
-        logger.info(f"Iniciando processamento do áudio: {audio_path}")
+    data = files[filename]
+    if isinstance(data, bytes):
+        st.markdown(create_download_link_bytes(data, label, filename, mime),
+                    unsafe_allow_html=True)
+    else:
+        st.download_button(label, data=functools.partial(_read_file, data), file_name=filename,
+                           mime=mime, key=f"download_{key}_{data}", on_click='ignore')
+
+
+def render_transcription_result(result, files, transcript_text=None):
+    """
+    Mostra um resultado do pipeline (ver pipeline.build_transcription_result)
+    com os links de download. files é o dicionário {nome do arquivo: bytes
+    ou caminho} gerado para o resultado; transcript_text, a transcrição já
+    convertida por processa_srt (convertida aqui se não for informada).
+    """
+    name = result['name']
+    key = result.get('job_id', name)
+    if transcript_text is None:
+        transcript_text = processa_srt(result['srt'])
+
+    # Create tabs for display
+    tab1, tab2 = st.tabs([
+        "Transcrição Resumida",
+        "Transcrição Completa"
+    ])
+
+    with tab1:
+        st.text_area("Transcrição Resumida", result['summary_text'], height=300,
+                     key=f"resumo_{key}")
+
+    with tab2:
+        st.text_area("Transcrição Completa", transcript_text, height=300,
+                     key=f"completa_{key}")
 
-        # Verificar se o arquivo de áudio existe
-        if not os.path.exists(audio_path):
-            raise FileNotFoundError(
-                f"O arquivo de áudio não foi encontrado: {audio_path}")
+    # Download section
+    st.subheader("Download dos Arquivos")
+    tab1, tab2 = st.tabs(["Transcrição Resumida", "Transcrição Completa"])
 
-        # Verificar se o arquivo tem tamanho > 0
-        if os.path.getsize(audio_path) == 0:
-            raise ValueError("O arquivo de áudio está vazio")
+    with tab1:
+        col1, col2 = st.columns(2)
+        with col1:
+            render_download_link(files, f"{name}{SUMMARY_PDF_SUFFIX}",
+                                 "Baixar Transcrição Resumida (PDF)", 'application/pdf', key=key)
+        with col2:
+            render_download_link(files, f"{name}{SUMMARY_SRT_SUFFIX}",
+                                 "Baixar Transcrição Resumida (SRT)", key=key)
 
-        # Dividir o áudio em chunks
-        audio_chunks = split_audio(
-            audio_path, chunk_duration=1200)  # 20 minutos por chunk
-        full_transcript = ""
+    with tab2:
+        col1, col2 = st.columns(2)
+        with col1:
+            render_download_link(files, f"{name}{TRANSCRIPTION_PDF_SUFFIX}",
+                                 "Baixar Transcrição Completa (PDF)", 'application/pdf', key=key)
+        with col2:
+            render_download_link(files, f"{name}{TRANSCRIPTION_SRT_SUFFIX}",
+                                 "Baixar Transcrição Completa (SRT)", key=key)
+
+    # Arquivos salvos na pasta do vídeo original no Google Drive
+    uploaded_files = result.get('uploaded_files')
+    if uploaded_files:
+        st.subheader("📁 Arquivos salvos no Google Drive")
+        for file_info in uploaded_files:
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                st.write(
+                    f"**{file_info['name']}** - {file_info['type']}")
+            with col2:
+                st.markdown(
+                    f"[🔗 Abrir no Drive]({file_info['link']})", unsafe_allow_html=True)
+    elif result.get('drive_file_id') and 'uploaded_files' in result:
+        st.warning(
+            "⚠️ Não foi possível salvar os arquivos no Google Drive.")
 
-        logger.info(
-            f"Iniciando transcrição de {len(audio_chunks)} chunks de áudio")
 
-        # Processar cada chunk de áudio
-        for i, (chunk_path, start_time) in enumerate(audio_chunks):
-            logger.info(f"Processando chunk {i+1}/{len(audio_chunks)}")
+########################################
+# FILA DE TRANSCRIÇÕES
+########################################
 
-            # Verificar se o chunk existe e tem tamanho > 0
-            if not os.path.exists(chunk_path) or os.path.getsize(chunk_path) == 0:
-                logger.warning(
-                    f"Chunk {i+1} não existe ou está vazio, pulando...")
-                continue
 
-            chunk_size = os.path.getsize(chunk_path)
-            logger.info(
-                f"Tamanho do chunk: {chunk_size / (1024 * 1024):.2f} MB")
+@st.cache_resource
+def get_job_pool():
+    """
+    Fila e pool de workers compartilhados por todas as sessões do app.
+    Com TRANSCRIPTION_WORKERS=0 nenhum worker roda no app e os jobs ficam
+    para um processo separado (python job_queue.py).
+    """
+    num_workers = int(get_setting('TRANSCRIPTION_WORKERS', DEFAULT_JOB_WORKERS))
+    pool = JobWorkerPool(JobQueue(), num_workers=num_workers)
+    if num_workers > 0:
+        pool.start()
+        metrics_port = get_setting('TRANSCRIPTION_METRICS_PORT')
+        if metrics_port:
+            from metrics import start_metrics_server
+            start_metrics_server(int(metrics_port))
+    return pool
+
+
+def history_owner():
+    """
+    Usuário cujas entradas do histórico a sessão vê (None para o
+    administrador, que vê todas)
+    """
+    if st.session_state.get("user_role") == 'admin':
+        return None
+    return st.session_state.get("username")
 
-            chunk_transcript = transcreve_audio_chunk(chunk_path)
-            if chunk_transcript:
-                adjusted_transcript = ajusta_tempo_srt(
-                    chunk_transcript, start_time)
-                full_transcript += adjusted_transcript + "\n\n"
 
-            # Remove o chunk de áudio após a transcrição
-            try:
-                os.remove(chunk_path)
-            except Exception as e:
-                logger.warning(
-                    f"Não foi possível remover o chunk {chunk_path}: {str(e)}")
+def open_from_history(source_key, model):
+    """
+    Abre o resultado guardado no histórico para a fonte e o modelo, se houver;
+    a entrada passa a fazer parte do histórico do usuário. Retorna True se
+    abriu (e não há nada a enfileirar).
+    """
+    from history_store import get_history_store
 
-        logger.info("Transcrição completa")
-        return full_transcript
+    if not source_key:
+        return False
+    stored = get_history_store().find(source_key, model, owner=st.session_state.get("username"))
+    if stored is None:
+        return False
+    st.session_state['history_entry'] = stored['history_id']
+    transcribed_at = datetime.datetime.fromtimestamp(stored['created_at'])
+    st.info(f"Este vídeo já foi transcrito em {transcribed_at:%d/%m/%Y %H:%M}. "
+            f"O resultado foi aberto do histórico, abaixo.")
+    return True
 
-    except Exception as e:
-        logger.exception(f"Erro ao processar o áudio: {str(e)}")
-        raise
 
+def submit_transcription(source, model, name=None, params=None, source_key=None,
+                         check_history=True):
+    """
+    Enfileira a transcrição de uma fonte para o usuário atual e retorna o ID
+    do job. Se a fonte já está no histórico com o mesmo modelo, abre o
+    resultado guardado e retorna None; com check_history=False enfileira
+    mesmo assim (o job ainda reaproveita o histórico, mas executa os passos
+    seguintes, como salvar no Drive).
+    """
+    from history_store import source_identity
 
-def process_video(video_path_or_url):
+    if source_key is None:
+        source_key = source_identity(source)
+    if check_history and open_from_history(source_key, model):
+        return None
+    if source_key:
+        params = dict(params or {}, source_key=source_key)
+
+    pool = get_job_pool()
+    if st.session_state.get("user_role") == 'admin' and st.session_state.get("profile_jobs"):
+        params = dict(params or {}, profile=True)
+    job_id = pool.submit(
+        source, model,
+        api_key=st.session_state.get("openai_api_key"),
+        owner=st.session_state.get("username"),
+        name=name,
+        params=params)
+    return job_id
+
+
+def new_batch(label):
     """
-    Processa um arquivo de vídeo, extraindo o áudio e retornando a transcrição
+    Parâmetros que agrupam os jobs de um envio em lote (pasta do Drive,
+    playlist), para o painel de jobs mostrar o progresso do lote inteiro
     """
-    temp_audio_file = None
-    try:
-        # Criar um arquivo temporário para o áudio
-        temp_audio_file = tempfile.NamedTemporaryFile(
-            delete=False, suffix='.mp3')
-        temp_audio_file.close()
-        audio_path = temp_audio_file.name
+    return {'batch_id': uuid.uuid4().hex, 'batch_label': label}
 
-        logger.info(f"Iniciando processamento do vídeo: {video_path_or_url}")
-        logger.info(f"Arquivo de áudio temporário criado: {audio_path}")
 
-        # Extrair áudio do vídeo com tratamento de erro mais robusto
-        try:
-            with VideoFileClip(video_path_or_url) as video:
-                if video.audio is None:
-                    raise ValueError("O vídeo não possui faixa de áudio")
-
-                audio = video.audio
-                # Configurações mais robustas para write_audiofile
-                audio.write_audiofile(
-                    audio_path,
-                    verbose=False,
-                    logger=None,
-                    bitrate="64k"
-                )
-        except Exception as e:
-            logger.error(f"Erro ao extrair áudio: {str(e)}")
-            raise
+def save_upload_for_job(uploaded_video):
+    """
+    Copia um arquivo enviado para a pasta da fila, onde fica até o job terminar
+    """
+    uploads_dir = os.path.join(JOB_OUTPUT_DIR, 'uploads')
+    os.makedirs(uploads_dir, exist_ok=True)
+    extension = os.path.splitext(uploaded_video.name)[1] or '.mp4'
+    path = os.path.join(uploads_dir, f"{hashlib.md5(os.urandom(16)).hexdigest()}{extension}")
+    uploaded_video.seek(0)
+    with open(path, 'wb') as f:
+        shutil.copyfileobj(uploaded_video, f)
+    return path
 
-        logger.info(f"Áudio extraído e salvo em: {audio_path}")
 
-        # Verificar se o arquivo de áudio foi criado corretamente
-        if not os.path.exists(audio_path):
-            raise FileNotFoundError(
-                f"O arquivo de áudio não foi criado: {audio_path}")
+def load_job_files(result):
+    """
+    {nome do arquivo: conteúdo} dos arquivos de um job. No modo de memória
+    limitada, os valores são os caminhos e os arquivos só são lidos no
+    download (ver render_download_link).
+    """
+    from memory_limit import bounded_memory_mode
+
+    files = {}
+    for path in result.get('files', []):
+        if bounded_memory_mode():
+            if os.path.exists(path):
+                files[os.path.basename(path)] = path
+            continue
+        try:
+            with open(path, 'rb') as f:
+                files[os.path.basename(path)] = f.read()
+        except OSError as e:
+            logger.warning(f"Arquivo do job indisponível {path}: {str(e)}")
+    return files
 
-        # Verificar se o arquivo tem tamanho > 0
-        if os.path.getsize(audio_path) == 0:
-            raise ValueError("O arquivo de áudio foi criado mas está vazio")
 
-        # Processar o áudio extraído
-        return process_audio_for_transcription(audio_path)
+def load_job_view(job):
+    """
+    Arquivos e texto da transcrição de um job concluído, do ResultStore
+    compartilhado (ver result_store.py): só a primeira exibição lê os
+    arquivos do disco, os reruns seguintes apenas consultam o cache. None
+    se os arquivos do job não estão mais disponíveis.
+    """
+    from result_store import get_result_store
 
-    except Exception as e:
-        logger.exception(f"Erro ao processar o vídeo: {str(e)}")
-        raise
+    def load():
+        files = load_job_files(job['result'])
+        if len(files) < 4:
+            return None
+        return {'files': files, 'transcript_text': processa_srt(job['result']['srt'])}
 
-    finally:
-        # Limpar arquivo temporário
-        if temp_audio_file and os.path.exists(temp_audio_file.name):
-            try:
-                os.remove(temp_audio_file.name)
-            except Exception as e:
-                logger.warning(
-                    f"Não foi possível remover o arquivo temporário {temp_audio_file.name}: {str(e)}")
+    return get_result_store().get_or_load(('job', job['id'], job['finished_at']), load)
 
-########################################
-# FUNÇÕES DE TRANSCRIÇÃO DE VIDEO DO YOUTUBE
-########################################
 
+def render_job_timeline(job):
+    """
+    Tempo gasto por etapa de um job e a sequência das etapas medidas
+    """
+    timeline = job['timeline']
+    if not timeline:
+        st.caption("Nenhuma etapa medida ainda.")
+        return
 
-def process_youtube_video_simple(youtube_url):
+    totals = {}
+    for record in timeline:
+        stage = totals.setdefault(record['stage'], {
+            "Etapa": STAGE_LABELS.get(record['stage'], record['stage']),
+            "Chamadas": 0, "Tempo (s)": 0.0, "Entrada (MB)": 0.0, "Saída (MB)": 0.0, "Erros": 0})
+        stage["Chamadas"] += 1
+        stage["Tempo (s)"] += record['seconds']
+        stage["Entrada (MB)"] += (record.get('bytes_in') or 0) / (1024 * 1024)
+        stage["Saída (MB)"] += (record.get('bytes_out') or 0) / (1024 * 1024)
+        stage["Erros"] += 1 if record.get('error') else 0
+    st.dataframe(list(totals.values()), hide_index=True, use_container_width=True)
+
+    job_started = job['started_at'] or timeline[0]['started_at']
+    st.dataframe([{
+        "Início (s)": round(record['started_at'] - job_started, 1),
+        "Etapa": STAGE_LABELS.get(record['stage'], record['stage']),
+        "Chunk": record.get('chunk'),
+        "Duração (s)": record['seconds'],
+        "Entrada (MB)": round((record.get('bytes_in') or 0) / (1024 * 1024), 2),
+        "Saída (MB)": round((record.get('bytes_out') or 0) / (1024 * 1024), 2),
+        "Erro": record.get('error'),
+    } for record in timeline], hide_index=True, use_container_width=True)
+
+
+def render_job_profile(job):
     """
-    Função simplificada para processar vídeos do YouTube usando yt-dlp
+    Relatório do perfil de desempenho de um job e os links de download
     """
+    artifacts = job['result'].get('artifacts', {})
     try:
-        import yt_dlp
-
-        # Configurações do yt-dlp mais robustas
-        ydl_opts = {
-            'format': 'bestaudio/best',
-            'outtmpl': '%(title)s.%(ext)s',
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',
-            }],
-            'quiet': True,
-            'no_warnings': True,
-            'extract_flat': False,
-        }
+        with open(artifacts['profile'], 'rb') as f:
+            report = f.read()
+        with open(artifacts['profile_stacks'], 'rb') as f:
+            stacks = f.read()
+    except OSError as e:
+        logger.warning(f"Perfil do job {job['id']} indisponível: {str(e)}")
+        st.warning("O perfil deste job não está mais disponível.")
+        return
 
-        # Baixar o áudio do vídeo
-        with tempfile.TemporaryDirectory() as temp_dir:
-            ydl_opts['outtmpl'] = os.path.join(temp_dir, '%(title)s.%(ext)s')
-
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                # Primeiro, extrair informações sem baixar
-                try:
-                    info = ydl.extract_info(youtube_url, download=False)
-                    video_title = info.get('title', 'video_youtube')
-                    video_duration = info.get('duration', 0)
-                except Exception as e:
-                    logger.warning(
-                        f"Erro ao extrair informações do vídeo: {str(e)}")
-                    video_title = 'video_youtube'
-                    video_duration = 0
-
-                # Agora baixar o áudio
-                try:
-                    info = ydl.extract_info(youtube_url, download=True)
-                except Exception as e:
-                    logger.error(f"Erro ao baixar vídeo: {str(e)}")
-                    raise Exception(
-                        f"Não foi possível baixar o vídeo: {str(e)}")
-
-                # Encontrar o arquivo de áudio baixado
-                audio_files = [f for f in os.listdir(
-                    temp_dir) if f.endswith('.mp3')]
-                if not audio_files:
-                    raise Exception("Não foi possível baixar o áudio do vídeo")
-
-                audio_path = os.path.join(temp_dir, audio_files[0])
-
-                # Verificar se o arquivo tem tamanho > 0
-                if os.path.getsize(audio_path) == 0:
-                    raise Exception(
-                        "O arquivo de áudio foi baixado mas está vazio")
-
-                # Processar o áudio usando a função específica para áudio
-                srt_content = process_audio_for_transcription(audio_path)
-
-                # Retornar tanto o conteúdo SRT quanto o título do vídeo e duração
-                return srt_content, video_title, video_duration
-
-    except ImportError:
-        st.error("Biblioteca yt-dlp não encontrada. Instale com: pip install yt-dlp")
-        return None, None
-    except Exception as e:
-        logger.exception(f"Erro ao processar vídeo do YouTube: {str(e)}")
-        st.error(f"Erro ao processar vídeo do YouTube: {str(e)}")
-        return None, None
+    st.code(report.decode('utf-8'), language=None)
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown(create_download_link_bytes(
+            report, "Baixar relatório do perfil", os.path.basename(artifacts['profile'])),
+            unsafe_allow_html=True)
+    with col2:
+        st.markdown(create_download_link_bytes(
+            stacks, "Baixar pilhas (speedscope/flamegraph)",
+            os.path.basename(artifacts['profile_stacks'])),
+            unsafe_allow_html=True)
 
-########################################
-# FUNÇÕES DE PROCESSO DE TRANSCRIÇÃO EM SRT E PDF
-########################################
 
+def render_partial_transcript(job):
+    """
+    Legendas dos chunks já transcritos de um job em execução (ou que parou
+    antes do fim)
+    """
+    partial = job['partial_transcript']
+    if not partial:
+        return
+    # A chave muda quando chegam novos chunks: com a mesma chave o Streamlit
+    # manteria o texto da primeira exibição
+    st.text_area("Transcrição parcial", processa_srt(partial), height=300,
+                 key=f"parcial_{job['id']}_{len(partial)}")
 
-def generate_summarized_srt_from_full(srt_content, client, model):
-    """
-    Generate a summarized SRT that maintains timing but provides concise summaries
-    of key points with topic and explanation format.
-    """
-    segments = []
-    current_segment = {}
-    current_text = []
-
-    # Parse original SRT content
-    for line in srt_content.strip().split('\n'):
-        line = line.strip()
-        if line.isdigit():  # Segment number
-            if current_segment:
-                current_segment['text'] = ' '.join(current_text)
-                segments.append(current_segment)
-                current_segment = {}
-                current_text = []
-        elif '-->' in line:  # Timestamp
-            start, end = line.split(' --> ')
-            current_segment['start_time'] = start.strip()
-            current_segment['end_time'] = end.strip()
-        elif line:  # Content
-            current_text.append(line)
-
-    # Add last segment if exists
-    if current_segment and current_text:
-        current_segment['text'] = ' '.join(current_text)
-        segments.append(current_segment)
-
-    # Group segments into meaningful chunks
-    chunk_size = 3  # Adjust based on your needs
-    chunks = [segments[i:i + chunk_size]
-              for i in range(0, len(segments), chunk_size)]
-
-    # Generate summaries for each chunk
-    summarized_segments = []
-    for chunk in chunks:
-        # Combine text from segments in chunk
-        chunk_text = " ".join(seg['text'] for seg in chunk)
-
-        # Generate summary using OpenAI with specific format prompt
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system",
-                 "content": """Você é um especialista em criar resumos estruturados em português do Brasil.
-                Para cada segmento, forneça um resumo EXATAMENTE neste formato:
-
-                Título do tópico: Explicação concisa e direta do conteúdo.
-
-                O título deve ser curto e direto, seguido de dois pontos.
-                A explicação deve ser uma única frase clara e informativa.
-                Cada resumo deve ter exatamente uma linha com o título e a explicação.
-
-                Exemplo exato do formato:
-                Curso Intensivo sobre Nietzsche: O curso foca em uma das obras mais significativas de Nietzsche, considerada por alguns como uma das maiores contribuições da humanidade."""},
-                {"role": "user",
-                 "content": f"Resuma este segmento no formato especificado: {chunk_text}"}
-            ],
-            max_tokens=150,
-            temperature=0.4
-        )
 
-        summary = response.choices[0].message.content.strip()
+def render_batch_progress(queue, batch_id):
+    """
+    Progresso agregado de um envio em lote: vídeos processados, vazão e o
+    resultado de cada vídeo, a partir do estado dos jobs na fila
+    """
+    jobs = queue.list_batch(batch_id)
+    if not jobs:
+        return
 
-        # Create new segment with summary
-        summarized_segments.append({
-            'start_time': chunk[0]['start_time'],
-            'end_time': chunk[-1]['end_time'],
-            'text': summary
-        })
+    total = len(jobs)
+    done = [job for job in jobs if job['state'] == DONE]
+    finished = [job for job in jobs if job['state'] not in ACTIVE_STATES]
+    failed = sum(1 for job in finished if job['state'] == FAILED)
+    st.markdown(f"**{jobs[0]['params'].get('batch_label') or 'Envio em lote'}**")
+    st.progress(len(finished) / total,
+                text=f"{len(finished)}/{total} vídeo(s) processados ({failed} falha(s))")
+
+    started_at = min((job['started_at'] for job in jobs if job['started_at']), default=None)
+    if started_at and finished:
+        # Com o lote em andamento a vazão é medida até agora; depois, até o último job
+        if len(finished) < total:
+            ended_at = time.time()
+        else:
+            ended_at = max(job['finished_at'] for job in finished)
+        elapsed = max(ended_at - started_at, 1e-6)
+        audio_seconds = sum(job['result'].get('duration') or 0 for job in done)
+        st.caption(f"{len(finished) / elapsed * 3600:.1f} vídeos/hora · "
+                   f"{audio_seconds / elapsed:.1f}x o tempo real")
 
-    # Convert summarized segments back to SRT format
-    srt_output = ""
-    for i, segment in enumerate(summarized_segments, 1):
-        srt_output += f"{i}\n"
-        srt_output += f"{segment['start_time']} --> {segment['end_time']}\n"
-        srt_output += f"{segment['text']}\n\n"
+    st.dataframe([{
+        "Vídeo": job['name'] or job['source'],
+        "Estado": JOB_STATE_LABELS.get(job['state'], job['state']),
+        "Tempo (s)": round(job['result']['seconds']) if job['state'] == DONE else None,
+        "Erro": job['error'],
+    } for job in jobs], hide_index=True, use_container_width=True)
 
-    # Para a versão sem timestamps, criar uma versão separada com linhas em branco entre os segmentos
-    text_only_output = "\n\n".join(
-        segment['text'] for segment in summarized_segments)
 
-    return srt_output, text_only_output
+def render_jobs_panel():
+    """
+    Mostra os jobs do usuário com estado, progresso e cancelamento.
+    Retorna True se algum job ainda está na fila ou em execução.
+    """
+    queue = get_job_pool().queue
+    jobs = queue.list_jobs(owner=st.session_state.get("username"))
+    if not jobs:
+        return False
 
+    st.subheader("Minhas transcrições")
+    active = [job for job in jobs if job['state'] in ACTIVE_STATES]
+    finished = len(jobs) - len(active)
+    st.caption(f"{len(active)} em andamento · {finished} finalizada(s)")
+    if active:
+        st.checkbox("Atualizar automaticamente", value=True, key="auto_refresh_jobs")
+
+    batch_ids = dict.fromkeys(job['params']['batch_id'] for job in jobs
+                              if job['params'].get('batch_id'))
+    for batch_id in batch_ids:
+        with st.container(border=True):
+            render_batch_progress(queue, batch_id)
+
+    for job in jobs:
+        label = job['name'] or job['source']
+        state_label = JOB_STATE_LABELS.get(job['state'], job['state'])
+        with st.expander(f"{state_label} · {label}", expanded=job['state'] == RUNNING):
+            if job['state'] in ACTIVE_STATES:
+                if job['state'] == RUNNING and job['stage']:
+                    st.progress(min(job['progress'] or 0.0, 1.0),
+                                text=STAGE_LABELS.get(job['stage'], job['stage']))
+                if job['message']:
+                    st.write(job['message'])
+                render_partial_transcript(job)
+                if job['cancel_requested']:
+                    st.info("Cancelamento solicitado...")
+                elif st.button("Cancelar", key=f"cancel_{job['id']}"):
+                    queue.cancel(job['id'])
+                    st.rerun()
+
+            elif job['state'] == DONE:
+                result = job['result']
+                result['job_id'] = job['id']
+                view = load_job_view(job)
+                if view is None:
+                    st.warning("Os arquivos deste job não estão mais disponíveis.")
+                else:
+                    st.write(f"Concluído em {result['seconds']:.0f}s")
+                    render_transcription_result(result, view['files'],
+                                                transcript_text=view['transcript_text'])
 
-def process_transcription(srt_content, model, max_tokens, temperature, video_path_or_filename, duration_seconds=None, drive_service=None, video_file_id=None):
-    client = get_openai_client()
-    if not client:
-        return
+            elif job['state'] == FAILED:
+                st.error(f"Erro durante a transcrição: {job['error']}")
+                render_partial_transcript(job)
 
-    # Extrair o nome do arquivo original
-    # Se for um caminho completo, extrair o nome; se for apenas o nome, usar diretamente
-    if '/' in video_path_or_filename or '\\' in video_path_or_filename or video_path_or_filename.startswith(('http://', 'https://')):
-        original_filename = extract_filename_from_path(video_path_or_filename)
-    else:
-        # Se for apenas o nome do arquivo (caso do upload local)
-        original_filename = os.path.splitext(video_path_or_filename)[0]
-        # Limpar caracteres especiais
-        original_filename = re.sub(r'[<>:"/\\|?*]', '_', original_filename)
-
-    # Status placeholder para mensagens de progresso
-    status_placeholder = st.empty()
-    status_placeholder.success(
-        "Transcrição automática concluída! Gerando documentos...")
-
-    # Generate summarized SRT and text-only version
-    status_placeholder.info("Gerando resumo da transcrição...")
-    summarized_srt, text_only_summary = generate_summarized_srt_from_full(
-        srt_content, client, model)
-
-    # Get video duration (only if we have a valid video path and duration wasn't provided)
-    duracao_total_segundos = duration_seconds or 0
-    if not duration_seconds and ('/' in video_path_or_filename or '\\' in video_path_or_filename or video_path_or_filename.startswith(('http://', 'https://'))):
-        try:
-            with VideoFileClip(video_path_or_filename) as video:
-                duracao_total_segundos = int(video.duration)
-        except Exception as e:
-            logger.warning(
-                f"Não foi possível obter a duração do vídeo: {str(e)}")
+            else:
+                st.write(job['message'] or "Cancelado.")
+                render_partial_transcript(job)
 
-    # Create PDFs and SRTs with original filename
-    status_placeholder.info("Gerando arquivos PDF e SRT...")
-    transcript_pdf = create_pdf(processa_srt_sem_timestamp(
-        srt_content), f"{original_filename}_transcricao_completa.pdf")
-    summarized_pdf = create_pdf(
-        text_only_summary, f"{original_filename}_transcricao_resumida.pdf")
+            if job['timeline'] and st.checkbox("Linha do tempo", key=f"timeline_{job['id']}"):
+                render_job_timeline(job)
+            if (job['result'] and 'profile' in job['result'].get('artifacts', {})
+                    and st.checkbox("Perfil de desempenho", key=f"profile_{job['id']}")):
+                render_job_profile(job)
 
-    # Save SRT files with original filename
-    summarized_srt_filename = f"{original_filename}_transcricao_resumida.srt"
-    transcript_srt_filename = f"{original_filename}_transcricao_completa.srt"
+    return bool(active)
 
-    # Create SRT files in temp directory with proper names
-    temp_dir = tempfile.gettempdir()
-    summarized_srt_file_path = os.path.join(temp_dir, summarized_srt_filename)
-    transcript_srt_file_path = os.path.join(temp_dir, transcript_srt_filename)
 
-    with open(summarized_srt_file_path, 'w', encoding='utf-8') as f:
-        f.write(summarized_srt)
+def load_history_view(result):
+    """
+    Arquivos e texto da transcrição de uma entrada do histórico, do
+    ResultStore compartilhado. Os arquivos gerados pelo job original são
+    reaproveitados se ainda existem; senão, são gerados em memória.
+    """
+    from result_store import get_result_store
 
-    with open(transcript_srt_file_path, 'w', encoding='utf-8') as f:
-        f.write(srt_content)
+    def load():
+        paths = stored_artifact_files(result)
+        files = load_job_files({'files': paths}) if paths else {}
+        if len(files) < 4:
+            files = render_transcription_files(result)
+        return {'files': files, 'transcript_text': processa_srt(result['srt'])}
 
-    # Remover mensagem de status
-    status_placeholder.empty()
+    return get_result_store().get_or_load(
+        ('history', result['history_id'], result['created_at']), load)
 
-    # Mostrar mensagem final de sucesso
-    st.success("Processamento completo! Todos os arquivos foram gerados.")
 
-    # Create tabs for display
-    tab1, tab2 = st.tabs([
-        "Transcrição Resumida",
-        "Transcrição Completa"
-    ])
+def render_history_entry(entry_id):
+    """
+    Mostra uma transcrição do histórico, com a opção de transcrever de novo
+    """
+    from history_store import get_history_store
 
-    with tab1:
-        st.text_area("Transcrição Resumida", text_only_summary, height=300)
+    result = get_history_store().get(entry_id, owner=history_owner())
+    if result is None:
+        st.session_state.pop('history_entry', None)
+        st.warning("Esta transcrição não está mais no histórico.")
+        return
 
-    with tab2:
-        st.text_area("Transcrição Completa",
-                     processa_srt(srt_content), height=300)
+    transcribed_at = datetime.datetime.fromtimestamp(result['created_at'])
+    st.write(f"**{result['title']}** · transcrito em {transcribed_at:%d/%m/%Y %H:%M} "
+             f"· modelo {result['model']}")
+    result['job_id'] = f"historico_{entry_id}"
+    view = load_history_view(result)
+    render_transcription_result(result, view['files'], transcript_text=view['transcript_text'])
+
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Fechar", key=f"history_close_{entry_id}"):
+            st.session_state.pop('history_entry', None)
+            st.rerun()
+    with col2:
+        # Arquivos enviados pelo app não ficam guardados, só o resultado (as
+        # URLs também têm chave sha256:, do vídeo baixado, mas podem ser lidas de novo)
+        refreshable = (not result['source_key'].startswith('sha256:')
+                       or result['source'].startswith(('http://', 'https://')))
+        if (refreshable
+                and st.button("Transcrever novamente", key=f"history_refresh_{entry_id}")):
+            submit_transcription(
+                result['source'], result['model'], name=result['name'],
+                params={'refresh_history': True}, check_history=False)
+            st.success("Vídeo enviado para a fila de transcrição. Acompanhe o progresso acima.")
+
+
+def render_history_panel():
+    """
+    Transcrições guardadas no histórico (as do usuário; todas para o
+    administrador), reabertas sem processar o vídeo novamente
+    """
+    from history_store import get_history_store
 
-    # Download section
-    st.subheader("Download dos Arquivos")
-    tab1, tab2 = st.tabs(["Transcrição Resumida", "Transcrição Completa"])
+    entries = get_history_store().list_entries(owner=history_owner())
+    entry_id = st.session_state.get('history_entry')
+    if not entries and entry_id is None:
+        return
 
-    with tab1:
-        col1, col2 = st.columns(2)
-        with col1:
-            st.markdown(create_download_link_pdf(summarized_pdf, "Baixar Transcrição Resumida (PDF)",
-                        f"{original_filename}_transcricao_resumida.pdf"), unsafe_allow_html=True)
-        with col2:
-            st.markdown(create_download_link(summarized_srt_file_path, "Baixar Transcrição Resumida (SRT)",
-                        f"{original_filename}_transcricao_resumida.srt"), unsafe_allow_html=True)
+    st.subheader("Histórico de transcrições")
+    labels = {
+        entry['id']: f"{entry['title'] or entry['name']} · "
+                     f"{datetime.datetime.fromtimestamp(entry['created_at']):%d/%m/%Y %H:%M}"
+        for entry in entries
+    }
 
-    with tab2:
-        col1, col2 = st.columns(2)
-        with col1:
-            st.markdown(create_download_link_pdf(transcript_pdf, "Baixar Transcrição Completa (PDF)",
-                        f"{original_filename}_transcricao_completa.pdf"), unsafe_allow_html=True)
-        with col2:
-            st.markdown(create_download_link(transcript_srt_file_path, "Baixar Transcrição Completa (SRT)",
-                        f"{original_filename}_transcricao_completa.srt"), unsafe_allow_html=True)
+    def open_selected():
+        st.session_state['history_entry'] = st.session_state['history_select']
+
+    st.selectbox("Abrir uma transcrição anterior", [None] + list(labels),
+                 format_func=lambda option: "Selecione..." if option is None else labels[option],
+                 key='history_select', on_change=open_selected)
+    if entry_id is not None:
+        render_history_entry(entry_id)
 
-    # Salvar no Google Drive se especificado
-    if drive_service and video_file_id:
-        st.info("Salvando arquivos no Google Drive...")
-        try:
-            # Salvar arquivos na mesma pasta do vídeo original
-            uploaded_files = save_transcription_to_drive(
-                drive_service,
-                video_file_id,
-                srt_content,
-                text_only_summary,
-                original_filename
-            )
-
-            if uploaded_files:
-                st.success("✅ Arquivos salvos no Google Drive com sucesso!")
-                st.subheader("📁 Arquivos salvos no Google Drive")
-
-                for file_info in uploaded_files:
-                    col1, col2 = st.columns([3, 1])
-                    with col1:
-                        st.write(
-                            f"**{file_info['name']}** - {file_info['type']}")
-                    with col2:
-                        st.markdown(
-                            f"[🔗 Abrir no Drive]({file_info['link']})", unsafe_allow_html=True)
-            else:
-                st.warning(
-                    "⚠️ Não foi possível salvar os arquivos no Google Drive.")
 
+def transcribe_drive_folder(drive_service, folder_id, model):
+    """
+    Enfileira todos os vídeos de uma pasta do Drive, pulando os que já têm
+    '<nome>_transcricao_completa.srt' na mesma pasta
+    """
+    with st.spinner("Listando vídeos da pasta..."):
+        videos = list(iter_videos_in_drive(drive_service, folder_id=folder_id))
+        already_done = list_transcribed_basenames(drive_service, folder_id)
+
+    queue = [video for video in videos
+             if output_basename_from_filename(video['name']) not in already_done]
+    st.write(
+        f"{len(videos)} vídeo(s) na pasta: {len(videos) - len(queue)} já transcrito(s), {len(queue)} na fila.")
+    if not queue:
+        st.success("Todos os vídeos desta pasta já foram transcritos.")
+        return
+
+    batch = new_batch(f"Pasta do Drive: {len(queue)} vídeo(s)")
+    for video in queue:
+        submit_transcription(
+            f"drive:{video['id']}", model,
+            name=output_basename_from_filename(video['name']),
+            params=dict(batch, save_to_drive=True), check_history=False)
+    st.success(f"{len(queue)} vídeo(s) enviados para a fila de transcrição. "
+               f"Acompanhe o progresso do lote abaixo.")
+
+
+def transcribe_youtube_batch(playlist_url, model, skip_processed=True):
+    """
+    Expande uma playlist/canal e enfileira os vídeos ainda não processados
+    """
+    with st.spinner("Listando vídeos da playlist/canal..."):
+        try:
+            videos = expand_youtube_url(playlist_url)
         except Exception as e:
-            st.error(f"❌ Erro ao salvar no Google Drive: {str(e)}")
-            logger.exception("Erro ao salvar arquivos no Google Drive")
+            st.error(f"Não foi possível listar os vídeos: {str(e)}")
+            logger.exception("Erro ao expandir playlist/canal do YouTube")
+            return
+
+    processed_ids = load_processed_youtube_ids() if skip_processed else {}
+    queue = [video for video in videos if video['id'] not in processed_ids]
+    st.write(
+        f"{len(videos)} vídeo(s) encontrados: {len(videos) - len(queue)} já processado(s), {len(queue)} na fila.")
+    if not queue:
+        st.success("Todos os vídeos já foram processados.")
+        return
 
-    # Cleanup temporary files
-    for file in [summarized_srt_file_path, transcript_srt_file_path]:
+    batch = new_batch(f"Playlist/canal do YouTube: {len(queue)} vídeo(s)")
+    for video in queue:
+        submit_transcription(
+            video['url'], model,
+            name=clean_filename(video['title']) if video.get('title') else None,
+            params=dict(batch, youtube_id=video['id']), check_history=False)
+    st.success(f"{len(queue)} vídeo(s) enviados para a fila de transcrição. "
+               f"Acompanhe o progresso do lote abaixo.")
+
+
+def render_drive_video_list(drive_service, model, query=None, folder_id=None):
+    """
+    Lista vídeos do Drive página por página. Cada página é renderizada assim que
+    chega e as próximas só são buscadas quando o usuário pede mais resultados.
+    """
+    pages_key = f"drive_pages_{query}_{folder_id}"
+    pages_to_show = st.session_state.get(pages_key, 1)
+
+    page_token = None
+    shown = 0
+    for _ in range(pages_to_show):
         try:
-            os.remove(file)
+            videos, page_token = list_videos_page(
+                drive_service, query, folder_id, page_token)
         except Exception as e:
-            logger.warning(
-                f"Não foi possível remover o arquivo temporário {file}: {str(e)}")
+            logger.error(f"Erro ao buscar vídeos no Drive: {str(e)}")
+            st.error(f"Erro ao buscar vídeos no Drive: {str(e)}")
+            return
+
+        for video in videos:
+            col1, col2, col3 = st.columns([3, 1, 1])
+            with col1:
+                st.write(f"**{video['name']}**")
+                if 'size' in video:
+                    size_mb = int(video['size']) / (1024 * 1024)
+                    st.write(f"Tamanho: {size_mb:.2f} MB")
+            with col2:
+                if st.button("Transcrever", key=f"transcribe_{video['id']}"):
+                    submit_transcription(
+                        f"drive:{video['id']}", model,
+                        name=output_basename_from_filename(video['name']),
+                        params={'save_to_drive': True}, check_history=False)
+                    st.success("Vídeo enviado para a fila de transcrição.")
+            with col3:
+                st.write("")
+        shown += len(videos)
+
+        if not page_token:
+            break
+
+    if shown == 0:
+        st.info("Nenhum vídeo encontrado no Google Drive.")
+        return
+
+    st.write(f"Exibindo {shown} vídeo(s).")
+    if page_token and st.button("Carregar mais vídeos", key=f"more_{pages_key}"):
+        st.session_state[pages_key] = pages_to_show + 1
+        st.rerun()
 
 
 def page(model, max_tokens, temperature):
@@ -617,7 +786,7 @@ def page(model, max_tokens, temperature):
             str(datetime.datetime.now()).encode()).hexdigest()
 
     video_source = st.radio("Escolha a fonte do vídeo:", [
-                            "Upload Local", "YouTube", "Google Cloud Storage", "Google Drive"])
+                            "Upload Local", "YouTube", "Vimeo", "Google Cloud Storage", "Google Drive"])
 
     if video_source == "Upload Local":
         uploaded_video = st.file_uploader(
@@ -626,93 +795,71 @@ def page(model, max_tokens, temperature):
             file_size = uploaded_video.size
             st.write(f"Tamanho do arquivo: {file_size / (1024 * 1024):.2f} MB")
 
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as temp_file:
-                temp_file.write(uploaded_video.read())
-                temp_file_path = temp_file.name
-
             if st.button("Transcrever vídeo automaticamente"):
-                st.info(
-                    "Transcrevendo o vídeo automaticamente... Isso pode levar alguns minutos.")
-                try:
-                    srt_content = process_video(temp_file_path)
-                    if srt_content:
-                        st.success("Transcrição automática concluída!")
-                        # Passar o nome original do arquivo para process_transcription
-                        original_filename = uploaded_video.name
-                        process_transcription(
-                            srt_content, model, max_tokens, temperature, original_filename, None)
-                    else:
-                        st.error(
-                            "Não foi possível realizar a transcrição automática.")
-                except Exception as e:
-                    st.error(f"Erro durante a transcrição: {str(e)}")
-                    logger.exception("Erro durante a transcrição do vídeo")
-                finally:
-                    if os.path.exists(temp_file_path):
-                        os.remove(temp_file_path)
+                from history_store import file_sha256
+
+                # O mesmo conteúdo já transcrito é aberto do histórico, sem cópia
+                source_key = f"sha256:{file_sha256(uploaded_video)}"
+                if not open_from_history(source_key, model):
+                    # O arquivo fica na pasta da fila até o job terminar
+                    upload_path = save_upload_for_job(uploaded_video)
+                    # Usar o nome original do arquivo nos arquivos gerados
+                    submit_transcription(
+                        upload_path, model,
+                        name=output_basename_from_filename(uploaded_video.name),
+                        params={'delete_source_after': upload_path},
+                        source_key=source_key, check_history=False)
+                    st.success(
+                        "Vídeo enviado para a fila de transcrição. Acompanhe o progresso abaixo.")
 
     elif video_source == "Google Cloud Storage":
         gcs_video_url = st.text_input(
-            "Digite a URL pública do vídeo no Google Cloud Storage")
+            "Digite a URL pública ou a URI gs:// do vídeo no Google Cloud Storage")
         if gcs_video_url:
             st.write(f"URL do vídeo: {gcs_video_url}")
 
             if st.button("Transcrever vídeo do GCS"):
-                st.info(
-                    "Transcrevendo o vídeo do GCS... Isso pode levar alguns minutos.")
-                try:
-                    with st.spinner("Realizando transcrição..."):
-                        srt_content = process_video(gcs_video_url)
-
-                    if srt_content:
-                        st.success("Transcrição automática concluída!")
-                        process_transcription(
-                            srt_content, model, max_tokens, temperature, gcs_video_url, None)
-                    else:
-                        st.error(
-                            "Não foi possível realizar a transcrição automática.")
-                except Exception as e:
-                    st.error(f"Erro durante a transcrição: {str(e)}")
-                    logger.exception("Erro durante a transcrição do vídeo")
+                if submit_transcription(gcs_video_url, model):
+                    st.success(
+                        "Vídeo enviado para a fila de transcrição. Acompanhe o progresso abaixo.")
 
     elif video_source == "YouTube":
-        youtube_url = st.text_input("Digite a URL do vídeo do YouTube")
-        if youtube_url:
-            st.write(f"URL do vídeo: {youtube_url}")
-
-            if st.button("Transcrever vídeo do YouTube"):
-                st.info(
-                    "Transcrevendo o vídeo do YouTube... Isso pode levar alguns minutos.")
-                try:
-                    with st.spinner("Realizando transcrição..."):
-                        srt_content, video_title, video_duration = process_youtube_video_simple(
-                            youtube_url)
-
-                    if srt_content:
-                        st.success("Transcrição automática concluída!")
-                        # Usar o título do vídeo para nomear os arquivos
-                        if video_title:
-                            # Limpar o título para usar como nome de arquivo
-                            clean_title = re.sub(
-                                r'[<>:"/\\|?*]', '_', video_title)
-                            process_transcription(
-                                srt_content, model, max_tokens, temperature, clean_title, video_duration)
-                        else:
-                            process_transcription(
-                                srt_content, model, max_tokens, temperature, youtube_url, video_duration)
-                    else:
-                        st.error(
-                            "Não foi possível realizar a transcrição automática.")
-                except Exception as e:
-                    st.error(f"Erro durante a transcrição: {str(e)}")
-                    logger.exception(
-                        "Erro durante a transcrição do vídeo do YouTube")
+        youtube_mode = st.radio("O que deseja transcrever?", [
+                                "Vídeo único", "Playlist ou canal"], horizontal=True)
+
+        if youtube_mode == "Vídeo único":
+            youtube_url = st.text_input("Digite a URL do vídeo do YouTube")
+            if youtube_url:
+                st.write(f"URL do vídeo: {youtube_url}")
+
+                if st.button("Transcrever vídeo do YouTube"):
+                    if submit_transcription(youtube_url, model):
+                        st.success(
+                            "Vídeo enviado para a fila de transcrição. Acompanhe o progresso abaixo.")
+
+        else:
+            playlist_url = st.text_input(
+                "Digite a URL da playlist ou do canal do YouTube")
+            skip_processed = st.checkbox(
+                "Ignorar vídeos já processados", value=True)
+            if playlist_url and st.button("Transcrever playlist/canal"):
+                transcribe_youtube_batch(playlist_url, model, skip_processed)
+
+    elif video_source == "Vimeo":
+        vimeo_url = st.text_input("Digite a URL do vídeo do Vimeo")
+        if vimeo_url:
+            st.write(f"URL do vídeo: {vimeo_url}")
+
+            if st.button("Transcrever vídeo do Vimeo"):
+                if submit_transcription(vimeo_url, model):
+                    st.success(
+                        "Vídeo enviado para a fila de transcrição. Acompanhe o progresso abaixo.")
 
     elif video_source == "Google Drive":
         st.subheader("Transcrição de Vídeos do Google Drive")
 
         # Verificar se o serviço do Drive está disponível
-        drive_service = get_drive_service()
+        drive_service = get_drive_service(events=StreamlitEvents())
 
         if not drive_service:
             st.error(
@@ -729,54 +876,8 @@ def page(model, max_tokens, temperature):
                 search_query = st.text_input(
                     "Digite o nome do vídeo para buscar:")
                 if search_query:
-                    videos = search_videos_in_drive(
-                        drive_service, query=search_query)
-
-                    if videos:
-                        st.write(f"Encontrados {len(videos)} vídeo(s):")
-                        for video in videos:
-                            col1, col2, col3 = st.columns([3, 1, 1])
-                            with col1:
-                                st.write(f"**{video['name']}**")
-                                if 'size' in video:
-                                    size_mb = int(
-                                        video['size']) / (1024 * 1024)
-                                    st.write(f"Tamanho: {size_mb:.2f} MB")
-                            with col2:
-                                if st.button(f"Transcrever", key=f"transcribe_{video['id']}"):
-                                    with st.spinner(f"Fazendo download e transcrevendo {video['name']}..."):
-                                        try:
-                                            # Download do vídeo
-                                            temp_video_path = download_video_from_drive(
-                                                drive_service, video['id'], video['name'])
-                                            if temp_video_path:
-                                                # Processar transcrição
-                                                srt_content = process_video(
-                                                    temp_video_path)
-                                                if srt_content:
-                                                    st.success(
-                                                        "Transcrição concluída!")
-                                                    process_transcription(
-                                                        srt_content, model, max_tokens, temperature, video['name'], None, drive_service, video['id'])
-                                                else:
-                                                    st.error(
-                                                        "Não foi possível realizar a transcrição.")
-
-                                                # Limpar arquivo temporário
-                                                try:
-                                                    os.remove(temp_video_path)
-                                                except:
-                                                    pass
-                                            else:
-                                                st.error(
-                                                    "Erro ao fazer download do vídeo.")
-                                        except Exception as e:
-                                            st.error(
-                                                f"Erro durante a transcrição: {str(e)}")
-                                            logger.exception(
-                                                "Erro durante a transcrição do vídeo do Drive")
-                            with col3:
-                                st.write("")
+                    render_drive_video_list(
+                        drive_service, model, query=search_query)
 
             elif search_option == "Buscar em pasta específica":
                 folder_url = st.text_input(
@@ -784,109 +885,27 @@ def page(model, max_tokens, temperature):
                 if folder_url:
                     folder_id = get_folder_id_from_url(folder_url)
                     if folder_id:
-                        videos = search_videos_in_drive(
-                            drive_service, folder_id=folder_id)
-
-                        if videos:
-                            st.write(
-                                f"Encontrados {len(videos)} vídeo(s) na pasta:")
-                            for video in videos:
-                                col1, col2, col3 = st.columns([3, 1, 1])
-                                with col1:
-                                    st.write(f"**{video['name']}**")
-                                    if 'size' in video:
-                                        size_mb = int(
-                                            video['size']) / (1024 * 1024)
-                                        st.write(f"Tamanho: {size_mb:.2f} MB")
-                                with col2:
-                                    if st.button(f"Transcrever", key=f"transcribe_{video['id']}"):
-                                        with st.spinner(f"Fazendo download e transcrevendo {video['name']}..."):
-                                            try:
-                                                # Download do vídeo
-                                                temp_video_path = download_video_from_drive(
-                                                    drive_service, video['id'], video['name'])
-                                                if temp_video_path:
-                                                    # Processar transcrição
-                                                    srt_content = process_video(
-                                                        temp_video_path)
-                                                    if srt_content:
-                                                        st.success(
-                                                            "Transcrição concluída!")
-                                                        process_transcription(
-                                                            srt_content, model, max_tokens, temperature, video['name'], None, drive_service, video['id'])
-                                                    else:
-                                                        st.error(
-                                                            "Não foi possível realizar a transcrição.")
-
-                                                    # Limpar arquivo temporário
-                                                    try:
-                                                        os.remove(
-                                                            temp_video_path)
-                                                    except:
-                                                        pass
-                                                else:
-                                                    st.error(
-                                                        "Erro ao fazer download do vídeo.")
-                                            except Exception as e:
-                                                st.error(
-                                                    f"Erro durante a transcrição: {str(e)}")
-                                                logger.exception(
-                                                    "Erro durante a transcrição do vídeo do Drive")
-                                with col3:
-                                    st.write("")
+                        with st.expander("Transcrever pasta inteira"):
+                            if st.button("Transcrever todos os vídeos da pasta"):
+                                transcribe_drive_folder(
+                                    drive_service, folder_id, model)
+                        render_drive_video_list(
+                            drive_service, model, folder_id=folder_id)
                     else:
                         st.error(
                             "Não foi possível extrair o ID da pasta da URL fornecida.")
 
             elif search_option == "Listar todos os vídeos":
+                # Manter a lista visível entre reruns (ex.: ao clicar em "Transcrever")
                 if st.button("Listar todos os vídeos"):
-                    videos = search_videos_in_drive(drive_service)
-
-                    if videos:
-                        st.write(f"Encontrados {len(videos)} vídeo(s):")
-                        for video in videos:
-                            col1, col2, col3 = st.columns([3, 1, 1])
-                            with col1:
-                                st.write(f"**{video['name']}**")
-                                if 'size' in video:
-                                    size_mb = int(
-                                        video['size']) / (1024 * 1024)
-                                    st.write(f"Tamanho: {size_mb:.2f} MB")
-                            with col2:
-                                if st.button(f"Transcrever", key=f"transcribe_{video['id']}"):
-                                    with st.spinner(f"Fazendo download e transcrevendo {video['name']}..."):
-                                        try:
-                                            # Download do vídeo
-                                            temp_video_path = download_video_from_drive(
-                                                drive_service, video['id'], video['name'])
-                                            if temp_video_path:
-                                                # Processar transcrição
-                                                srt_content = process_video(
-                                                    temp_video_path)
-                                                if srt_content:
-                                                    st.success(
-                                                        "Transcrição concluída!")
-                                                    process_transcription(
-                                                        srt_content, model, max_tokens, temperature, video['name'], None, drive_service, video['id'])
-                                                else:
-                                                    st.error(
-                                                        "Não foi possível realizar a transcrição.")
-
-                                                # Limpar arquivo temporário
-                                                try:
-                                                    os.remove(temp_video_path)
-                                                except:
-                                                    pass
-                                            else:
-                                                st.error(
-                                                    "Erro ao fazer download do vídeo.")
-                                        except Exception as e:
-                                            st.error(
-                                                f"Erro durante a transcrição: {str(e)}")
-                                            logger.exception(
-                                                "Erro durante a transcrição do vídeo do Drive")
-                            with col3:
-                                st.write("")
+                    st.session_state["drive_list_all"] = True
+                if st.session_state.get("drive_list_all"):
+                    render_drive_video_list(drive_service, model)
+
+    # Jobs do usuário; a página se atualiza sozinha enquanto algum estiver ativo
+    st.divider()
+    has_active_jobs = render_jobs_panel()
+    render_history_panel()
 
     # Adicionar JavaScript para controle do vídeo
     st.markdown("""
@@ -901,6 +920,10 @@ def page(model, max_tokens, temperature):
     </script>
     """, unsafe_allow_html=True)
 
+    if has_active_jobs and st.session_state.get("auto_refresh_jobs", True):
+        time.sleep(JOB_REFRESH_INTERVAL)
+        st.rerun()
+
 
 def main():
     if check_password():
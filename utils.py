@@ -1,5 +1,8 @@
-import streamlit as st
 import os
+import sys
+import time
+import inspect
+import functools
 import base64
 import logging
 import tempfile
@@ -7,64 +10,184 @@ import datetime
 import hashlib
 from io import BytesIO
 from pathlib import Path
-import requests
-from moviepy.editor import VideoFileClip, AudioFileClip
-from pydub import AudioSegment
-import srt
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.enums import TA_JUSTIFY
-import googleapiclient.errors
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload, MediaFileUpload
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import pickle
-from google_auth_oauthlib.flow import Flow
-import webbrowser
 import re
 import urllib.parse
+import html
+import json
+import subprocess
+import math
+from collections import namedtuple
+from events import DEFAULT_EVENTS
+from metrics import CACHE_REQUESTS
+
+# Dependências pesadas (Google APIs, reportlab, requests, srt, moviepy) são
+# importadas dentro das funções de cada subsistema, no primeiro uso, para que
+# a página de login não pague o custo de importar tudo
+# (ver benchmarks/import_time.py)
 
 # CONFIGURAÇÕES GERAIS DE PASTAS
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Configurar pastas temporárias
+# Pasta temporária usada quando nenhum diretório de trabalho é informado
+# (os jobs usam diretórios próprios, ver workspace.py)
 PASTA_TEMP = Path(tempfile.gettempdir())
-ARQUIVO_AUDIO_TEMP = PASTA_TEMP / 'audio.mp3'
-ARQUIVO_VIDEO_TEMP = PASTA_TEMP / 'video.mp4'
 
 MAX_CHUNK_SIZE = 25 * 1024 * 1024  # 25 MB em bytes
+TTL_CACHE_MAX_ENTRIES = 1024
+
+# Codificação de áudio otimizada para fala usada em todos os chunks enviados à API
+SPEECH_AUDIO_BITRATE = "48k"
+SPEECH_SAMPLE_RATE = 16000
+# Formatos aceitos diretamente pela API de transcrição
+WHISPER_UPLOAD_FORMATS = ('.mp3', '.mp4', '.mpeg', '.mpga',
+                          '.m4a', '.wav', '.webm', '.ogg', '.flac')
+
+# Política de uso das legendas existentes do YouTube: 'auto', 'manual' ou 'off'
+# (ver select_youtube_caption_track)
+YOUTUBE_CAPTION_POLICY = os.getenv('YOUTUBE_CAPTION_POLICY', 'auto')
+# Fração mínima da duração do vídeo que as legendas precisam cobrir
+YOUTUBE_CAPTION_MIN_COVERAGE = float(
+    os.getenv('YOUTUBE_CAPTION_MIN_COVERAGE', '0.5'))
+# Registro local dos vídeos do YouTube já processados (modo playlist/canal)
+YOUTUBE_PROCESSED_FILE = 'youtube_processed.json'
+_youtube_registry_lock = threading.Lock()
+
+# Vimeo
+VIMEO_METADATA_TTL = 3600  # segundos
+VIMEO_VIDEO_FIELDS = 'name,duration,files,play'
+
+# Google Cloud Storage
+GCS_DOWNLOAD_WORKERS = 8
+GCS_DOWNLOAD_PART_SIZE = 16 * 1024 * 1024  # 16 MB por faixa
+_gcs_client = {'client': None}
+_gcs_client_lock = threading.Lock()
 
 # Configurações do Google Drive
 SCOPES = ['https://www.googleapis.com/auth/drive']
+DRIVE_MEDIA_URL = 'https://www.googleapis.com/drive/v3/files/{file_id}?alt=media&supportsAllDrives=true'
+DRIVE_DOWNLOAD_WORKERS = 8
+DRIVE_DOWNLOAD_PART_SIZE = 16 * 1024 * 1024  # 16 MB por faixa
+DRIVE_PAGE_SIZE = 50  # vídeos por página na listagem
+DRIVE_LIST_CACHE_TTL = 60  # segundos
+DRIVE_TOKEN_REFRESH_MARGIN = datetime.timedelta(minutes=5)
+DRIVE_HTTP_TIMEOUT = 120  # segundos
+TRANSCRIPTION_SRT_SUFFIX = '_transcricao_completa.srt'
+
+# Cliente do Drive compartilhado pelo processo (ver get_drive_service)
+_drive_client = {'credentials': None, 'service': None}
+_drive_client_lock = threading.Lock()
+_drive_refresh_lock = threading.Lock()
+_drive_http_local = threading.local()
+
+########################################
+# FUNÇÕES DE CONFIGURAÇÃO E CACHE
+########################################
+
+
+def get_app_secrets():
+    """
+    Secrets do Streamlit quando o código roda dentro do app; {} caso contrário.
+    Não importa o Streamlit: a CLI e os serviços rodam sem ele.
+    """
+    streamlit = sys.modules.get('streamlit')
+    if streamlit is None:
+        return {}
+    try:
+        secrets = streamlit.secrets
+        secrets.keys()
+        return secrets
+    except Exception:
+        return {}
+
+
+def get_setting(name, default=None):
+    """
+    Lê uma configuração das variáveis de ambiente ou, na falta delas, dos secrets
+    """
+    value = os.getenv(name)
+    if value:
+        return value
+    return get_app_secrets().get(name, default)
+
+
+def ttl_cache(ttl):
+    """
+    Cache em memória com expiração de ttl segundos, compartilhado pelo processo.
+    Argumentos cujo nome começa com '_' (ex.: clientes de API) não entram na
+    chave do cache. Exceções não são armazenadas.
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+        cache = {}
+        lock = threading.Lock()
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = tuple((name, value) for name, value in bound.arguments.items()
+                        if not name.startswith('_'))
+            now = time.monotonic()
+            with lock:
+                entry = cache.get(key)
+                if entry and entry[0] > now:
+                    CACHE_REQUESTS.inc(cache=fn.__name__, result='hit')
+                    return entry[1]
+
+            CACHE_REQUESTS.inc(cache=fn.__name__, result='miss')
+            value = fn(*args, **kwargs)
+
+            with lock:
+                cache[key] = (now + ttl, value)
+                if len(cache) > TTL_CACHE_MAX_ENTRIES:
+                    for expired in [k for k, (expires, _) in cache.items() if expires <= now]:
+                        del cache[expired]
+            return value
+
+        wrapper.cache_clear = cache.clear
+        return wrapper
+    return decorator
+
 
 ########################################
 # FUNÇÕES DE AUTENTICAÇÃO E BUSCA NO GOOGLE DRIVE
 ########################################
 
 
-def get_drive_service():
+def _drive_client_config(secrets):
+    # Criar configuração de credenciais a partir dos secrets
+    return {
+        "web": {
+            "client_id": secrets.get('client_id'),
+            "project_id": secrets.get('project_id'),
+            "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+            "token_uri": "https://oauth2.googleapis.com/token",
+            "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
+            "client_secret": secrets.get('client_secret'),
+            "redirect_uris": [
+                "http://localhost:8080",
+                "http://localhost:8080/",
+                "http://127.0.0.1:8080",
+                "http://127.0.0.1:8080/"
+            ]
+        }
+    }
+
+
+def _load_drive_credentials(events=DEFAULT_EVENTS):
     """
-    Obtém o serviço autenticado do Google Drive
+    Carrega (ou obtém via OAuth) as credenciais do Google Drive
     """
-    # Debug: verificar se os secrets estão disponíveis
-    if hasattr(st, 'secrets'):
-        st.info(f"🔍 Secrets disponíveis: {list(st.secrets.keys())}")
-        if 'client_id' in st.secrets:
-            st.info(
-                f"✅ client_id encontrado: {st.secrets.get('client_id')[:20]}...")
-        if 'client_secret' in st.secrets:
-            st.info(
-                f"✅ client_secret encontrado: {st.secrets.get('client_secret')[:10]}...")
-        if 'project_id' in st.secrets:
-            st.info(f"✅ project_id encontrado: {st.secrets.get('project_id')}")
-    else:
-        st.warning("⚠️ Streamlit secrets não disponível")
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from google.auth.transport.requests import Request
+
+    secrets = get_app_secrets()
+    logger.debug(f"Secrets disponíveis: {list(secrets.keys())}")
 
     creds = None
 
@@ -80,168 +203,267 @@ def get_drive_service():
         else:
             # Tentar usar credenciais do Streamlit secrets primeiro
             try:
-                if hasattr(st, 'secrets'):
-                    # Verificar se as credenciais estão no nível raiz dos secrets
-                    if 'client_id' in st.secrets and 'client_secret' in st.secrets:
-                        st.info("🔑 Usando credenciais do Streamlit secrets...")
-                        # Criar configuração de credenciais a partir dos secrets
-                        client_config = {
-                            "web": {
-                                "client_id": st.secrets.get('client_id'),
-                                "project_id": st.secrets.get('project_id'),
-                                "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                                "token_uri": "https://oauth2.googleapis.com/token",
-                                "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
-                                "client_secret": st.secrets.get('client_secret'),
-                                "redirect_uris": [
-                                    "http://localhost:8080",
-                                    "http://localhost:8080/",
-                                    "http://127.0.0.1:8080",
-                                    "http://127.0.0.1:8080/"
-                                ]
-                            }
-                        }
-
-                        flow = InstalledAppFlow.from_client_config(
-                            client_config, SCOPES)
-                        creds = flow.run_local_server(port=8080)
-
-                    elif 'google_drive' in st.secrets:
-                        st.info("🔑 Usando credenciais da seção google_drive...")
-                        google_drive_secrets = st.secrets['google_drive']
-
-                        # Criar configuração de credenciais a partir dos secrets
-                        client_config = {
-                            "web": {
-                                "client_id": google_drive_secrets.get('client_id'),
-                                "project_id": google_drive_secrets.get('project_id'),
-                                "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                                "token_uri": "https://oauth2.googleapis.com/token",
-                                "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
-                                "client_secret": google_drive_secrets.get('client_secret'),
-                                "redirect_uris": [
-                                    "http://localhost:8080",
-                                    "http://localhost:8080/",
-                                    "http://127.0.0.1:8080",
-                                    "http://127.0.0.1:8080/"
-                                ]
-                            }
-                        }
-
-                        flow = InstalledAppFlow.from_client_config(
-                            client_config, SCOPES)
-                        creds = flow.run_local_server(port=8080)
-
-                    else:
-                        st.error(
-                            "❌ Credenciais do Google Drive não encontradas nos secrets do Streamlit.")
-                        st.info(
-                            "💡 Configure as credenciais no painel do Streamlit Cloud:")
-                        st.info("   - client_id")
-                        st.info("   - client_secret")
-                        st.info("   - project_id")
-                        return None
+                # Verificar se as credenciais estão no nível raiz dos secrets
+                if 'client_id' in secrets and 'client_secret' in secrets:
+                    events.info("🔑 Usando credenciais do Streamlit secrets...")
+                    flow = InstalledAppFlow.from_client_config(
+                        _drive_client_config(secrets), SCOPES)
+                    creds = flow.run_local_server(port=8080)
+
+                elif 'google_drive' in secrets:
+                    events.info("🔑 Usando credenciais da seção google_drive...")
+                    flow = InstalledAppFlow.from_client_config(
+                        _drive_client_config(secrets['google_drive']), SCOPES)
+                    creds = flow.run_local_server(port=8080)
 
                 elif os.path.exists('credentials.json'):
                     # Usar arquivo de credenciais local (apenas para desenvolvimento)
-                    st.info("🔑 Usando arquivo credentials.json local...")
+                    events.info("🔑 Usando arquivo credentials.json local...")
                     flow = InstalledAppFlow.from_client_secrets_file(
                         'credentials.json', SCOPES)
                     creds = flow.run_local_server(port=8080)
                 else:
-                    st.error("❌ Credenciais do Google Drive não encontradas.")
-                    st.info(
+                    events.error("❌ Credenciais do Google Drive não encontradas.")
+                    events.info(
                         "💡 Para desenvolvimento local: crie um arquivo credentials.json")
-                    st.info(
-                        "💡 Para produção: configure as credenciais no Streamlit Cloud")
+                    events.info(
+                        "💡 Para produção: configure client_id, client_secret e project_id nos secrets do Streamlit Cloud")
                     return None
 
             except Exception as e:
-                st.error(f"Erro na autenticação do Google Drive: {str(e)}")
+                events.error(f"Erro na autenticação do Google Drive: {str(e)}")
                 logger.error(f"Erro na autenticação: {str(e)}")
                 return None
 
-        # Salva as credenciais para próxima execução (apenas localmente)
-        try:
-            with open('drive_token.pickle', 'wb') as token:
-                pickle.dump(creds, token)
-        except Exception as e:
-            logger.warning(
-                f"Não foi possível salvar token localmente: {str(e)}")
+        _save_drive_credentials(creds)
 
+    return creds
+
+
+def _save_drive_credentials(creds):
+    # Salva as credenciais para próxima execução (apenas localmente)
     try:
-        service = build('drive', 'v3', credentials=creds)
-        return service
+        with open('drive_token.pickle', 'wb') as token:
+            pickle.dump(creds, token)
     except Exception as e:
-        logger.error(f"Erro ao criar serviço do Drive: {str(e)}")
+        logger.warning(
+            f"Não foi possível salvar token localmente: {str(e)}")
+
+
+def _ensure_fresh_drive_credentials(creds):
+    """
+    Renova o token antes de expirar, para que nenhuma requisição pague a
+    renovação (ou falhe com 401) no meio de um download ou listagem
+    """
+    from google.auth.transport.requests import Request
+
+    with _drive_refresh_lock:
+        expiry = getattr(creds, "expiry", None)
+        about_to_expire = expiry is not None and \
+            expiry - datetime.datetime.utcnow() < DRIVE_TOKEN_REFRESH_MARGIN
+        if (not creds.valid or about_to_expire) and creds.refresh_token:
+            logger.info("Renovando token do Google Drive")
+            creds.refresh(Request())
+            _save_drive_credentials(creds)
+    return creds
+
+
+def _build_drive_request(http, *args, **kwargs):
+    """
+    requestBuilder do serviço do Drive: cada thread usa sua própria conexão
+    HTTP (httplib2 não é thread-safe), reaproveitada entre requisições
+    """
+    import httplib2
+    from google_auth_httplib2 import AuthorizedHttp
+    from googleapiclient.http import HttpRequest
+
+    thread_http = getattr(_drive_http_local, 'http', None)
+    if thread_http is None:
+        thread_http = AuthorizedHttp(
+            _drive_client['credentials'], http=httplib2.Http(timeout=DRIVE_HTTP_TIMEOUT))
+        _drive_http_local.http = thread_http
+    return HttpRequest(thread_http, *args, **kwargs)
+
+
+def get_drive_credentials(events=DEFAULT_EVENTS):
+    """
+    Retorna as credenciais do Drive compartilhadas pelo processo, renovadas se necessário
+    """
+    with _drive_client_lock:
+        if _drive_client['credentials'] is None:
+            _drive_client['credentials'] = _load_drive_credentials(events)
+        creds = _drive_client['credentials']
+
+    if creds is None:
         return None
+    return _ensure_fresh_drive_credentials(creds)
 
 
-def search_videos_in_drive(service, query=None, folder_id=None):
+def get_drive_service(events=DEFAULT_EVENTS):
     """
-    Busca vídeos no Google Drive
+    Obtém o serviço autenticado do Google Drive.
+
+    O serviço é criado uma única vez por processo, a partir do documento de
+    descoberta embutido na biblioteca (sem requisição de descoberta), e é
+    compartilhado por todas as sessões e threads.
     """
+    from googleapiclient.discovery import build
+
     try:
-        # Construir a query de busca
-        search_query = "mimeType contains 'video/'"
+        creds = get_drive_credentials(events)
+    except Exception as e:
+        logger.error(f"Erro ao renovar credenciais do Drive: {str(e)}")
+        return None
+    if creds is None:
+        return None
 
-        if query:
-            search_query += f" and name contains '{query}'"
+    with _drive_client_lock:
+        if _drive_client['service'] is None:
+            try:
+                _drive_client['service'] = build(
+                    'drive', 'v3',
+                    credentials=creds,
+                    requestBuilder=_build_drive_request,
+                    static_discovery=True,
+                    cache_discovery=False
+                )
+            except Exception as e:
+                logger.error(f"Erro ao criar serviço do Drive: {str(e)}")
+                return None
+        return _drive_client['service']
 
-        if folder_id:
-            search_query += f" and '{folder_id}' in parents"
 
-        # Buscar arquivos
-        results = service.files().list(
-            q=search_query,
-            spaces='drive',
-            fields='nextPageToken, files(id, name, mimeType, size, createdTime)',
-            orderBy='createdTime desc'
-        ).execute()
+def _build_video_query(query=None, folder_id=None):
+    """
+    Monta a query de busca de vídeos do Drive, escapando aspas do termo buscado
+    """
+    search_query = "mimeType contains 'video/' and trashed = false"
 
-        files = results.get('files', [])
+    if query:
+        escaped_query = query.replace('\\', '\\\\').replace("'", "\\'")
+        search_query += f" and name contains '{escaped_query}'"
 
-        if not files:
-            st.info("Nenhum vídeo encontrado no Google Drive.")
-            return []
+    if folder_id:
+        search_query += f" and '{folder_id}' in parents"
 
-        return files
+    return search_query
 
-    except Exception as e:
-        logger.error(f"Erro ao buscar vídeos no Drive: {str(e)}")
-        st.error(f"Erro ao buscar vídeos no Drive: {str(e)}")
-        return []
+
+@ttl_cache(DRIVE_LIST_CACHE_TTL)
+def list_videos_page(_service, query=None, folder_id=None, page_token=None, page_size=DRIVE_PAGE_SIZE):
+    """
+    Busca uma única página de vídeos no Google Drive.
+    Retorna (arquivos, token_da_proxima_pagina). O resultado fica em cache por
+    (query, pasta, página) durante DRIVE_LIST_CACHE_TTL segundos.
+    """
+    results = _service.files().list(
+        q=_build_video_query(query, folder_id),
+        spaces='drive',
+        corpora='allDrives',
+        includeItemsFromAllDrives=True,
+        supportsAllDrives=True,
+        pageSize=page_size,
+        pageToken=page_token,
+        fields='nextPageToken, files(id, name, mimeType, size, createdTime, parents, md5Checksum, headRevisionId)',
+        orderBy='createdTime desc'
+    ).execute()
+
+    return results.get('files', []), results.get('nextPageToken')
+
+
+def iter_videos_in_drive(service, query=None, folder_id=None, page_size=DRIVE_PAGE_SIZE):
+    """
+    Percorre todas as páginas de vídeos do Google Drive sob demanda
+    """
+    page_token = None
+    while True:
+        files, page_token = list_videos_page(
+            service, query, folder_id, page_token, page_size)
+        for file in files:
+            yield file
+        if not page_token:
+            break
 
 
-def download_video_from_drive(service, file_id, filename):
+def _drive_auth_headers(service):
     """
-    Faz download de um vídeo do Google Drive
+    Retorna os cabeçalhos de autorização atuais do serviço do Drive,
+    renovando o token se necessário
     """
-    try:
-        # Criar arquivo temporário
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.mp4')
-        temp_path = temp_file.name
-        temp_file.close()
+    credentials = _ensure_fresh_drive_credentials(service._http.credentials)
+    headers = {}
+    credentials.apply(headers)
+    return headers
 
-        # Fazer download do arquivo
-        request = service.files().get_media(fileId=file_id)
-        fh = open(temp_path, 'wb')
-        downloader = MediaIoBaseDownload(fh, request)
 
+def _download_with_media_io(service, file_id, temp_path, progress_callback):
+    """
+    Download sequencial pela API (usado quando o download por faixas não é possível)
+    """
+    from googleapiclient.http import MediaIoBaseDownload
+
+    request = service.files().get_media(fileId=file_id)
+    with open(temp_path, 'wb') as fh:
+        downloader = MediaIoBaseDownload(
+            fh, request, chunksize=DRIVE_DOWNLOAD_PART_SIZE)
         done = False
         while done is False:
             status, done = downloader.next_chunk()
             if status:
-                progress = int(status.progress() * 100)
-                st.progress(progress / 100)
+                progress_callback(status.resumable_progress,
+                                  status.total_size or 0)
+
+
+def download_video_from_drive(service, file_id, filename, progress_callback=None, events=DEFAULT_EVENTS,
+                              dest_dir=None):
+    """
+    Faz download de um vídeo do Google Drive.
+
+    Arquivos com tamanho conhecido são baixados em faixas paralelas para um
+    caminho fixo por file_id em dest_dir (o diretório de trabalho do job), o
+    que permite retomar um download interrompido.
+    O progresso é informado por progress_callback(baixados, total) ou, na
+    falta dele, por events.progress('download', ...).
+    """
+    from ranged_download import download_ranged, RangedDownloadError
+
+    try:
+        metadata = service.files().get(
+            fileId=file_id,
+            fields='size',
+            supportsAllDrives=True
+        ).execute()
+        total_size = int(metadata.get('size') or 0)
 
-        fh.close()
+        extension = os.path.splitext(filename)[1] or '.mp4'
+        temp_path = str(Path(dest_dir or PASTA_TEMP) / f"drive_{file_id}{extension}")
 
+        if progress_callback is None:
+            def progress_callback(downloaded, total):
+                events.progress('download', downloaded, total)
+
+        if total_size > 0:
+            try:
+                download_ranged(
+                    DRIVE_MEDIA_URL.format(file_id=file_id),
+                    temp_path,
+                    total_size,
+                    headers=lambda: _drive_auth_headers(service),
+                    num_workers=DRIVE_DOWNLOAD_WORKERS,
+                    part_size=DRIVE_DOWNLOAD_PART_SIZE,
+                    progress_callback=progress_callback
+                )
+                return temp_path
+            except RangedDownloadError as e:
+                logger.warning(
+                    f"Download por faixas indisponível para {file_id}, usando download sequencial: {str(e)}")
+
+        _download_with_media_io(service, file_id, temp_path, progress_callback)
         return temp_path
 
     except Exception as e:
         logger.error(f"Erro ao fazer download do vídeo: {str(e)}")
-        st.error(f"Erro ao fazer download do vídeo: {str(e)}")
+        events.error(f"Erro ao fazer download do vídeo: {str(e)}")
         return None
 
 
@@ -275,10 +497,12 @@ def get_video_parent_folder(service, file_id):
         return None
 
 
-def upload_file_to_drive(service, file_path, filename, parent_folder_id=None, mime_type=None):
+def upload_file_to_drive(service, file_path, filename, parent_folder_id=None, mime_type=None, events=DEFAULT_EVENTS):
     """
     Faz upload de um arquivo para o Google Drive
     """
+    from googleapiclient.http import MediaFileUpload
+
     try:
         logger.info(
             f"Iniciando upload do arquivo '{filename}' para pasta: {parent_folder_id}")
@@ -318,13 +542,15 @@ def upload_file_to_drive(service, file_path, filename, parent_folder_id=None, mi
 
     except Exception as e:
         logger.error(f"Erro ao fazer upload do arquivo '{filename}': {str(e)}")
-        st.error(f"Erro ao fazer upload do arquivo '{filename}': {str(e)}")
+        events.error(f"Erro ao fazer upload do arquivo '{filename}': {str(e)}")
         return None
 
 
-def save_transcription_to_drive(service, video_file_id, transcription_content, summary_content, video_name):
+def save_transcription_to_drive(service, video_file_id, transcription_content, summary_content, video_name,
+                                events=DEFAULT_EVENTS, workdir=None):
     """
-    Salva os arquivos de transcrição na mesma pasta do vídeo original no Google Drive
+    Salva os arquivos de transcrição na mesma pasta do vídeo original no Google Drive.
+    Os arquivos temporários do upload são criados em workdir.
     """
     try:
         logger.info(
@@ -336,77 +562,60 @@ def save_transcription_to_drive(service, video_file_id, transcription_content, s
         logger.info(f"Pasta pai determinada: {parent_folder_id}")
 
         if not parent_folder_id:
-            st.warning(
+            events.warning(
                 "Não foi possível determinar a pasta do vídeo. Os arquivos serão salvos na raiz do Drive.")
             logger.warning(
                 f"Vídeo '{video_name}' não tem pasta pai - salvando na raiz do Drive")
 
-        # Criar arquivos temporários
-        temp_files = []
         uploaded_files = []
 
-        # 1. Arquivo SRT da transcrição completa
-        srt_filename = f"{video_name}_transcricao_completa.srt"
-        srt_temp_path = tempfile.NamedTemporaryFile(
-            delete=False, suffix='.srt', mode='w', encoding='utf-8')
-        srt_temp_path.write(transcription_content)
-        srt_temp_path.close()
-        temp_files.append(srt_temp_path.name)
-
-        # Upload do SRT
-        srt_file = upload_file_to_drive(
-            service, srt_temp_path.name, srt_filename, parent_folder_id)
-        if srt_file:
-            uploaded_files.append({
-                'name': srt_filename,
-                'link': srt_file.get('webViewLink'),
-                'type': 'Transcrição Completa (SRT)'
-            })
-
-        # 2. Arquivo PDF do resumo
-        pdf_filename = f"{video_name}_resumo.pdf"
-        pdf_buffer = create_pdf(summary_content, pdf_filename)
-        pdf_temp_path = tempfile.NamedTemporaryFile(
-            delete=False, suffix='.pdf')
-        pdf_temp_path.write(pdf_buffer.getvalue())
-        pdf_temp_path.close()
-        temp_files.append(pdf_temp_path.name)
-
-        # Upload do PDF
-        pdf_file = upload_file_to_drive(
-            service, pdf_temp_path.name, pdf_filename, parent_folder_id)
-        if pdf_file:
-            uploaded_files.append({
-                'name': pdf_filename,
-                'link': pdf_file.get('webViewLink'),
-                'type': 'Resumo (PDF)'
-            })
-
-        # 3. Arquivo PDF da transcrição completa
-        pdf_full_filename = f"{video_name}_transcricao_completa.pdf"
-        pdf_full_buffer = create_pdf(transcription_content, pdf_full_filename)
-        pdf_full_temp_path = tempfile.NamedTemporaryFile(
-            delete=False, suffix='.pdf')
-        pdf_full_temp_path.write(pdf_full_buffer.getvalue())
-        pdf_full_temp_path.close()
-        temp_files.append(pdf_full_temp_path.name)
-
-        # Upload do PDF completo
-        pdf_full_file = upload_file_to_drive(
-            service, pdf_full_temp_path.name, pdf_full_filename, parent_folder_id)
-        if pdf_full_file:
-            uploaded_files.append({
-                'name': pdf_full_filename,
-                'link': pdf_full_file.get('webViewLink'),
-                'type': 'Transcrição Completa (PDF)'
-            })
-
-        # Limpar arquivos temporários
-        for temp_file in temp_files:
-            try:
-                os.unlink(temp_file)
-            except:
-                pass
+        # Arquivos temporários em um diretório removido mesmo se o upload falhar
+        with tempfile.TemporaryDirectory(dir=workdir) as temp_dir:
+            # 1. Arquivo SRT da transcrição completa
+            srt_filename = f"{video_name}{TRANSCRIPTION_SRT_SUFFIX}"
+            srt_temp_path = os.path.join(temp_dir, 'transcricao.srt')
+            with open(srt_temp_path, 'w', encoding='utf-8') as f:
+                f.write(transcription_content)
+
+            # Upload do SRT
+            srt_file = upload_file_to_drive(
+                service, srt_temp_path, srt_filename, parent_folder_id, events=events)
+            if srt_file:
+                uploaded_files.append({
+                    'name': srt_filename,
+                    'link': srt_file.get('webViewLink'),
+                    'type': 'Transcrição Completa (SRT)'
+                })
+
+            # 2. Arquivo PDF do resumo
+            pdf_filename = f"{video_name}_resumo.pdf"
+            pdf_temp_path = os.path.join(temp_dir, 'resumo.pdf')
+            create_pdf(summary_content, pdf_filename, output_path=pdf_temp_path)
+
+            # Upload do PDF
+            pdf_file = upload_file_to_drive(
+                service, pdf_temp_path, pdf_filename, parent_folder_id, events=events)
+            if pdf_file:
+                uploaded_files.append({
+                    'name': pdf_filename,
+                    'link': pdf_file.get('webViewLink'),
+                    'type': 'Resumo (PDF)'
+                })
+
+            # 3. Arquivo PDF da transcrição completa
+            pdf_full_filename = f"{video_name}_transcricao_completa.pdf"
+            pdf_full_temp_path = os.path.join(temp_dir, 'transcricao_completa.pdf')
+            create_pdf(transcription_content, pdf_full_filename, output_path=pdf_full_temp_path)
+
+            # Upload do PDF completo
+            pdf_full_file = upload_file_to_drive(
+                service, pdf_full_temp_path, pdf_full_filename, parent_folder_id, events=events)
+            if pdf_full_file:
+                uploaded_files.append({
+                    'name': pdf_full_filename,
+                    'link': pdf_full_file.get('webViewLink'),
+                    'type': 'Transcrição Completa (PDF)'
+                })
 
         # Verificar se os arquivos foram salvos corretamente
         for file_info in uploaded_files:
@@ -428,10 +637,39 @@ def save_transcription_to_drive(service, video_file_id, transcription_content, s
 
     except Exception as e:
         logger.error(f"Erro ao salvar transcrição no Drive: {str(e)}")
-        st.error(f"Erro ao salvar transcrição no Drive: {str(e)}")
+        events.error(f"Erro ao salvar transcrição no Drive: {str(e)}")
         return []
 
 
+def list_transcribed_basenames(service, folder_id):
+    """
+    Retorna os nomes base dos vídeos de uma pasta que já possuem
+    '<nome>_transcricao_completa.srt' salvo ao lado
+    """
+    suffix = TRANSCRIPTION_SRT_SUFFIX
+    basenames = set()
+    page_token = None
+    while True:
+        results = service.files().list(
+            q=f"'{folder_id}' in parents and name contains '{suffix}' and trashed = false",
+            spaces='drive',
+            corpora='allDrives',
+            includeItemsFromAllDrives=True,
+            supportsAllDrives=True,
+            pageSize=1000,
+            pageToken=page_token,
+            fields='nextPageToken, files(name)'
+        ).execute()
+        for file in results.get('files', []):
+            name = file.get('name', '')
+            if name.endswith(suffix):
+                basenames.add(name[:-len(suffix)])
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            break
+    return basenames
+
+
 def get_folder_id_from_url(url):
     """
     Extrai o ID da pasta do Google Drive a partir da URL
@@ -456,60 +694,161 @@ def get_folder_id_from_url(url):
         return None
 
 
-def list_drive_folders(service):
+def get_file_id_from_url(url):
     """
-    Lista as pastas do Google Drive
+    Extrai o ID de um arquivo do Google Drive a partir da URL
     """
-    try:
-        results = service.files().list(
-            q="mimeType='application/vnd.google-apps.folder'",
-            spaces='drive',
-            fields='nextPageToken, files(id, name)',
-            orderBy='name'
-        ).execute()
+    patterns = [
+        r'drive\.google\.com/file/d/([a-zA-Z0-9_-]+)',
+        r'drive\.google\.com/file/u/\d+/d/([a-zA-Z0-9_-]+)',
+        r'drive\.google\.com/(?:open|uc)\?(?:.*&)?id=([a-zA-Z0-9_-]+)'
+    ]
 
-        folders = results.get('files', [])
-        return folders
+    for pattern in patterns:
+        match = re.search(pattern, url)
+        if match:
+            return match.group(1)
+
+    return None
 
-    except Exception as e:
-        logger.error(f"Erro ao listar pastas: {str(e)}")
-        return []
 
+########################################
+# FUNÇÕES DO GOOGLE CLOUD STORAGE
+########################################
 
-def debug_folder_access(service, folder_id):
+
+def parse_gcs_url(url):
     """
-    Função de debug para verificar acesso a uma pasta específica
+    Extrai (bucket, objeto) de uma URI gs:// ou de uma URL pública do GCS.
+    Retorna None se a URL não for do Cloud Storage.
     """
-    try:
-        logger.info(f"Testando acesso à pasta: {folder_id}")
+    parsed = urllib.parse.urlparse(url.strip())
+
+    if parsed.scheme == 'gs':
+        bucket, object_name = parsed.netloc, parsed.path.lstrip('/')
+    elif parsed.scheme in ('http', 'https') and parsed.netloc in ('storage.googleapis.com', 'storage.cloud.google.com'):
+        bucket, _, object_name = parsed.path.lstrip('/').partition('/')
+    elif parsed.scheme in ('http', 'https') and parsed.netloc.endswith('.storage.googleapis.com'):
+        bucket = parsed.netloc[:-len('.storage.googleapis.com')]
+        object_name = parsed.path.lstrip('/')
+    else:
+        return None
 
-        # Tentar obter informações da pasta
-        folder_metadata = service.files().get(
-            fileId=folder_id,
-            fields='id,name,parents'
-        ).execute()
+    object_name = urllib.parse.unquote(object_name)
+    if not bucket or not object_name:
+        return None
+    return bucket, object_name
 
-        logger.info(
-            f"Pasta encontrada: {folder_metadata.get('name')} (ID: {folder_metadata.get('id')})")
-        logger.info(f"Pais da pasta: {folder_metadata.get('parents', [])}")
-
-        # Listar arquivos na pasta
-        files_in_folder = service.files().list(
-            q=f"'{folder_id}' in parents",
-            fields='files(id, name, mimeType)',
-            pageSize=10
-        ).execute()
 
-        files = files_in_folder.get('files', [])
-        logger.info(f"Arquivos encontrados na pasta: {len(files)}")
-        for file in files:
-            logger.info(f"  - {file.get('name')} ({file.get('mimeType')})")
+def get_gcs_client():
+    """
+    Cliente do Cloud Storage compartilhado pelo processo. Usa as credenciais
+    padrão do ambiente (necessárias para buckets privados) e, na falta delas,
+    um cliente anônimo para objetos públicos. Respeita STORAGE_EMULATOR_HOST.
+    """
+    from google.cloud import storage
+    import google.auth.exceptions
+
+    with _gcs_client_lock:
+        if _gcs_client['client'] is None:
+            try:
+                _gcs_client['client'] = storage.Client()
+            except (google.auth.exceptions.DefaultCredentialsError, OSError) as e:
+                logger.info(
+                    f"Sem credenciais do GCS, usando cliente anônimo: {str(e)}")
+                _gcs_client['client'] = storage.Client.create_anonymous_client()
+        return _gcs_client['client']
 
-        return True
 
-    except Exception as e:
-        logger.error(f"Erro ao acessar pasta {folder_id}: {str(e)}")
-        return False
+def get_gcs_generation(url):
+    """
+    Geração atual de um objeto do Cloud Storage (muda cada vez que o objeto
+    é substituído), lida dos metadados sem baixar o conteúdo
+    """
+    location = parse_gcs_url(url)
+    if not location:
+        raise ValueError(f"URL do Google Cloud Storage inválida: {url}")
+    bucket_name, object_name = location
+
+    blob = get_gcs_client().bucket(bucket_name).get_blob(object_name)
+    if blob is None:
+        raise FileNotFoundError(
+            f"Objeto não encontrado no GCS: gs://{bucket_name}/{object_name}")
+    return blob.generation
+
+
+def download_gcs_video(url, progress_callback=None, num_workers=GCS_DOWNLOAD_WORKERS, dest_dir=None,
+                       generation=None):
+    """
+    Baixa um vídeo do Cloud Storage (gs:// ou URL pública) com leituras por
+    faixas em paralelo e novas tentativas por faixa para dest_dir. Com
+    generation, baixa essa geração do objeto (a lida por get_gcs_generation);
+    sem ela, a atual. Retorna o caminho local.
+    """
+    from ranged_download import download_parts, RangeWriter, retry_with_backoff
+
+    location = parse_gcs_url(url)
+    if not location:
+        raise ValueError(f"URL do Google Cloud Storage inválida: {url}")
+    bucket_name, object_name = location
+
+    client = get_gcs_client()
+    blob = client.bucket(bucket_name).get_blob(object_name, generation=generation)
+    if blob is None:
+        raise FileNotFoundError(
+            f"Objeto não encontrado no GCS: gs://{bucket_name}/{object_name}")
+
+    extension = os.path.splitext(object_name)[1] or '.mp4'
+    object_hash = hashlib.md5(
+        f"{bucket_name}/{object_name}/{blob.generation}".encode()).hexdigest()
+    dest_path = str(Path(dest_dir or PASTA_TEMP) / f"gcs_{object_hash}{extension}")
+
+    def fetch_part(start, end, counter):
+        with RangeWriter(dest_path, start, end, counter) as writer:
+            def attempt():
+                writer.rewind()
+                # A leitura fixa a geração do objeto para não misturar versões
+                blob.download_to_file(
+                    writer, start=start, end=end, raw_download=True,
+                    if_generation_match=blob.generation, checksum=None, retry=None)
+                if not writer.complete:
+                    raise IOError(f"Faixa {start}-{end} incompleta")
+            retry_with_backoff(
+                attempt, description=f"leitura da faixa {start}-{end} do GCS")
+
+    logger.info(
+        f"Baixando gs://{bucket_name}/{object_name} ({(blob.size or 0) / (1024 * 1024):.2f} MB)")
+    if not blob.size:
+        open(dest_path, 'wb').close()
+        return dest_path
+
+    download_parts(dest_path, blob.size, fetch_part, num_workers=num_workers,
+                   part_size=GCS_DOWNLOAD_PART_SIZE, progress_callback=progress_callback)
+    return dest_path
+
+
+def download_video_from_url(url, progress_callback=None, dest_dir=None):
+    """
+    Baixa um vídeo de uma URL HTTP(S) qualquer para dest_dir, em blocos.
+    Retorna o caminho local.
+    """
+    import requests
+
+    extension = os.path.splitext(urllib.parse.urlparse(url).path)[1] or '.mp4'
+    dest_path = str(Path(dest_dir or PASTA_TEMP) /
+                    f"url_{hashlib.md5(url.encode()).hexdigest()}{extension}")
+    with requests.get(url, stream=True, timeout=60) as response:
+        response.raise_for_status()
+        total = int(response.headers.get('Content-Length') or 0)
+        downloaded = 0
+        with open(dest_path, 'wb') as f:
+            for block in response.iter_content(chunk_size=1024 * 1024):
+                f.write(block)
+                downloaded += len(block)
+                if progress_callback:
+                    progress_callback(downloaded, total)
+    return dest_path
+
 
 ########################################
 # FUNÇÃO DE EXTRAÇÃO DO NOME DO ARQUIVO
@@ -546,50 +885,219 @@ def extract_filename_from_path(file_path):
         logger.warning(f"Erro ao extrair nome do arquivo: {str(e)}")
         return "transcricao"
 
+
+def output_basename_from_filename(filename):
+    """
+    Nome base usado nos arquivos gerados a partir do nome do vídeo
+    (ex.: 'aula 1.mp4' -> 'aula 1', usado em 'aula 1_transcricao_completa.srt')
+    """
+    return clean_filename(os.path.splitext(filename)[0])
+
+
+def clean_filename(name):
+    """
+    Substitui caracteres inválidos em nomes de arquivo (ex.: títulos de vídeos)
+    """
+    return re.sub(r'[<>:"/\\|?*]', '_', name)
+
+
+def output_file_path(out_dir, filename):
+    """
+    Caminho de um arquivo gerado em out_dir. Levanta ValueError se o nome
+    levar o arquivo para fora de out_dir (ex.: '../' em um nome vindo da API)
+    """
+    path = os.path.join(out_dir, filename)
+    if os.path.dirname(os.path.realpath(path)) != os.path.realpath(out_dir):
+        raise ValueError(f"Nome de arquivo inválido: {filename}")
+    return path
+
 ########################################
 # FUNÇÃO DE PROCESSAMENTO DE AUDIO E VÍDEO
 ########################################
 
 
-def split_audio(audio_path, chunk_duration=1200):  # 20 minutos por chunk
+@functools.lru_cache(maxsize=None)
+def get_ffmpeg_binary():
+    from moviepy.config import get_setting
+    return get_setting("FFMPEG_BINARY")
+
+
+# Metadados de uma mídia lidos uma única vez (ver probe_media) e repassados
+# a todas as etapas seguintes do pipeline
+MediaInfo = namedtuple('MediaInfo', [
+    'path',            # caminho ou URL sondado
+    'duration',        # segundos
+    'size',            # bytes (None para URLs)
+    'format_bitrate',  # bits/s do contêiner
+    'has_audio',
+    'has_video',
+    'audio_codec',
+    'audio_bitrate',   # bits/s da faixa de áudio (None se desconhecido)
+    'channels',
+    'sample_rate',     # Hz
+])
+
+_CHANNEL_LAYOUTS = {'mono': 1, 'stereo': 2, '2.1': 3,
+                    '4.0': 4, 'quad': 4, '5.0': 5, '5.1': 6, '7.1': 8}
+
+
+def _parse_bitrate(value, unit):
+    if value is None:
+        return None
+    factor = {'b/s': 1, 'kb/s': 1000, 'mb/s': 1000000}.get(unit.lower(), 1000)
+    return int(float(value) * factor)
+
+
+def probe_media(path):
+    """
+    Lê os metadados do contêiner (duração, codec, bitrate, canais e taxa de
+    amostragem do áudio) com uma única execução do ffmpeg, sem decodificar
+    """
+    result = subprocess.run(
+        [get_ffmpeg_binary(), '-hide_banner', '-i', path],
+        capture_output=True, text=True, errors='replace')
+    # Sem arquivo de saída o ffmpeg sempre termina com erro; os dados estão no stderr
+    output = result.stderr
+
+    duration_match = re.search(
+        r'Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)', output)
+    if not duration_match:
+        raise ValueError(
+            f"Não foi possível ler os metadados da mídia: {output.strip()[-300:]}")
+    hours, minutes, seconds = duration_match.groups()
+    duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+    bitrate_match = re.search(r'Duration:.*?bitrate:\s*(\d+)\s*(\S+)', output)
+    format_bitrate = _parse_bitrate(
+        *bitrate_match.groups()) if bitrate_match else None
+
+    audio_line = re.search(r'Stream #\S+.*?: Audio: (.*)', output)
+    audio_codec = audio_bitrate = channels = sample_rate = None
+    if audio_line:
+        details = audio_line.group(1)
+        audio_codec = details.split(',')[0].split(' ')[0]
+        rate_match = re.search(r'(\d+) Hz', details)
+        sample_rate = int(rate_match.group(1)) if rate_match else None
+        layout_match = re.search(r'Hz, ([^,]+)', details)
+        if layout_match:
+            layout = layout_match.group(1).strip()
+            channels_match = re.match(r'(\d+) channels', layout)
+            channels = int(channels_match.group(1)) if channels_match else \
+                _CHANNEL_LAYOUTS.get(layout.split('(')[0])
+        audio_bitrate_match = re.search(r'(\d+) (kb/s|b/s|mb/s)', details)
+        audio_bitrate = _parse_bitrate(
+            *audio_bitrate_match.groups()) if audio_bitrate_match else None
+
+    size = os.path.getsize(path) if os.path.exists(path) else None
+    if format_bitrate is None and size and duration:
+        format_bitrate = int(size * 8 / duration)
+
+    return MediaInfo(
+        path=path,
+        duration=duration,
+        size=size,
+        format_bitrate=format_bitrate,
+        has_audio=audio_line is not None,
+        has_video=re.search(r'Stream #\S+.*?: Video: ', output) is not None,
+        audio_codec=audio_codec,
+        audio_bitrate=audio_bitrate,
+        channels=channels,
+        sample_rate=sample_rate,
+    )
+
+
+def speech_audio_info(path, duration):
+    """
+    MediaInfo de um áudio recém-gerado por extract_audio_to_file, sem nova sondagem
+    """
+    return MediaInfo(
+        path=path,
+        duration=duration,
+        size=os.path.getsize(path),
+        format_bitrate=_parse_bitrate(SPEECH_AUDIO_BITRATE[:-1], 'kb/s'),
+        has_audio=True,
+        has_video=False,
+        audio_codec='mp3',
+        audio_bitrate=_parse_bitrate(SPEECH_AUDIO_BITRATE[:-1], 'kb/s'),
+        channels=1,
+        sample_rate=SPEECH_SAMPLE_RATE,
+    )
+
+
+def extract_audio_to_file(source, output_path, start=None, duration=None):
+    """
+    Extrai somente a faixa de áudio de um arquivo ou URL (inclusive playlists
+    HLS) direto para output_path, já na codificação otimizada para fala.
+    start/duration (segundos) permitem extrair só um trecho.
+    """
+    command = [get_ffmpeg_binary(), '-hide_banner', '-loglevel', 'error', '-y']
+    if source.startswith(('http://', 'https://')):
+        command += ['-reconnect', '1', '-reconnect_streamed', '1',
+                    '-reconnect_delay_max', '10']
+    if start:
+        # -ss antes de -i: busca direta no contêiner, sem decodificar o início
+        command += ['-ss', f"{start:.3f}"]
+    command += ['-i', source]
+    if duration:
+        command += ['-t', f"{duration:.3f}"]
+    command += [
+        '-map', '0:a:0', '-vn',
+        '-ac', '1',
+        '-ar', str(SPEECH_SAMPLE_RATE),
+        '-b:a', SPEECH_AUDIO_BITRATE,
+        output_path
+    ]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(
+            f"Erro ao extrair áudio com ffmpeg: {result.stderr.strip()[-500:]}")
+    return output_path
+
+
+def plan_audio_chunks(duration, bitrate, chunk_duration=1200, max_bytes=MAX_CHUNK_SIZE):
+    """
+    Planeja os trechos (início, fim) em segundos de modo que cada chunk,
+    codificado com o bitrate informado (bits/s), fique abaixo de max_bytes
+    """
+    if bitrate:
+        # Margem de 10% para cabeçalhos e variação do codificador
+        max_duration_for_size = max_bytes * 8 * 0.9 / bitrate
+        chunk_duration = max(1, min(chunk_duration, int(max_duration_for_size)))
+
+    return [(start, min(start + chunk_duration, duration))
+            for start in range(0, int(math.ceil(duration)), chunk_duration)
+            if min(start + chunk_duration, duration) > start]
+
+
+def split_audio(audio_path, chunk_duration=1200, duration=None, media_info=None):  # 20 minutos por chunk
+    """
+    Divide o áudio em chunks prontos para a API de transcrição.
+
+    Usa os metadados já sondados (media_info) quando disponíveis. Se o arquivo
+    inteiro já cabe em um chunk e está em um formato aceito pela API, ele é
+    enviado como está, sem nova codificação. Os demais trechos são extraídos
+    diretamente pelo ffmpeg, com busca no contêiner.
+    """
     try:
-        audio = AudioFileClip(audio_path)
-        duration = audio.duration
+        if media_info is None:
+            media_info = probe_media(audio_path)
+        duration = duration or media_info.duration
+
+        file_size = media_info.size or os.path.getsize(audio_path)
+        extension = os.path.splitext(audio_path)[1].lower()
+        if duration <= chunk_duration and file_size <= MAX_CHUNK_SIZE \
+                and extension in WHISPER_UPLOAD_FORMATS:
+            logger.info("Áudio cabe em um único chunk, enviando sem recodificar")
+            return [(audio_path, 0)]
+
+        speech_bitrate = _parse_bitrate(SPEECH_AUDIO_BITRATE[:-1], 'kb/s')
         chunks = []
+        for start, end in plan_audio_chunks(duration, speech_bitrate, chunk_duration):
+            chunk_path = f"{audio_path}_{start}_{int(end)}.mp3"
+            extract_audio_to_file(
+                audio_path, chunk_path, start=start, duration=end - start)
+            chunks.append((chunk_path, start))
 
-        for start in range(0, int(duration), chunk_duration):
-            end = min(start + chunk_duration, duration)
-            chunk = audio.subclip(start, end)
-            chunk_path = f"{audio_path}_{start}_{end}.mp3"
-
-            # Configurações mais robustas para write_audiofile
-            chunk.write_audiofile(
-                chunk_path,
-                bitrate="64k",
-                verbose=False,
-                logger=None
-            )
-
-            # Verificar o tamanho do arquivo
-            file_size = os.path.getsize(chunk_path)
-            if file_size > 25 * 1024 * 1024:  # Se o arquivo for maior que 25 MB
-                os.remove(chunk_path)  # Remove o arquivo grande
-                # Divide este chunk em dois menores
-                mid = (start + end) // 2
-                chunk1 = audio.subclip(start, mid)
-                chunk2 = audio.subclip(mid, end)
-                chunk_path1 = f"{audio_path}_{start}_{mid}.mp3"
-                chunk_path2 = f"{audio_path}_{mid}_{end}.mp3"
-                chunk1.write_audiofile(
-                    chunk_path1, bitrate="64k", verbose=False, logger=None)
-                chunk2.write_audiofile(
-                    chunk_path2, bitrate="64k", verbose=False, logger=None)
-                chunks.append((chunk_path1, start))
-                chunks.append((chunk_path2, mid))
-            else:
-                chunks.append((chunk_path, start))
-
-        audio.close()
         return chunks
 
     except Exception as e:
@@ -613,127 +1121,256 @@ def extrair_video_id(url):
         return None
 
 
-def get_vimeo_video_link(video_url, vimeo_client):
-    try:
-        video_id = extrair_video_id(video_url)
-        if not video_id:
-            return None
-
-        video_info = vimeo_client.get(f'/videos/{video_id}').json()
-        if not video_info:
-            return None
+def get_vimeo_client():
+    """
+    Cria o cliente da API do Vimeo a partir das variáveis de ambiente ou dos secrets
+    """
+    import vimeo
 
-        # Tentar obter o link do vídeo com a menor qualidade disponível
-        files = video_info.get('files', [])
-        video_link = min(files, key=lambda x: x.get(
-            'height', float('inf'))).get('link')
+    token = get_setting('VIMEO_ACCESS_TOKEN')
+    if not token:
+        return None
+    return vimeo.VimeoClient(
+        token=token,
+        key=get_setting('VIMEO_CLIENT_ID'),
+        secret=get_setting('VIMEO_CLIENT_SECRET')
+    )
 
-        if video_link:
-            return video_link
-        else:
-            logger.error("Não foi possível encontrar um link de vídeo")
-            return None
 
-    except Exception as e:
-        logger.exception(f"Erro ao obter link do vídeo do Vimeo: {str(e)}")
-        return None
+@ttl_cache(VIMEO_METADATA_TTL)
+def get_vimeo_video_info(video_id, _vimeo_client):
+    """
+    Metadados de /videos/{id} (em cache; erros não são armazenados)
+    """
+    response = _vimeo_client.get(
+        f'/videos/{video_id}', params={'fields': VIMEO_VIDEO_FIELDS})
+    response.raise_for_status()
+    return response.json()
 
 
-#### YOUTUBE ####
-def get_authenticated_service():
-    scopes = ["https://www.googleapis.com/auth/youtube.force-ssl"]
-    credentials = None
-
-    # Tenta carregar as credenciais do arquivo token.pickle
-    if os.path.exists('token.pickle'):
-        with open('token.pickle', 'rb') as token:
-            credentials = pickle.load(token)
-
-    # Se não há credenciais válidas disponíveis, faça o login
-    if not credentials or not credentials.valid:
-        if credentials and credentials.expired and credentials.refresh_token:
-            credentials.refresh(Request())
-        else:
-            client_config = {
-                "installed": {
-                    "client_id": os.getenv("YOUTUBE_CLIENT_ID"),
-                    "client_secret": os.getenv("YOUTUBE_CLIENT_SECRET"),
-                    "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                    "token_uri": "https://oauth2.googleapis.com/token",
-                    "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
-                    "redirect_uris": ["http://localhost:8501/"]
-                }
-            }
+def select_vimeo_audio_source(video_info):
+    """
+    Escolhe a fonte mais leve para extrair o áudio de um vídeo do Vimeo.
+    Retorna (link, tipo), onde tipo é:
+    - 'audio': rendição somente de áudio
+    - 'adaptive': playlist HLS/DASH, da qual o ffmpeg baixa só a faixa de áudio
+    - 'video': menor rendição progressiva de vídeo (último recurso)
+    """
+    play = video_info.get('play') or {}
+    files = list(video_info.get('files') or []) + \
+        list(play.get('progressive') or [])
 
-            flow = Flow.from_client_config(
-                client_config,
-                scopes=scopes,
-                redirect_uri="http://localhost:8501/"
-            )
+    for file in files:
+        if (file.get('type') or '').startswith('audio/') or file.get('rendition') == 'audio':
+            if file.get('link'):
+                return file['link'], 'audio'
 
-            auth_url, _ = flow.authorization_url(prompt='consent')
+    adaptive_links = [(play.get('hls') or {}).get('link')] + \
+        [file.get('link') for file in files if file.get('quality') == 'hls']
+    for link in adaptive_links:
+        if link:
+            return link, 'adaptive'
 
-            print(
-                f"Por favor, acesse esta URL para autorizar o aplicativo: {auth_url}")
-            webbrowser.open(auth_url)  # Abre o navegador automaticamente
+    progressive = [file for file in files
+                   if file.get('link') and file.get('quality') not in ('hls', 'dash')]
+    if progressive:
+        smallest = min(progressive, key=lambda x: x.get('height') or float('inf'))
+        return smallest['link'], 'video'
 
-            # Aguarda o usuário inserir o código de autorização
-            auth_code = input("Cole o código de autorização aqui: ")
+    return None, None
 
-            flow.fetch_token(code=auth_code)
-            credentials = flow.credentials
 
-        # Salva as credenciais para a próxima execução
-        with open('token.pickle', 'wb') as token:
-            pickle.dump(credentials, token)
+#### YOUTUBE ####
+def select_youtube_caption_track(info, policy=None):
+    """
+    Escolhe a faixa de legendas em português a usar, segundo a política:
+    - 'off': nunca usar legendas (sempre transcrever o áudio)
+    - 'manual': apenas legendas enviadas pelo autor do vídeo
+    - 'auto': legendas do autor ou, na falta delas, as automáticas do YouTube
+      (somente quando o idioma original do vídeo é português, para não usar
+      traduções automáticas)
+    Retorna (url, extensão, automática?) ou None.
+    """
+    policy = policy or YOUTUBE_CAPTION_POLICY
+    if policy == 'off':
+        return None
 
-    return build("youtube", "v3", credentials=credentials)
+    def pick(tracks_by_language, languages):
+        for language in languages:
+            for track in tracks_by_language.get(language) or []:
+                if track.get('ext') in ('vtt', 'srt') and track.get('url'):
+                    return track
+        return None
 
+    manual = info.get('subtitles') or {}
+    manual_languages = [lang for lang in manual if lang.split('-')[0] == 'pt']
+    track = pick(manual, sorted(manual_languages))
+    if track:
+        return track['url'], track['ext'], False
 
-def get_video_details(youtube, video_id):
-    try:
-        request = youtube.videos().list(
-            part="snippet,contentDetails",
-            id=video_id
-        )
-        response = request.execute()
-
-        if 'items' in response:
-            return response['items'][0]
-        else:
-            return None
-    except Exception as e:
-        logger.error(f"Erro ao obter detalhes do vídeo do YouTube: {str(e)}")
+    if policy != 'auto':
         return None
 
+    automatic = info.get('automatic_captions') or {}
+    video_language = (info.get('language') or '').split('-')[0]
+    auto_languages = ['pt-orig']
+    if video_language == 'pt':
+        auto_languages += ['pt', 'pt-BR']
+    track = pick(automatic, auto_languages)
+    if track:
+        return track['url'], track['ext'], True
+    return None
+
+
+def fetch_youtube_captions(info, policy=None, min_coverage=None):
+    """
+    Baixa as legendas existentes do vídeo e converte para SRT.
+    Retorna None se não houver legendas aceitáveis pela política de qualidade.
+    """
+    import requests
+    import srt
+
+    selected = select_youtube_caption_track(info, policy)
+    if not selected:
+        return None
 
-def get_video_download_url(youtube, video_id):
+    url, extension, is_automatic = selected
     try:
-        request = youtube.videos().list(
-            part="player",
-            id=video_id
-        )
-        response = request.execute()
-
-        if 'items' in response and response['items']:
-            embed_html = response['items'][0]['player']['embedHtml']
-            # Extrair a URL do vídeo do HTML de incorporação
-            # Nota: Este é um método simplificado e pode precisar de ajustes
-            video_url = embed_html.split('src="')[1].split('"')[0]
-            return video_url
-        else:
-            return None
+        response = requests.get(url, timeout=30)
+        response.raise_for_status()
+        response.encoding = 'utf-8'
+        content = response.text
+        srt_content = vtt_to_srt(content) if extension == 'vtt' else srt.compose(
+            srt.parse(content))
     except Exception as e:
-        logger.error(
-            f"Erro ao obter URL de download do vídeo do YouTube: {str(e)}")
+        logger.warning(f"Não foi possível obter as legendas do YouTube: {str(e)}")
+        return None
+
+    min_coverage = YOUTUBE_CAPTION_MIN_COVERAGE if min_coverage is None else min_coverage
+    coverage = srt_coverage(srt_content, info.get('duration'))
+    if not srt_content.strip() or coverage < min_coverage:
+        logger.info(
+            f"Legendas descartadas: cobrem apenas {coverage:.0%} do vídeo")
         return None
 
+    logger.info(
+        f"Usando legendas {'automáticas' if is_automatic else 'do autor'} do YouTube ({coverage:.0%} do vídeo)")
+    return srt_content
+
+
+def expand_youtube_url(url, max_depth=2):
+    """
+    Expande uma URL de playlist ou canal do YouTube na lista de vídeos
+    [{'id', 'title', 'url', 'duration'}], sem baixar nada.
+    Uma URL de vídeo único retorna uma lista com um elemento.
+    """
+    import yt_dlp
+
+    ydl_opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'extract_flat': 'in_playlist',
+    }
+
+    videos = []
+    seen_ids = set()
+
+    def collect(info, depth):
+        if info.get('_type') in ('playlist', 'multi_video'):
+            for entry in info.get('entries') or []:
+                if not entry:
+                    continue
+                # Canais retornam abas (Vídeos, Shorts...) como sub-playlists
+                if entry.get('ie_key') == 'YoutubeTab' or entry.get('_type') == 'playlist':
+                    if depth < max_depth:
+                        collect(ydl.extract_info(
+                            entry['url'], download=False), depth + 1)
+                    continue
+                collect(entry, depth)
+            return
+
+        video_id = info.get('id')
+        if not video_id or video_id in seen_ids:
+            return
+        seen_ids.add(video_id)
+        videos.append({
+            'id': video_id,
+            'title': info.get('title') or video_id,
+            'url': info.get('webpage_url') or info.get('url') or f"https://www.youtube.com/watch?v={video_id}",
+            'duration': info.get('duration') or 0,
+        })
+
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        collect(ydl.extract_info(url, download=False), 0)
+
+    return videos
+
+
+def get_youtube_video_id(url):
+    """
+    Extrai o ID de um vídeo do YouTube a partir da URL (watch, youtu.be,
+    shorts, embed ou live)
+    """
+    patterns = [
+        r'youtube\.com/watch\?(?:.*&)?v=([a-zA-Z0-9_-]{11})',
+        r'youtube\.com/(?:shorts|embed|live|v)/([a-zA-Z0-9_-]{11})',
+        r'youtu\.be/([a-zA-Z0-9_-]{11})',
+    ]
+
+    for pattern in patterns:
+        match = re.search(pattern, url)
+        if match:
+            return match.group(1)
+
+    return None
+
+
+def load_processed_youtube_ids():
+    """
+    IDs dos vídeos do YouTube já processados (registro local em YOUTUBE_PROCESSED_FILE)
+    """
+    with _youtube_registry_lock:
+        if not os.path.exists(YOUTUBE_PROCESSED_FILE):
+            return {}
+        try:
+            with open(YOUTUBE_PROCESSED_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(
+                f"Registro de vídeos processados inválido: {str(e)}")
+            return {}
+
+
+def mark_youtube_video_processed(video_id, title):
+    """
+    Registra um vídeo do YouTube como processado
+    """
+    with _youtube_registry_lock:
+        processed = {}
+        if os.path.exists(YOUTUBE_PROCESSED_FILE):
+            try:
+                with open(YOUTUBE_PROCESSED_FILE, 'r', encoding='utf-8') as f:
+                    processed = json.load(f)
+            except Exception:
+                processed = {}
+        processed[video_id] = {
+            'title': title,
+            'processed_at': datetime.datetime.now().isoformat(timespec='seconds')
+        }
+        tmp_path = f"{YOUTUBE_PROCESSED_FILE}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(processed, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, YOUTUBE_PROCESSED_FILE)
+
+
 ########################################
 # FUNÇÃO DE PROCESSAMENTO E DOWNLOAD DO ARQUIVO SRT
 ########################################
 
 
 def processa_srt(srt_content):
+    import srt
+
     subtitles = list(srt.parse(srt_content))
     transcript_text = ""
     for sub in subtitles:
@@ -744,23 +1381,83 @@ def processa_srt(srt_content):
     return transcript_text
 
 
-def create_download_link(file_path, link_text, custom_filename=None):
+def _parse_vtt_timestamp(value):
+    parts = value.strip().split(':')
+    if len(parts) == 2:
+        parts.insert(0, '0')
+    hours, minutes, seconds = parts
+    return datetime.timedelta(hours=int(hours), minutes=int(minutes), seconds=float(seconds))
+
+
+def vtt_to_srt(vtt_content):
     """
-    Cria um link de download para um arquivo com nome personalizado.
+    Converte legendas WebVTT (inclusive as automáticas do YouTube) para SRT.
+    Remove as marcações inline e as linhas repetidas das legendas "roladas".
     """
-    with open(file_path, 'rb') as f:
-        data = f.read()
-    b64 = base64.b64encode(data).decode()
+    import srt
+
+    # Agrupar as linhas por trecho: cada linha de tempo ("-->") inicia um trecho
+    cues = []
+    raw_lines = vtt_content.replace('\r\n', '\n').split('\n')
+    for i, line in enumerate(raw_lines):
+        if '-->' in line:
+            # Identificador opcional do trecho: linha logo antes do tempo, após linha em branco
+            if cues and cues[-1][2] and raw_lines[i - 1].strip() and \
+                    (i < 2 or not raw_lines[i - 2].strip()):
+                cues[-1][2].pop()
+            start, end = line.split('-->')
+            cues.append([_parse_vtt_timestamp(start),
+                         _parse_vtt_timestamp(end.strip().split(' ')[0]), []])
+        elif cues:
+            cues[-1][2].append(line)
 
-    # Usar o nome personalizado se fornecido, senão usar o nome original do arquivo
-    download_filename = custom_filename if custom_filename else os.path.basename(
-        file_path)
+    subtitles = []
+    previous_lines = []
+    for start, end, lines in cues:
+        text_lines = []
+        for line in lines:
+            line = re.sub(r'<[^>]+>', '', line)  # <c>, <00:00:01.000>, <i> ...
+            line = html.unescape(line).replace('\xa0', ' ').strip()
+            if line:
+                text_lines.append(line)
+
+        # Legendas automáticas repetem as linhas do trecho anterior
+        new_lines = [line for line in text_lines if line not in previous_lines]
+        if text_lines:
+            previous_lines = text_lines
+        if not new_lines:
+            continue
+
+        # Evitar sobreposição com o trecho anterior
+        if subtitles and subtitles[-1].end > start:
+            subtitles[-1].end = start
+
+        subtitles.append(srt.Subtitle(
+            index=len(subtitles) + 1,
+            start=start,
+            end=end,
+            content=' '.join(new_lines)
+        ))
 
-    href = f'<a href="data:file/txt;base64,{b64}" download="{download_filename}">{link_text}</a>'
-    return href
+    return srt.compose(subtitles)
+
+
+def srt_coverage(srt_content, duration_seconds):
+    """
+    Fração da duração do vídeo coberta por legendas (0 a 1)
+    """
+    import srt
+
+    if not duration_seconds:
+        return 1.0
+    covered = sum((sub.end - sub.start).total_seconds()
+                  for sub in srt.parse(srt_content))
+    return min(covered / duration_seconds, 1.0)
 
 
 def processa_srt_sem_timestamp(srt_content):
+    import srt
+
     subtitles = list(srt.parse(srt_content))
     transcript_text = ""
     for sub in subtitles:
@@ -770,45 +1467,9 @@ def processa_srt_sem_timestamp(srt_content):
     return transcript_text
 
 
-def gera_srt_do_resumo(resumo, duracao_total_segundos):
-    linhas = resumo.split('\n')
-    subtitles = []
-    tempo_por_linha = duracao_total_segundos / len(linhas)
-
-    for i, linha in enumerate(linhas, start=1):
-        if linha.strip():
-            start_time = datetime.timedelta(
-                seconds=int((i-1) * tempo_por_linha))
-            end_time = datetime.timedelta(seconds=int(i * tempo_por_linha))
-
-            # Extrair o timestamp do início da linha (se existir)
-            match = re.match(r'\[(\d{2}:\d{2})\] - (.+)', linha)
-            if match:
-                timestamp, content = match.groups()
-                minutos, segundos = map(int, timestamp.split(':'))
-                start_time = datetime.timedelta(
-                    minutes=minutos, seconds=segundos)
-                end_time = start_time + \
-                    datetime.timedelta(seconds=int(tempo_por_linha))
-            else:
-                content = linha
-
-            # Limpa os asteriscos do conteúdo
-            content = content.strip().replace('*', '')
-
-            subtitle = srt.Subtitle(
-                index=i,
-                start=start_time,
-                end=end_time,
-                content=content
-            )
-            subtitles.append(subtitle)
-
-    # Gera o conteúdo SRT limpo
-    return srt.compose(subtitles)
-
-
 def ajusta_tempo_srt(srt_content, offset):
+    import srt
+
     subtitles = list(srt.parse(srt_content))
     for sub in subtitles:
         # Limpa os asteriscos do conteúdo
@@ -822,12 +1483,18 @@ def ajusta_tempo_srt(srt_content, offset):
 ########################################
 
 
-def create_pdf(content, filename):
+def create_pdf(content, filename, output_path=None):
     """
     Cria um PDF com o conteúdo fornecido e retorna um buffer.
     O filename é usado apenas para referência, não afeta o conteúdo do PDF.
+    Com output_path, o PDF é gravado direto nesse arquivo, que é retornado.
     """
-    buffer = BytesIO()
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+    from reportlab.lib.enums import TA_JUSTIFY
+
+    buffer = output_path or BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=72,
                             leftMargin=72, topMargin=72, bottomMargin=18)
 
@@ -851,14 +1518,45 @@ def create_pdf(content, filename):
             flowables.append(Spacer(1, 12))  # Espaçamento entre parágrafos
 
     doc.build(flowables)
+    if output_path:
+        return output_path
     buffer.seek(0)
     return buffer
 
 
-def create_download_link_pdf(pdf_buffer, link_text, filename):
+def create_download_link_bytes(data, link_text, filename, mime='file/txt'):
     """
-    Cria um link de download para um PDF com nome de arquivo personalizado.
+    Cria um link de download para um conteúdo binário em memória.
     """
-    b64 = base64.b64encode(pdf_buffer.getvalue()).decode()
-    href = f'<a href="data:application/pdf;base64,{b64}" download="{filename}">{link_text}</a>'
+    b64 = base64.b64encode(data).decode()
+    href = f'<a href="data:{mime};base64,{b64}" download="{filename}">{link_text}</a>'
     return href
+
+########################################
+# FUNÇÕES DE PROCESSAMENTO EM LOTE
+########################################
+
+
+def run_jobs_in_pool(items, job_fn, max_workers=3, poll_interval=1.0):
+    """
+    Executa job_fn(item) para cada item em um pool de threads.
+
+    É um gerador: a cada poll_interval segundos (ou quando algum job termina)
+    produz a lista de (item, resultado, erro) concluídos desde a última vez,
+    possivelmente vazia, para que quem chama possa atualizar o progresso na
+    própria thread.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {executor.submit(job_fn, item): item for item in items}
+        while pending:
+            done, _ = wait(pending, timeout=poll_interval,
+                           return_when=FIRST_COMPLETED)
+            finished = []
+            for future in done:
+                item = pending.pop(future)
+                try:
+                    finished.append((item, future.result(), None))
+                except Exception as e:
+                    logger.exception(f"Erro no processamento em lote: {str(e)}")
+                    finished.append((item, None, e))
+            yield finished
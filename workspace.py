@@ -0,0 +1,278 @@
+"""
+Diretórios de trabalho isolados por job, com orçamento de disco.
+
+Cada execução do pipeline recebe um diretório próprio em WORKSPACE_ROOT para
+os arquivos intermediários (vídeo baixado, áudio extraído, chunks, arquivos
+temporários de upload). Assim, usuários simultâneos não disputam os mesmos
+nomes e uma falha não espalha arquivos pelo diretório temporário do sistema.
+
+Ao final, o diretório de um job bem-sucedido é removido. O de um job que
+falhou ou foi cancelado é mantido como "finalizado" para diagnóstico e só é
+apagado quando o espaço ocupado passa de WORKSPACE_BUDGET_BYTES (os menos
+usados recentemente primeiro) ou quando fica mais velho que WORKSPACE_MAX_AGE.
+Diretórios de processos que morreram (órfãos) são recolhidos na inicialização;
+se o job volta para a fila com o mesmo ID, reaproveita o diretório e retoma
+downloads interrompidos.
+"""
+
+import os
+import json
+import time
+import uuid
+import errno
+import shutil
+import socket
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+WORKSPACE_ROOT = os.getenv(
+    'TRANSCRIPTION_WORKSPACE_DIR', os.path.join(tempfile.gettempdir(), 'transcricao_workspaces'))
+# Espaço máximo ocupado por todos os diretórios de trabalho
+WORKSPACE_BUDGET_BYTES = int(float(os.getenv('TRANSCRIPTION_WORKSPACE_BUDGET_GB', '10')) * 1024 ** 3)
+# Diretórios finalizados ou órfãos mais velhos que isto são apagados na varredura
+WORKSPACE_MAX_AGE = float(os.getenv('TRANSCRIPTION_WORKSPACE_MAX_AGE_HOURS', '24')) * 3600
+
+MARKER_FILE = '.workspace.json'
+UNMARKED_GRACE_PERIOD = 60  # segundos até um diretório sem marcador poder ser apagado
+_HOSTNAME = socket.gethostname()
+
+
+class DiskBudgetExceeded(RuntimeError):
+    """
+    Levantada quando os diretórios em uso já ocupam todo o orçamento de disco
+    """
+
+
+def _directory_size(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, filename)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def _process_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno == errno.EPERM
+    return True
+
+
+class WorkspaceManager:
+    """
+    Cria, libera e recolhe os diretórios de trabalho dos jobs. Pode ser usado
+    por várias threads; vários processos podem compartilhar o mesmo root.
+    """
+
+    def __init__(self, root=WORKSPACE_ROOT, budget_bytes=WORKSPACE_BUDGET_BYTES,
+                 max_age=WORKSPACE_MAX_AGE):
+        self.root = root
+        self.budget_bytes = budget_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, workspace_id):
+        return os.path.join(self.root, workspace_id)
+
+    def _read_marker(self, path):
+        try:
+            with open(os.path.join(path, MARKER_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_marker(self, path, marker):
+        marker['last_used'] = time.time()
+        temp_path = os.path.join(path, f"{MARKER_FILE}.{uuid.uuid4().hex}")
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(marker, f)
+        os.replace(temp_path, os.path.join(path, MARKER_FILE))
+
+    def list_workspaces(self):
+        """
+        Diretórios existentes, como dicionários com 'id', 'path', 'size',
+        'active' (em uso por um processo vivo) e os dados do marcador
+        """
+        workspaces = []
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return workspaces
+        for name in names:
+            path = self._path(name)
+            if not os.path.isdir(path):
+                continue
+            marker = self._read_marker(path) or {}
+            try:
+                last_used = marker.get('last_used') or os.path.getmtime(path)
+            except OSError:
+                continue
+            if marker:
+                active = marker.get('finished_at') is None and (
+                    marker.get('host') != _HOSTNAME or _process_alive(marker.get('pid') or 0))
+            else:
+                # Diretório recém-criado por outro processo, ainda sem marcador
+                active = time.time() - last_used < UNMARKED_GRACE_PERIOD
+            workspaces.append({
+                **marker,
+                'id': name,
+                'path': path,
+                'size': _directory_size(path),
+                'last_used': last_used,
+                'has_marker': bool(marker),
+                'active': active,
+            })
+        return workspaces
+
+    def usage(self):
+        """
+        Bytes ocupados por todos os diretórios de trabalho
+        """
+        return sum(workspace['size'] for workspace in self.list_workspaces())
+
+    def acquire(self, workspace_id=None):
+        """
+        Cria (ou reaproveita, se já existir com o mesmo ID) um diretório de
+        trabalho e retorna o caminho. Antes, libera espaço dos diretórios
+        finalizados se o orçamento de disco estiver estourado.
+        """
+        workspace_id = workspace_id or uuid.uuid4().hex
+        with self._lock:
+            self._enforce_budget(exclude=workspace_id)
+            path = self._path(workspace_id)
+            os.makedirs(path, exist_ok=True)
+            marker = self._read_marker(path) or {'created_at': time.time()}
+            marker.update({'pid': os.getpid(), 'host': _HOSTNAME, 'finished_at': None})
+            self._write_marker(path, marker)
+        logger.info(f"Diretório de trabalho {workspace_id} em uso: {path}")
+        return path
+
+    def release(self, path, keep=False):
+        """
+        Libera um diretório de trabalho. Com keep=True ele é mantido como
+        finalizado (sujeito à remoção por orçamento ou idade); senão é apagado.
+        """
+        with self._lock:
+            if not keep:
+                shutil.rmtree(path, ignore_errors=True)
+                return
+            marker = self._read_marker(path) or {'created_at': time.time()}
+            marker['finished_at'] = time.time()
+            try:
+                self._write_marker(path, marker)
+            except OSError as e:
+                logger.warning(f"Não foi possível finalizar o diretório {path}: {str(e)}")
+            try:
+                self._enforce_budget()
+            except DiskBudgetExceeded as e:
+                logger.warning(str(e))
+
+    @contextmanager
+    def workspace(self, workspace_id=None):
+        """
+        Diretório de trabalho para um bloco: removido se o bloco termina sem
+        erro, mantido como finalizado se levanta uma exceção
+        """
+        path = self.acquire(workspace_id)
+        try:
+            yield path
+        except BaseException:
+            self.release(path, keep=True)
+            raise
+        self.release(path)
+
+    def enforce_budget(self):
+        """
+        Apaga diretórios finalizados, os menos usados recentemente primeiro,
+        até o espaço ocupado caber no orçamento. Levanta DiskBudgetExceeded se
+        os diretórios em uso sozinhos já passam do limite.
+        """
+        with self._lock:
+            self._enforce_budget()
+
+    def _enforce_budget(self, exclude=None):
+        workspaces = self.list_workspaces()
+        usage = sum(workspace['size'] for workspace in workspaces)
+        if usage <= self.budget_bytes:
+            return
+
+        # Apaga os finalizados menos usados recentemente até caber no orçamento
+        evictable = sorted((workspace for workspace in workspaces
+                            if not workspace['active'] and workspace['id'] != exclude),
+                           key=lambda workspace: workspace['last_used'])
+        for workspace in evictable:
+            if usage <= self.budget_bytes:
+                break
+            logger.info(
+                f"Orçamento de disco excedido, removendo o diretório {workspace['id']} "
+                f"({workspace['size'] / (1024 * 1024):.1f} MB)")
+            shutil.rmtree(workspace['path'], ignore_errors=True)
+            usage -= workspace['size']
+
+        if usage > self.budget_bytes:
+            raise DiskBudgetExceeded(
+                f"Os diretórios de trabalho em uso ocupam {usage / (1024 * 1024):.0f} MB, "
+                f"acima do limite de {self.budget_bytes / (1024 * 1024):.0f} MB")
+
+    def sweep_orphans(self):
+        """
+        Recolhe diretórios deixados por processos que morreram: os recentes
+        passam a finalizados (um job devolvido à fila pode reaproveitá-los) e
+        os finalizados ou órfãos mais velhos que max_age são apagados.
+        Retorna o número de diretórios removidos.
+        """
+        removed = 0
+        now = time.time()
+        with self._lock:
+            for workspace in self.list_workspaces():
+                if workspace['active']:
+                    continue
+                if now - workspace['last_used'] > self.max_age:
+                    shutil.rmtree(workspace['path'], ignore_errors=True)
+                    removed += 1
+                elif workspace['has_marker'] and workspace.get('finished_at') is None:
+                    marker = self._read_marker(workspace['path'])
+                    if marker is None:
+                        continue
+                    marker['finished_at'] = now
+                    self._write_marker(workspace['path'], marker)
+                    logger.info(f"Diretório órfão {workspace['id']} marcado como finalizado")
+            try:
+                self._enforce_budget()
+            except DiskBudgetExceeded as e:
+                logger.warning(str(e))
+        if removed:
+            logger.info(f"{removed} diretório(s) de trabalho antigo(s) removido(s)")
+        return removed
+
+
+_default_manager = {'manager': None}
+_default_manager_lock = threading.Lock()
+
+
+def get_workspace_manager():
+    """
+    Gerenciador compartilhado pelo processo. Na primeira chamada, recolhe os
+    diretórios órfãos deixados por execuções anteriores.
+    """
+    with _default_manager_lock:
+        if _default_manager['manager'] is None:
+            manager = WorkspaceManager()
+            try:
+                manager.sweep_orphans()
+            except Exception as e:
+                logger.warning(f"Falha ao recolher diretórios de trabalho órfãos: {str(e)}")
+            _default_manager['manager'] = manager
+        return _default_manager['manager']